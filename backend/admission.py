@@ -0,0 +1,179 @@
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict
+
+from fastapi import Depends, HTTPException
+
+from auth import get_current_user
+
+# Per endpoint class: (concurrent requests, bounded wait queue length)
+ADMISSION_LIMITS = {
+    "export": (int(os.getenv("ADMISSION_EXPORT_CONCURRENCY", "2")), int(os.getenv("ADMISSION_EXPORT_QUEUE", "8"))),
+    "analytics": (
+        int(os.getenv("ADMISSION_ANALYTICS_CONCURRENCY", "8")), int(os.getenv("ADMISSION_ANALYTICS_QUEUE", "32"))
+    ),
+    "writes": (int(os.getenv("ADMISSION_WRITES_CONCURRENCY", "32")), int(os.getenv("ADMISSION_WRITES_QUEUE", "128"))),
+}
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "10"))
+# Governed requests a single user may have in flight at once, across all classes
+ADMISSION_PER_USER = int(os.getenv("ADMISSION_PER_USER", "4"))
+
+BUSY_DETAIL = "服务繁忙，请稍后重试"
+TOO_MANY_DETAIL = "请求过于频繁，请等待之前的请求完成"
+
+
+class AdmissionClass:
+    """
+    Concurrency slots for one class of endpoints with a bounded FIFO wait queue.
+    A released slot is handed straight to the oldest waiter, so queued requests are never overtaken.
+    """
+
+    def __init__(self, name: str, concurrency: int, max_queue: int, max_wait: float = ADMISSION_MAX_WAIT_SECONDS):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        self.reset_metrics()
+
+    def reset_metrics(self) -> None:
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.wait_sum_ms = 0.0
+        self.wait_max_ms = 0.0
+        # Moving average of how long a request holds its slot, used for Retry-After
+        self.hold_avg_seconds = 0.0
+
+    def retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self.hold_avg_seconds * backlog / self.concurrency))
+
+    def _busy(self) -> HTTPException:
+        return HTTPException(status_code=503, detail=BUSY_DETAIL, headers={"Retry-After": str(self.retry_after())})
+
+    async def acquire(self) -> None:
+        if self.active < self.concurrency and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise self._busy()
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done():
+                # The slot was handed over just as we gave up; pass it on
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            raise self._busy()
+
+        waited_ms = (time.perf_counter() - started) * 1000
+        self.admitted += 1
+        self.wait_sum_ms += waited_ms
+        self.wait_max_ms = max(self.wait_max_ms, waited_ms)
+
+    def release(self, held_seconds: float = 0.0) -> None:
+        if held_seconds:
+            self.hold_avg_seconds = 0.8 * self.hold_avg_seconds + 0.2 * held_seconds
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_avg_ms": round(self.wait_sum_ms / self.admitted, 2) if self.admitted else 0,
+            "wait_max_ms": round(self.wait_max_ms, 2),
+            "hold_avg_ms": round(self.hold_avg_seconds * 1000, 2),
+        }
+
+
+class AdmissionController:
+    """
+    Concurrency governor for expensive endpoints.
+    Rate limits cap requests per minute; this caps how many run at once, per endpoint class and per user,
+    so a burst of exports or analytics cannot starve ordinary CRUD traffic in the same worker.
+    """
+
+    def __init__(self, limits: Dict[str, Any] = ADMISSION_LIMITS, per_user: int = ADMISSION_PER_USER) -> None:
+        self.classes = {name: AdmissionClass(name, c, q) for name, (c, q) in limits.items()}
+        self.per_user = per_user
+        self._user_inflight: Dict[str, int] = {}
+        self.user_rejected = 0
+
+    def reset(self) -> None:
+        self._user_inflight.clear()
+        self.user_rejected = 0
+        for cls in self.classes.values():
+            cls.active = 0
+            cls._waiters.clear()
+            cls.reset_metrics()
+
+    @asynccontextmanager
+    async def admit(self, name: str, user_openid: str) -> AsyncIterator[None]:
+        cls = self.classes[name]
+        if self._user_inflight.get(user_openid, 0) >= self.per_user:
+            self.user_rejected += 1
+            raise HTTPException(status_code=429, detail=TOO_MANY_DETAIL, headers={"Retry-After": "1"})
+
+        self._user_inflight[user_openid] = self._user_inflight.get(user_openid, 0) + 1
+        try:
+            await cls.acquire()
+            started = time.perf_counter()
+            try:
+                yield
+            finally:
+                cls.release(time.perf_counter() - started)
+        finally:
+            remaining = self._user_inflight[user_openid] - 1
+            if remaining:
+                self._user_inflight[user_openid] = remaining
+            else:
+                del self._user_inflight[user_openid]
+
+    def limit(self, name: str) -> Callable[..., AsyncIterator[None]]:
+        """Route dependency holding a slot of the given class for the duration of the request"""
+        if name not in self.classes:
+            raise ValueError(f"Unknown admission class {name}")
+
+        async def dependency(user_openid: str = Depends(get_current_user)) -> AsyncIterator[None]:
+            async with self.admit(name, user_openid):
+                yield
+
+        return dependency
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "classes": {name: cls.stats() for name, cls in self.classes.items()},
+            "users_in_flight": len(self._user_inflight),
+            "per_user_limit": self.per_user,
+            "user_rejected": self.user_rejected,
+        }
+
+
+admission_controller = AdmissionController()
@@ -0,0 +1,418 @@
+import asyncio
+import base64
+import gzip
+import json
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from mock_db import MockCollection
+from purge import repo_purger
+
+# Commits older than this many days move to the cold archive (0 disables archiving)
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "0"))
+ARCHIVE_SWEEP_SECONDS = int(os.getenv("ARCHIVE_SWEEP_SECONDS", "3600"))
+# A repo is archived once this many of its commits are old enough; at most SEGMENT_COMMITS per segment
+ARCHIVE_MIN_COMMITS = int(os.getenv("ARCHIVE_MIN_COMMITS", "100"))
+ARCHIVE_SEGMENT_COMMITS = int(os.getenv("ARCHIVE_SEGMENT_COMMITS", "2000"))
+# Decompressed segments kept in memory (segments never change, so any process may cache them)
+ARCHIVE_CACHE_SEGMENTS = int(os.getenv("ARCHIVE_CACHE_SEGMENTS", "32"))
+
+DAY_MS = 24 * 60 * 60 * 1000
+SUMMARY_CACHE_REPOS = 4096
+
+# Filters archived commits with exactly the semantics hot queries have on the mock
+_matcher = MockCollection("_archive", None)
+
+
+def _number(value: Any) -> float:
+    return value if isinstance(value, (int, float)) and not isinstance(value, bool) else 0
+
+
+def _cost(commit: Dict[str, Any]) -> tuple:
+    cost = commit.get("cost")
+    if not isinstance(cost, dict):
+        return 0, 0
+    return _number(cost.get("parts")), _number(cost.get("labor"))
+
+
+def month_of(timestamp: Any) -> Optional[str]:
+    """Month bucket of a commit timestamp (ms), in local time like the mock's and SQLite's $dateToString"""
+    if not isinstance(timestamp, (int, float)):
+        return None
+    return datetime.fromtimestamp(timestamp / 1000).strftime("%Y-%m")
+
+
+def add_month(months: Dict[str, Dict[str, Any]], month: str, cost: float, mileage: Any, fuel: float,
+              count: int = 1) -> None:
+    bucket = months.setdefault(month, {"cost": 0, "max_mileage": None, "count": 0, "fuel_cost": 0})
+    bucket["cost"] += cost
+    bucket["count"] += count
+    bucket["fuel_cost"] += fuel
+    if isinstance(mileage, (int, float)) and (bucket["max_mileage"] is None or mileage > bucket["max_mileage"]):
+        bucket["max_mileage"] = mileage
+
+
+def encode_commits(commits: List[Dict[str, Any]]) -> str:
+    lines = [json.dumps({**commit, "_id": str(commit["_id"])}, ensure_ascii=False, default=str) for commit in commits]
+    return base64.b64encode(gzip.compress("\n".join(lines).encode("utf-8"))).decode("ascii")
+
+
+def _same_commit(hot: Dict[str, Any], archived: Dict[str, Any]) -> bool:
+    """Whether a hot commit is unchanged from its archived copy (compared as the archive encodes them)"""
+    def encoded(commit: Dict[str, Any]) -> str:
+        return json.dumps({**commit, "_id": str(commit["_id"])}, ensure_ascii=False, default=str, sort_keys=True)
+    return encoded(hot) == encoded(archived)
+
+
+def decode_commits(data: str) -> List[Dict[str, Any]]:
+    commits = []
+    for line in gzip.decompress(base64.b64decode(data)).decode("utf-8").splitlines():
+        commit = json.loads(line)
+        if ObjectId.is_valid(commit["_id"]):
+            commit["_id"] = ObjectId(commit["_id"])
+        commits.append(commit)
+    return commits
+
+
+def build_segment(repo_id: str, user_openid: str, commits: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """An immutable segment: the commits themselves (gzip NDJSON) plus the summary reads work from"""
+    ids = [str(commit["_id"]) for commit in commits]
+    timestamps = [c["timestamp"] for c in commits if isinstance(c.get("timestamp"), (int, float))]
+    mileages = [c["mileage"] for c in commits if isinstance(c.get("mileage"), (int, float))]
+    parts = labor = 0
+    by_type: Dict[Any, float] = {}
+    months: Dict[str, Dict[str, Any]] = {}
+    titles: Dict[str, int] = {}
+    for commit in commits:
+        commit_parts, commit_labor = _cost(commit)
+        parts += commit_parts
+        labor += commit_labor
+        total = commit_parts + commit_labor
+        by_type[commit.get("type")] = by_type.get(commit.get("type"), 0) + total
+        month = month_of(commit.get("timestamp"))
+        if month:
+            add_month(months, month, total, commit.get("mileage"), total if commit.get("type") == "fuel" else 0)
+        if commit.get("title"):
+            titles[commit["title"]] = titles.get(commit["title"], 0) + 1
+    return {
+        # Deterministic, so two workers archiving the same commits collide instead of duplicating them
+        "_id": f"{repo_id}:{ids[0]}",
+        "repo_id": repo_id,
+        "user_openid": user_openid,
+        "count": len(commits),
+        "id_min": min(ids),
+        "id_max": max(ids),
+        "from_ts": min(timestamps, default=None),
+        "to_ts": max(timestamps, default=None),
+        "mileage_min": min(mileages, default=None),
+        "mileage_max": max(mileages, default=None),
+        "parts": parts,
+        "labor": labor,
+        # Pairs rather than maps: types and titles are free text and may not be valid field names
+        "by_type": [[kind, value] for kind, value in by_type.items()],
+        "titles": [[title, count] for title, count in titles.items()],
+        "months": months,
+        "archived_at": datetime.now().timestamp() * 1000,
+        "data": encode_commits(commits),
+    }
+
+
+def _bounds(condition: Any) -> tuple:
+    if not isinstance(condition, dict):
+        return condition, condition
+    low = condition.get("$gte", condition.get("$gt"))
+    high = condition.get("$lte", condition.get("$lt"))
+    return low, high
+
+
+def may_match(summary: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    """False when the summary proves no commit in the segment can match the query"""
+    for field, low_key, high_key in (("timestamp", "from_ts", "to_ts"), ("mileage", "mileage_min", "mileage_max")):
+        if field not in query:
+            continue
+        low, high = _bounds(query[field])
+        if summary.get(high_key) is None:
+            # No commit in the segment has a value, so a range never matches
+            if low is not None or high is not None:
+                return False
+            continue
+        if low is not None and summary[high_key] < low:
+            return False
+        if high is not None and summary[low_key] > high:
+            return False
+    if isinstance(query.get("type"), str) and query["type"] not in {kind for kind, _ in summary.get("by_type", [])}:
+        return False
+    return True
+
+
+def _newest_first(commit: Dict[str, Any]) -> tuple:
+    timestamp = commit.get("timestamp")
+    return (0, 0) if timestamp is None else (1, timestamp)
+
+
+class CommitArchive:
+    """
+    Cold tier for old commit history.
+    A background sweep moves each repo's commits older than ARCHIVE_AFTER_DAYS into immutable,
+    gzip-compressed segments in the commit_archive collection, so the commits collection only holds
+    recent history. Every segment carries a summary (time and mileage range, cost totals by type and
+    by month, title counts): stats answer from summaries alone, and filtered reads skip segments that
+    cannot match before decompressing the rest. Summaries are cached per repo and revalidated against
+    the repo's archive_version, which every change to its segments bumps.
+    Editing or deleting an archived commit first moves its segment back into the hot collection.
+    """
+
+    def __init__(self, after_days: int = ARCHIVE_AFTER_DAYS, min_commits: int = ARCHIVE_MIN_COMMITS,
+                 segment_commits: int = ARCHIVE_SEGMENT_COMMITS) -> None:
+        self.after_days = after_days
+        self.min_commits = min_commits
+        self.segment_commits = segment_commits
+        self._task: Optional[asyncio.Task] = None
+        self.reset()
+
+    def reset(self) -> None:
+        self._summaries: OrderedDict = OrderedDict()
+        self._segments: OrderedDict = OrderedDict()
+
+    # --- Reads ---
+
+    async def summaries(self, db: Any, repo: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Segment summaries of a repo (as returned by repo_query), oldest first"""
+        version = repo.get("archive_version")
+        if not version:
+            return []
+        repo_id = str(repo["_id"])
+        cached = self._summaries.get(repo_id)
+        if cached is not None and cached[0] == version:
+            self._summaries.move_to_end(repo_id)
+            return cached[1]
+        summaries = await db.commit_archive.find(
+            {"repo_id": repo_id, "user_openid": repo.get("user_openid")}, {"data": 0}
+        ).to_list(length=None)
+        summaries.sort(key=lambda summary: summary.get("from_ts") or 0)
+        self._summaries[repo_id] = (version, summaries)
+        while len(self._summaries) > SUMMARY_CACHE_REPOS:
+            self._summaries.popitem(last=False)
+        return summaries
+
+    async def _commits(self, db: Any, summary: Dict[str, Any]) -> List[Dict[str, Any]]:
+        commits = self._segments.get(summary["_id"])
+        if commits is not None:
+            self._segments.move_to_end(summary["_id"])
+            return commits
+        segment = await db.commit_archive.find_one({"_id": summary["_id"], "user_openid": summary.get("user_openid")})
+        commits = decode_commits(segment["data"]) if segment else []
+        self._segments[summary["_id"]] = commits
+        while len(self._segments) > ARCHIVE_CACHE_SEGMENTS:
+            self._segments.popitem(last=False)
+        return commits
+
+    async def find(self, db: Any, repo: Dict[str, Any], query: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Archived commits of the repo matching a commits query, as copies"""
+        found = []
+        for summary in await self.summaries(db, repo):
+            if not may_match(summary, query):
+                continue
+            for commit in await self._commits(db, summary):
+                if _matcher._match_document(commit, query):
+                    found.append(dict(commit))
+        return found
+
+    async def merge(self, db: Any, repo: Dict[str, Any], query: Dict[str, Any],
+                    hot: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Hot results (ids already strings) plus matching archived commits, newest first"""
+        cold = await self.find(db, repo, query)
+        if not cold:
+            return hot
+        seen = {commit["_id"] for commit in hot}
+        for commit in cold:
+            commit["_id"] = str(commit["_id"])
+            # A commit can be in both tiers for a moment while a segment is written or thawed
+            if commit["_id"] not in seen:
+                hot.append(commit)
+        hot.sort(key=_newest_first, reverse=True)
+        return hot
+
+    async def totals(self, db: Any, repo: Dict[str, Any]) -> Dict[str, Any]:
+        """Cost totals of everything archived for the repo, from summaries only"""
+        totals: Dict[str, Any] = {"parts": 0, "labor": 0, "count": 0, "by_type": {}}
+        for summary in await self.summaries(db, repo):
+            totals["parts"] += summary.get("parts", 0)
+            totals["labor"] += summary.get("labor", 0)
+            totals["count"] += summary.get("count", 0)
+            for kind, value in summary.get("by_type", []):
+                totals["by_type"][kind] = totals["by_type"].get(kind, 0) + value
+        return totals
+
+    async def months(self, db: Any, repo: Dict[str, Any], start: float) -> Dict[str, Dict[str, Any]]:
+        """Monthly cost, mileage and fuel totals of archived commits from `start` (ms) on"""
+        months: Dict[str, Dict[str, Any]] = {}
+        for summary in await self.summaries(db, repo):
+            if summary.get("to_ts") is None or summary["to_ts"] < start:
+                continue
+            if summary["from_ts"] >= start:
+                for month, bucket in summary.get("months", {}).items():
+                    add_month(months, month, bucket["cost"], bucket["max_mileage"], bucket["fuel_cost"],
+                              bucket["count"])
+                continue
+            # The window starts inside this segment: only its commits can tell which fall after the start
+            for commit in await self._commits(db, summary):
+                timestamp = commit.get("timestamp")
+                if isinstance(timestamp, (int, float)) and timestamp >= start:
+                    total = sum(_cost(commit))
+                    fuel = total if commit.get("type") == "fuel" else 0
+                    add_month(months, month_of(timestamp), total, commit.get("mileage"), fuel)
+        return months
+
+    async def latest_by_mileage(self, db: Any, repo: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        summaries = [s for s in await self.summaries(db, repo) if s.get("mileage_max") is not None]
+        if not summaries:
+            return None
+        best = max(summaries, key=lambda summary: summary["mileage_max"])
+        commits = [c for c in await self._commits(db, best) if isinstance(c.get("mileage"), (int, float))]
+        return dict(max(commits, key=lambda commit: commit["mileage"])) if commits else None
+
+    async def _containing(self, db: Any, commit_id: str, user_openid: str) -> tuple:
+        """(summary, commit) of the archived commit with this id"""
+        query = {
+            "user_openid": user_openid,
+            "id_min": {"$lte": commit_id},
+            "id_max": {"$gte": commit_id},
+            **await repo_purger.live_filter(db, user_openid),
+        }
+        async for summary in db.commit_archive.find(query, {"data": 0}):
+            for commit in await self._commits(db, summary):
+                if str(commit["_id"]) == commit_id:
+                    return summary, commit
+        return None, None
+
+    async def find_commit(self, db: Any, commit_id: str, user_openid: str) -> Optional[Dict[str, Any]]:
+        _, commit = await self._containing(db, commit_id, user_openid)
+        return dict(commit) if commit else None
+
+    # --- Moving commits between tiers ---
+
+    async def _bump(self, db: Any, repo_id: str, user_openid: str) -> None:
+        await db.repos.update_one(
+            {"_id": ObjectId(repo_id), "user_openid": user_openid},
+            {"$set": {"archive_version": datetime.now().timestamp() * 1000}},
+        )
+        self._summaries.pop(repo_id, None)
+
+    async def thaw(self, db: Any, commit_id: str, user_openid: str) -> bool:
+        """Move the segment holding an archived commit back to the commits collection so it can change"""
+        summary, _ = await self._containing(db, commit_id, user_openid)
+        if summary is None:
+            return False
+        commits = await self._commits(db, summary)
+        ids = [commit["_id"] for commit in commits]
+        present = {
+            str(doc["_id"])
+            async for doc in db.commits.find({"_id": {"$in": ids}, "user_openid": user_openid}, {"_id": 1})
+        }
+        missing = [dict(commit) for commit in commits if str(commit["_id"]) not in present]
+        if missing:
+            await db.commits.insert_many(missing, ordered=False)
+        await db.commit_archive.delete_one({"_id": summary["_id"], "user_openid": user_openid})
+        self._segments.pop(summary["_id"], None)
+        await self._bump(db, summary["repo_id"], user_openid)
+        return True
+
+    async def _settle(self, db: Any, segment_id: str, user_openid: str, chunk: List[Dict[str, Any]]) -> int:
+        """
+        Resolve commits left in both tiers by an interrupted archive: hot copies unchanged since the
+        segment was written are removed; if any was edited since, the segment is thawed instead, so
+        the edit wins and the commits are archived again by a later sweep. Returns how many moved.
+        """
+        existing = await db.commit_archive.find_one({"_id": segment_id, "user_openid": user_openid})
+        if existing is None:
+            return 0
+        archived = {str(commit["_id"]): commit for commit in decode_commits(existing["data"])}
+        both = [commit for commit in chunk if str(commit["_id"]) in archived]
+        if not all(_same_commit(commit, archived[str(commit["_id"])]) for commit in both):
+            await self.thaw(db, str(both[0]["_id"]), user_openid)
+            return 0
+        if both:
+            await db.commits.delete_many(
+                {"_id": {"$in": [commit["_id"] for commit in both]}, "user_openid": user_openid}
+            )
+        return len(both)
+
+    async def archive_repo(self, db: Any, repo_id: str, user_openid: str, cutoff: float) -> int:
+        """Move the repo's commits older than cutoff (ms) into new segments; returns how many moved"""
+        query = {"repo_id": repo_id, "user_openid": user_openid, "timestamp": {"$lt": cutoff}}
+        commits = await db.commits.find(query).sort([("timestamp", 1), ("_id", 1)]).to_list(length=None)
+        if len(commits) < self.min_commits:
+            return 0
+        moved = 0
+        dropped = False
+        for start in range(0, len(commits), self.segment_commits):
+            chunk = commits[start:start + self.segment_commits]
+            segment = build_segment(repo_id, user_openid, chunk)
+            try:
+                await db.commit_archive.insert_one(segment)
+            except DuplicateKeyError:
+                # Another worker archived these commits, or one stopped before removing the hot copies
+                moved += await self._settle(db, segment["_id"], user_openid, chunk)
+                break
+            ids = [commit["_id"] for commit in chunk]
+            hot = {
+                str(doc["_id"]): doc
+                async for doc in db.commits.find({"_id": {"$in": ids}, "user_openid": user_openid})
+            }
+            if len(hot) < len(chunk) or not all(_same_commit(hot[str(commit["_id"])], commit) for commit in chunk):
+                # Edited or deleted since they were read: the change wins, a later sweep archives them again
+                await db.commit_archive.delete_one({"_id": segment["_id"], "user_openid": user_openid})
+                dropped = True
+                break
+            await db.commits.delete_many({"_id": {"$in": ids}, "user_openid": user_openid})
+            moved += len(chunk)
+        if moved or dropped:
+            await self._bump(db, repo_id, user_openid)
+        return moved
+
+    async def sweep(self, db: Any, now_ms: Optional[float] = None) -> int:
+        if self.after_days <= 0:
+            return 0
+        cutoff = (now_ms or datetime.now().timestamp() * 1000) - self.after_days * DAY_MS
+        repos: Dict[str, str] = {}
+        deleted = await repo_purger.deleted_repo_ids(db)
+        async for commit in db.commits.find({"timestamp": {"$lt": cutoff}}, {"repo_id": 1, "user_openid": 1}):
+            if commit.get("repo_id") and commit["repo_id"] not in deleted:
+                repos[commit["repo_id"]] = commit.get("user_openid")
+        moved = 0
+        for repo_id, user_openid in repos.items():
+            if ObjectId.is_valid(repo_id):
+                moved += await self.archive_repo(db, repo_id, user_openid, cutoff)
+        if moved:
+            print(f"Archived {moved} commits from {len(repos)} repos")
+        return moved
+
+    async def _run(self, get_db: Callable[[], Any]) -> None:
+        while True:
+            await asyncio.sleep(ARCHIVE_SWEEP_SECONDS)
+            try:
+                await self.sweep(get_db())
+            except Exception as e:
+                print(f"Commit archive sweep failed: {e}")
+
+    def start(self, get_db: Callable[[], Any]) -> None:
+        if self._task is None and self.after_days > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run(get_db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+commit_archive = CommitArchive()
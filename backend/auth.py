@@ -1,17 +1,19 @@
 import os
-import ssl
-import certifi
-from datetime import datetime, timedelta
-from typing import Optional
-import httpx
+import time
+import hashlib
+import hmac
+import secrets
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
 import jwt
 from fastapi import APIRouter, HTTPException, Depends, Header, Request
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from pydantic import BaseModel
+from database import get_db
+from wechat import wechat_client
+from ratelimit import limiter
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
 
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 WECHAT_APPID = os.getenv("WECHAT_APPID", "")
@@ -28,13 +30,80 @@ if len(JWT_SECRET) < 32:
         raise RuntimeError("JWT_SECRET must be at least 32 characters for security")
 
 JWT_ALGORITHM = "HS256"
-JWT_EXPIRATION_DAYS = 7
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "120"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# A rotated refresh token presented again within this window is treated as a client retry, not theft
+REFRESH_REUSE_GRACE_SECONDS = 30
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Shared secret for operator-only debug endpoints; unset disables them
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+class TokenCache:
+    """
+    Bounded LRU of already-verified access tokens, keyed by a SHA-256 digest of the token.
+    Stores (openid, exp) so repeat requests skip HMAC verification; entries are honored only until exp.
+    """
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> Optional[str]:
+        key = hashlib.sha256(token.encode()).digest()
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        openid, exp = entry
+        if exp <= time.time():
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return openid
+
+    def put(self, token: str, openid: str, exp: float) -> None:
+        if self.max_size <= 0:
+            return
+        self._entries[hashlib.sha256(token.encode()).digest()] = (openid, exp)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+        }
+
+
+token_cache = TokenCache()
+
+
+def rotate_jwt_secret(secret: str) -> None:
+    """Switch the signing secret; tokens verified under the old secret must be re-verified"""
+    global JWT_SECRET
+    JWT_SECRET = secret
+    token_cache.clear()
 
 
 class LoginRequest(BaseModel):
     code: str
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
 async def wechat_code_to_session(code: str) -> dict:
     if not WECHAT_APPID or not WECHAT_SECRET:
         if ENVIRONMENT == "production":
@@ -49,26 +118,13 @@ async def wechat_code_to_session(code: str) -> dict:
             "unionid": "mock_unionid"
         }
 
-    url = "https://api.weixin.qq.com/sns/jscode2session"
     params = {
         "appid": WECHAT_APPID,
         "secret": WECHAT_SECRET,
         "js_code": code,
         "grant_type": "authorization_code"
     }
-    
-    try:
-        async with httpx.AsyncClient(verify=certifi.where()) as client:
-            response = await client.get(url, params=params, timeout=10.0)
-            data = response.json()
-    except httpx.ConnectError as e:
-        if "CERTIFICATE_VERIFY_FAILED" in str(e):
-            print(f"SSL verification failed, retrying without verification: {e}")
-            async with httpx.AsyncClient(verify=False) as client:
-                response = await client.get(url, params=params, timeout=10.0)
-                data = response.json()
-        else:
-            raise
+    data = await wechat_client.code_to_session(params)
     
     if "errcode" in data and data["errcode"] != 0:
         raise HTTPException(
@@ -80,7 +136,7 @@ async def wechat_code_to_session(code: str) -> dict:
 
 
 def create_access_token(openid: str) -> str:
-    expire = datetime.utcnow() + timedelta(days=JWT_EXPIRATION_DAYS)
+    expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode = {"openid": openid, "exp": expire}
     encoded_jwt = jwt.encode(to_encode, JWT_SECRET, algorithm=JWT_ALGORITHM)
     return encoded_jwt
@@ -96,32 +152,154 @@ def decode_access_token(token: str) -> dict:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
-async def get_current_user(authorization: Optional[str] = Header(None)) -> str:
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Not authenticated")
-    
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Invalid authentication scheme")
+def resolve_token(token: str) -> str:
+    """Return the openid of a valid access token, consulting the verified-token cache first"""
+    openid = token_cache.get(token)
+    if openid:
+        return openid
     
-    token = authorization.replace("Bearer ", "")
     payload = decode_access_token(token)
     openid = payload.get("openid")
     
     if not openid:
         raise HTTPException(status_code=401, detail="Invalid token payload")
     
+    if payload.get("exp"):
+        token_cache.put(token, openid, payload["exp"])
     return openid
 
 
+async def get_current_user(authorization: Optional[str] = Header(None)) -> str:
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Invalid authentication scheme")
+    
+    return resolve_token(authorization[len("Bearer "):])
+
+
+def verify_admin_token(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """Guard for debug endpoints: 404 while ADMIN_TOKEN is unset, 403 on a wrong X-Admin-Token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not verify_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+def _hash_refresh_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _now_ms() -> float:
+    return datetime.now().timestamp() * 1000
+
+
+async def issue_refresh_token(db, openid: str, family: Optional[str] = None, token: Optional[str] = None) -> str:
+    """
+    Store a long-lived opaque refresh token. Only its hash is kept server-side;
+    every token descending from one login shares a family so theft can revoke the whole chain.
+    """
+    token = token or secrets.token_urlsafe(32)
+    now = _now_ms()
+    await db.refresh_tokens.insert_one({
+        "_id": _hash_refresh_token(token),
+        "openid": openid,
+        "family": family or secrets.token_hex(8),
+        "created_at": now,
+        "expires_at": now + REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60 * 1000,
+        # The same expiry as a UTC date, for Mongo's TTL index
+        "expire_at": datetime.now(timezone.utc) + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+        "revoked_at": None,
+        "replaced_by": None
+    })
+    return token
+
+
+async def prune_refresh_tokens(db, openid: str) -> None:
+    """
+    Drop the user's expired tokens. Rotated and revoked ones are kept until then so that a stolen token
+    replayed later still revokes its family; Mongo's TTL index removes them too, the mock relies on this.
+    """
+    await db.refresh_tokens.delete_many({"openid": openid, "expires_at": {"$lt": _now_ms()}})
+
+
+async def revoke_refresh_family(db, family: str) -> None:
+    await db.refresh_tokens.update_many(
+        {"family": family, "revoked_at": None},
+        {"$set": {"revoked_at": _now_ms()}}
+    )
+
+
+def _session_response(openid: str, refresh_token: str) -> dict:
+    return {
+        "token": create_access_token(openid),
+        "refresh_token": refresh_token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "openid": openid
+    }
+
+
 @router.post("/login")
 @limiter.limit("30/minute")
 async def login(request: Request, login_req: LoginRequest):
     """
     WeChat Mini Program login endpoint.
-    Exchanges WeChat auth code for JWT token.
-    Rate limited to 5 requests per minute per IP.
+    Exchanges WeChat auth code for a short-lived JWT access token and a rotating refresh token.
+    Rate limited to 30 requests per minute per IP.
     """
     data = await wechat_code_to_session(login_req.code)
     openid = data["openid"]
-    token = create_access_token(openid)
-    return {"token": token, "openid": openid}
+    db = get_db()
+    await prune_refresh_tokens(db, openid)
+    refresh_token = await issue_refresh_token(db, openid)
+    return _session_response(openid, refresh_token)
+
+
+@router.post("/refresh")
+@limiter.limit("120/minute")
+async def refresh(request: Request, refresh_req: RefreshRequest):
+    """
+    Exchange a refresh token for a new access token and a new refresh token (rotation).
+    Purely local: no WeChat round trip. Reusing an already rotated token revokes its whole family.
+    """
+    db = get_db()
+    token_hash = _hash_refresh_token(refresh_req.refresh_token)
+    stored = await db.refresh_tokens.find_one({"_id": token_hash})
+    now = _now_ms()
+    
+    if not stored or stored["expires_at"] <= now:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    
+    if stored.get("revoked_at") is not None:
+        grace_ms = REFRESH_REUSE_GRACE_SECONDS * 1000
+        recently_rotated = stored.get("replaced_by") and now - stored["revoked_at"] < grace_ms
+        if not recently_rotated:
+            await revoke_refresh_family(db, stored["family"])
+        raise HTTPException(status_code=401, detail="Refresh token already used")
+    
+    new_token = secrets.token_urlsafe(32)
+    rotated = await db.refresh_tokens.update_one(
+        {"_id": token_hash, "revoked_at": None},
+        {"$set": {"revoked_at": now, "replaced_by": _hash_refresh_token(new_token)}}
+    )
+    if rotated.modified_count != 1:
+        raise HTTPException(status_code=401, detail="Refresh token already used")
+    
+    await prune_refresh_tokens(db, stored["openid"])
+    await issue_refresh_token(db, stored["openid"], stored["family"], new_token)
+    return _session_response(stored["openid"], new_token)
+
+
+@router.post("/logout")
+async def logout(refresh_req: RefreshRequest):
+    """Revoke the refresh token and every token rotated from the same login"""
+    db = get_db()
+    stored = await db.refresh_tokens.find_one({"_id": _hash_refresh_token(refresh_req.refresh_token)})
+    if stored:
+        await revoke_refresh_family(db, stored["family"])
+    return {"status": "logged_out"}
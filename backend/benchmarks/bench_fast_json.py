@@ -0,0 +1,67 @@
+"""
+CPU time per GET /api/commits request for one vehicle's history, serialized through
+response_model=List[Commit] against the FAST_JSON_RESPONSES row encoders. Both paths must return
+identical bytes.
+
+    python -m benchmarks.bench_fast_json [commits, default 10000] [requests per mode, default 20]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fast_json  # noqa: E402
+from benchmarks.fleet import generate_fleet, load_fleet, user_openid  # noqa: E402
+
+
+async def measure(client: httpx.AsyncClient, path: str, headers: dict, requests: int) -> tuple:
+    body = (await client.get(path, headers=headers)).content
+    cpu = wall = 0.0
+    for _ in range(requests):
+        started_cpu, started = time.process_time(), time.perf_counter()
+        response = await client.get(path, headers=headers)
+        cpu += time.process_time() - started_cpu
+        wall += time.perf_counter() - started
+        assert response.status_code == 200
+    return cpu / requests, wall / requests, body
+
+
+async def main(commits: int, requests: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATA_DIR"] = tmp
+        from auth import create_access_token
+        from database import db_manager
+        from main import app
+        from mock_db import MockDatabase
+
+        db = MockDatabase()
+        db_manager.client = None
+        db_manager.db = db
+        fleet = generate_fleet(1, 1, commits, 0)
+        await load_fleet(db, fleet)
+        path = f"/api/commits?repo_id={fleet['repos'][0]['_id']}"
+        headers = {"Authorization": f"Bearer {create_access_token(user_openid(0))}"}
+
+        results = {}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+            for label, fast in [("response_model", False), ("row encoder", True)]:
+                fast_json.FAST_JSON_RESPONSES = fast
+                results[label] = await measure(client, path, headers, requests)
+
+    baseline, fast = results["response_model"], results["row encoder"]
+    assert baseline[2] == fast[2], "fast path output differs from response_model"
+    print(f"{len(fleet['commits'])} commits, {len(fast[2]) / 1e6:.1f} MB per response, "
+          f"orjson {'on' if fast_json.orjson else 'off'}")
+    for label, (cpu, wall, _) in results.items():
+        print(f"{label:15s} cpu {cpu * 1000:7.1f} ms/request  wall {wall * 1000:7.1f} ms/request")
+    print(f"saved {(baseline[0] - fast[0]) * 1000:.1f} ms CPU per request ({1 - fast[0] / baseline[0]:.0%})")
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    asyncio.run(main(*(args + [10000, 20][len(args):])))
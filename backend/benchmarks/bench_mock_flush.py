@@ -0,0 +1,53 @@
+"""
+Write throughput of the JSON mock under concurrent load: one snapshot per change against group
+commit with a few flush windows. Every write waits for its batch to reach disk (MOCK_DB_FLUSH_WAIT).
+
+    python -m benchmarks.bench_mock_flush [writers] [writes per writer] [preloaded commits]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_db  # noqa: E402
+from benchmarks.fleet import generate_fleet, load_fleet  # noqa: E402
+
+WINDOWS_MS = [0, 1, 5, 20]
+
+
+async def run(window_ms: float, writers: int, writes: int, preload: int) -> tuple:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATA_DIR"] = tmp
+        mock_db.MOCK_DB_FLUSH_WINDOW_MS = window_ms
+        db = mock_db.MockDatabase()
+        await load_fleet(db, generate_fleet(1, 1, preload, 0))
+        flushes = db.flushes
+
+        async def writer(n: int) -> None:
+            for i in range(writes):
+                await db.commits.insert_one({"repo_id": "bench", "title": "加油费用", "mileage": n * writes + i})
+
+        started = time.perf_counter()
+        await asyncio.gather(*[writer(n) for n in range(writers)])
+        elapsed = time.perf_counter() - started
+        db.close()
+        return elapsed, db.flushes - flushes
+
+
+def main(writers: int, writes: int, preload: int) -> None:
+    total = writers * writes
+    print(f"{writers} writers x {writes} writes, {preload} commits preloaded")
+    for window_ms in WINDOWS_MS:
+        elapsed, flushes = asyncio.run(run(window_ms, writers, writes, preload))
+        print(
+            f"window {window_ms:4g} ms  {total / elapsed:9.0f} writes/s  {flushes:6d} flushes  "
+            f"{total / max(flushes, 1):7.1f} writes per flush"
+        )
+
+
+if __name__ == "__main__":
+    args = [int(arg) for arg in sys.argv[1:]]
+    main(*(args + [64, 20, 2000][len(args):]))
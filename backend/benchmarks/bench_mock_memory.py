@@ -0,0 +1,94 @@
+"""
+Resident memory of the mock store with plain dicts against MOCK_DB_COMPACT records, plus the cost of
+a full scan (one vehicle's commits) and of handing the results out as dicts. Each mode loads the same
+JSON snapshot in a fresh process.
+
+    python -m benchmarks.bench_mock_memory [commits, default 1000000]
+"""
+import asyncio
+import ctypes
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_db  # noqa: E402
+from benchmarks.fleet import generate_fleet  # noqa: E402
+
+USERS_PER_CHUNK = 50
+COMMITS_PER_VEHICLE = 500
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def _release_free_memory() -> None:
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+def write_snapshot(path: str, commits: int) -> str:
+    """Stream a snapshot of about `commits` commits, generated a chunk of users at a time"""
+    chunks = max(1, commits // (USERS_PER_CHUNK * 2 * COMMITS_PER_VEHICLE))
+    repo_id = None
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"commits": [')
+        for chunk in range(chunks):
+            fleet = generate_fleet(USERS_PER_CHUNK, 2, COMMITS_PER_VEHICLE, 0, seed=chunk)
+            docs = [{**doc, "_id": str(doc["_id"])} for doc in fleet["commits"]]
+            repo_id = repo_id or docs[0]["repo_id"]
+            f.write(("," if chunk else "") + ",".join(json.dumps(doc, ensure_ascii=False) for doc in docs))
+        f.write("]}")
+    return repo_id
+
+
+def _measure(data_dir: str, compact: bool, repo_id: str, results: "multiprocessing.Queue") -> None:
+    os.environ["DATA_DIR"] = data_dir
+    mock_db.MOCK_DB_COMPACT = compact
+    _release_free_memory()
+    rss = _rss_bytes()
+    started = time.perf_counter()
+    db = mock_db.MockDatabase()
+    count = len(db.commits.data)
+    loaded = time.perf_counter() - started
+    _release_free_memory()
+    rss = _rss_bytes() - rss
+
+    started = time.perf_counter()
+    docs = asyncio.run(db.commits.find({"repo_id": repo_id}).sort("timestamp", -1).to_list())
+    scanned = time.perf_counter() - started
+    results.put((count, rss, loaded, scanned, len(docs)))
+
+
+def main(commits: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        repo_id = write_snapshot(os.path.join(tmp, "mock_db_data.json"), commits)
+        print(f"snapshot: {os.path.getsize(os.path.join(tmp, 'mock_db_data.json')) / 1e6:.0f} MB")
+        context = multiprocessing.get_context("spawn")
+        for label, compact in [("dicts", False), ("compact", True)]:
+            results = context.Queue()
+            process = context.Process(target=_measure, args=(tmp, compact, repo_id, results))
+            process.start()
+            count, rss, loaded, scanned, matched = results.get()
+            process.join()
+            print(
+                f"{label:8s} {count} commits  rss +{rss / 1e6:7.0f} MB ({rss / count:5.0f} B/commit)  "
+                f"load {loaded:6.1f} s  scan+dicts {scanned * 1000:6.0f} ms ({matched} matched)"
+            )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
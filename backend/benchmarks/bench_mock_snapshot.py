@@ -0,0 +1,91 @@
+"""
+Cold-start cost of MockDatabase snapshots: JSON load() against the binary format, opened lazily and
+fully decoded. Each measurement runs in a fresh process; memory is the resident-set growth across
+the load plus the Python heap a load allocates.
+
+    python -m benchmarks.bench_mock_snapshot [users] [commits per vehicle]
+"""
+import asyncio
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import mock_db  # noqa: E402
+from benchmarks.fleet import generate_fleet, load_fleet  # noqa: E402
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return 0
+
+
+def _measure(data_dir: str, fmt: str, touch: bool, results: "multiprocessing.Queue") -> None:
+    os.environ["DATA_DIR"] = data_dir
+    mock_db.MOCK_DB_FORMAT = fmt
+
+    def load() -> mock_db.MockDatabase:
+        db = mock_db.MockDatabase()
+        if touch:
+            for collection in list(db.collections.values()):
+                collection.data
+        return db
+
+    rss = _rss_bytes()
+    started = time.perf_counter()
+    db = load()
+    elapsed = time.perf_counter() - started
+    rss = _rss_bytes() - rss
+    # Heap is measured on a second load: tracemalloc slows allocation down too much to time with it on
+    del db
+    tracemalloc.start()
+    db = load()
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    results.put((elapsed, rss, heap))
+
+
+def measure(data_dir: str, fmt: str, touch: bool) -> tuple:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=_measure, args=(data_dir, fmt, touch, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main(users: int, commits: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATA_DIR"] = tmp
+        mock_db.MOCK_DB_FORMAT = "json"
+        db = mock_db.MockDatabase()
+        fleet = generate_fleet(users, 2, commits, 20)
+        asyncio.run(load_fleet(db, fleet))
+        mock_db.MOCK_DB_FORMAT = "binary"
+        db.format = "binary"
+        db.save()
+
+        json_size = os.path.getsize(db.file_path)
+        binary_size = os.path.getsize(db.binary_path)
+        print(f"documents:      {sum(len(docs) for docs in fleet.values())}")
+        print(f"json snapshot:  {json_size / 1e6:8.2f} MB")
+        print(f"binary:         {binary_size / 1e6:8.2f} MB")
+        for label, fmt, touch in [
+            ("json load()", "json", False),
+            ("binary open", "binary", False),
+            ("binary decoded", "binary", True),
+        ]:
+            elapsed, rss, heap = measure(tmp, fmt, touch)
+            print(f"{label:15s} {elapsed * 1000:9.1f} ms  rss +{rss / 1e6:7.1f} MB  heap {heap / 1e6:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50, int(sys.argv[2]) if len(sys.argv) > 2 else 500)
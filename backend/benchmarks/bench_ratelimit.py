@@ -0,0 +1,37 @@
+"""
+Micro-benchmark for the cost of one rate-limit check per storage backend.
+
+    python -m benchmarks.bench_ratelimit [iterations]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from limits import RateLimitItemPerMinute  # noqa: E402
+from limits.storage import storage_from_string  # noqa: E402
+from limits.strategies import FixedWindowRateLimiter  # noqa: E402
+
+import ratelimit  # noqa: E402,F401  (registers the sqlite:// scheme)
+
+
+def measure(uri: str, iterations: int) -> float:
+    strategy = FixedWindowRateLimiter(storage_from_string(uri))
+    limit = RateLimitItemPerMinute(iterations * 2)
+    started = time.perf_counter()
+    for i in range(iterations):
+        strategy.hit(limit, f"user:{i % 100}")
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main(iterations: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"iterations:     {iterations}")
+        print(f"memory://       {measure('memory://', iterations):8.2f} us/check")
+        print(f"sqlite://       {measure(f'sqlite:///{tmp}/ratelimit.db', iterations):8.2f} us/check")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
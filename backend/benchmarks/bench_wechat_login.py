@@ -0,0 +1,80 @@
+"""
+Login burst benchmark against a local jscode2session stand-in server.
+Compares a new httpx client per login (the previous behaviour) with the pooled,
+single-flight WeChatSessionClient.
+
+    python -m benchmarks.bench_wechat_login [burst_size]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+import uvicorn
+from fastapi import FastAPI
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wechat import WeChatSessionClient  # noqa: E402
+
+PORT = 18931
+UPSTREAM_DELAY_SECONDS = 0.02
+
+stand_in = FastAPI()
+
+
+@stand_in.get("/sns/jscode2session")
+async def jscode2session(js_code: str):
+    await asyncio.sleep(UPSTREAM_DELAY_SECONDS)
+    return {"openid": f"openid-{js_code}", "session_key": "k"}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def burst(login, size):
+    latencies = []
+
+    async def one(i):
+        started = time.perf_counter()
+        # Every tenth login is a client retry of the previous code
+        await login({"js_code": f"code-{i - i % 10 if i % 10 == 9 else i}"})
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(*[one(i) for i in range(size)])
+    return latencies
+
+
+async def main(size):
+    server = uvicorn.Server(uvicorn.Config(stand_in, port=PORT, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+
+    base_url = f"http://127.0.0.1:{PORT}"
+
+    async def per_call_client(params):
+        async with httpx.AsyncClient(base_url=base_url) as client:
+            return (await client.get("/sns/jscode2session", params=params)).json()
+
+    pooled = WeChatSessionClient(base_url=base_url)
+    await pooled.start()
+
+    for name, login in [("client per login", per_call_client), ("pooled single-flight", pooled.code_to_session)]:
+        await burst(login, 10)
+        latencies = await burst(login, size)
+        print(f"{name:22s} p50={statistics.median(latencies):7.1f}ms "
+              f"p99={percentile(latencies, 99):7.1f}ms max={max(latencies):7.1f}ms")
+    print(f"pooled client stats: {pooled.stats()}")
+
+    await pooled.close()
+    server.should_exit = True
+    await serve_task
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
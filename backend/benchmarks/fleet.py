@@ -0,0 +1,168 @@
+"""
+Deterministic synthetic fleet: N users x M vehicles x K commits / issues per vehicle, with a realistic
+record type mix, monotonic mileage progression over time and the Chinese titles the mini program uses.
+The same seed always produces the same documents, so benchmark runs are comparable.
+
+    python -m benchmarks.fleet --users 10 --vehicles 2 --commits 500 --issues 20
+"""
+import argparse
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+from bson import ObjectId
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import priority_rank  # noqa: E402
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+# (type, weight, titles, typical cost) following the record templates in miniprogram/data/templates.ts
+RECORD_MIX = [
+    ("fuel", 45, ["加油费用", "加满92号", "加满95号"], 300),
+    ("parking", 15, ["停车费用", "商场停车", "机场停车"], 50),
+    ("maintenance", 18, ["更换机油", "倒胎存胎", "更换空滤", "更换冷却液", "小保养", "大保养"], 400),
+    ("repair", 8, ["更换火花塞", "更换刹车片", "更换蓄电池", "补胎"], 550),
+    ("inspection", 3, ["年检费用"], 300),
+    ("insurance", 3, ["保险费用", "商业险续保"], 4000),
+    ("modification", 2, ["改装音响", "贴膜", "加装行车记录仪"], 2500),
+    ("other", 6, ["其他费用", "洗车", "过路费"], 100),
+]
+
+ISSUE_TITLES = ["下次保养", "更换轮胎", "检查刹车", "更换雨刮", "四轮定位", "更换变速箱油", "空调清洗", "年检预约"]
+VEHICLE_NAMES = ["卡罗拉", "思域", "Model 3", "朗逸", "帕萨特", "CR-V", "汉EV", "理想L7", "途观", "凯美瑞"]
+COLORS = ["#2c3e50", "#1a73e8", "#c0392b", "#ecf0f1", "#7f8c8d"]
+
+
+def user_openid(index: int) -> str:
+    return f"bench_user_{index:05d}"
+
+
+def generate_fleet(users: int, vehicles: int, commits: int, issues: int, seed: int = 42,
+                   now: datetime = datetime(2026, 1, 1)) -> Dict[str, List[Dict[str, Any]]]:
+    """Return {"repos": [...], "commits": [...], "issues": [...]} ready to insert"""
+    rng = random.Random(seed)
+    types, weights = [m[0] for m in RECORD_MIX], [m[1] for m in RECORD_MIX]
+    mix = {m[0]: m for m in RECORD_MIX}
+    now_ms = now.timestamp() * 1000
+    fleet: Dict[str, List[Dict[str, Any]]] = {"repos": [], "commits": [], "issues": []}
+
+    for u in range(users):
+        openid = user_openid(u)
+        for v in range(vehicles):
+            repo_oid = ObjectId(f"{u:08x}{v:08x}{0:08x}")
+            repo_id = str(repo_oid)
+            initial_mileage = rng.randrange(0, 60000, 100)
+            history_days = rng.randint(365, 5 * 365)
+            start_ms = now_ms - history_days * DAY_MS
+            daily_km = rng.uniform(15, 80)
+
+            mileage = initial_mileage
+            timestamps = sorted(rng.uniform(start_ms, now_ms) for _ in range(commits))
+            last_ts = start_ms
+            head = ""
+            for c, ts in enumerate(timestamps):
+                mileage += int(daily_km * (ts - last_ts) / DAY_MS)
+                last_ts = ts
+                kind = rng.choices(types, weights)[0]
+                _, _, titles, typical = mix[kind]
+                title = rng.choice(titles)
+                parts = round(typical * rng.uniform(0.7, 1.3), 2)
+                labor = round(parts * rng.uniform(0.1, 0.4), 2) if kind in ("maintenance", "repair") else 0.0
+                fleet["commits"].append({
+                    "_id": ObjectId(f"{u:08x}{v:08x}{c + 1:08x}"),
+                    "repo_id": repo_id,
+                    "user_openid": openid,
+                    "images": [],
+                    "title": title,
+                    "message": f"{title} @ {mileage}km",
+                    "mileage": mileage,
+                    "type": kind,
+                    "cost": {"parts": parts, "labor": labor, "currency": "CNY"},
+                    "closes_issues": [],
+                    "timestamp": ts,
+                })
+                head = title
+
+            for i in range(issues):
+                status = "open" if rng.random() < 0.6 else "closed"
+                priority = rng.choices(["high", "medium", "low"], [2, 5, 3])[0]
+                by_mileage = rng.random() < 0.5
+                fleet["issues"].append({
+                    "_id": ObjectId(f"{u:08x}{v:08x}{0x80000000 + i:08x}"),
+                    "repo_id": repo_id,
+                    "user_openid": openid,
+                    "title": rng.choice(ISSUE_TITLES),
+                    "description": None,
+                    "status": status,
+                    "priority": priority,
+                    "priority_rank": priority_rank(priority),
+                    "labels": [],
+                    "due_date": None if by_mileage else now_ms + rng.randint(-30, 180) * DAY_MS,
+                    "due_mileage": mileage + rng.randrange(-500, 8000, 100) if by_mileage else None,
+                    "created_at": now_ms - rng.randint(0, 365) * DAY_MS,
+                    "closed_at": now_ms if status == "closed" else None,
+                    "closed_by_commit_id": None,
+                })
+
+            fleet["repos"].append({
+                "_id": repo_oid,
+                "user_openid": openid,
+                "name": f"{rng.choice(VEHICLE_NAMES)} #{v + 1}",
+                "vin": f"LBV{u:06d}{v:05d}BEN",
+                "color": rng.choice(COLORS),
+                "current_mileage": mileage,
+                "initial_mileage": initial_mileage,
+                "current_head": head,
+                "branch": "main",
+                "purchase_date": start_ms,
+                "compulsory_insurance_expiry": now_ms + rng.randint(-10, 365) * DAY_MS,
+                "commercial_insurance_expiry": now_ms + rng.randint(-10, 365) * DAY_MS,
+                "inspection_expiry": now_ms + rng.randint(0, 730) * DAY_MS,
+                "created_at": start_ms,
+                "deleted_at": None,
+            })
+    return fleet
+
+
+async def load_fleet(db: Any, fleet: Dict[str, List[Dict[str, Any]]]) -> None:
+    """Insert a generated fleet; the mock database is filled in memory and saved once"""
+    from mock_db import MockDatabase
+
+    if isinstance(db, MockDatabase):
+        for name, docs in fleet.items():
+            collection = getattr(db, name)
+            collection.data = collection.data + [dict(doc) for doc in docs]
+        db.save()
+        return
+    for name, docs in fleet.items():
+        if docs:
+            await getattr(db, name).insert_many([dict(doc) for doc in docs], ordered=False)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--vehicles", type=int, default=2)
+    parser.add_argument("--commits", type=int, default=500)
+    parser.add_argument("--issues", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    fleet = generate_fleet(args.users, args.vehicles, args.commits, args.issues, args.seed)
+    for name, docs in fleet.items():
+        print(f"{name:8s} {len(docs)}")
+    type_counts: Dict[str, int] = {}
+    for commit in fleet["commits"]:
+        type_counts[commit["type"]] = type_counts.get(commit["type"], 0) + 1
+    print("types   ", dict(sorted(type_counts.items(), key=lambda item: -item[1])))
+    span = timedelta(milliseconds=max(c["timestamp"] for c in fleet["commits"]) - min(
+        c["timestamp"] for c in fleet["commits"])) if fleet["commits"] else timedelta()
+    print(f"history  {span.days} days")
+
+
+if __name__ == "__main__":
+    main()
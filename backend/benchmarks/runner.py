@@ -0,0 +1,293 @@
+"""
+End-to-end route benchmark over a synthetic fleet (see benchmarks/fleet.py).
+Every API route is driven through an in-process ASGI client at a fixed concurrency; per-route
+p50/p95/p99 latency and throughput are printed and can be saved as a JSON baseline and compared
+against a previous run.
+
+    python -m benchmarks.runner --backend mock --requests 200 --concurrency 16 --save baseline.json
+    python -m benchmarks.runner --backend sqlite --compare baseline.json
+
+Rate limiting is disabled for the run; admission control and coalescing stay on, so non-2xx
+responses are reported per route rather than hidden.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fleet import generate_fleet, load_fleet, user_openid  # noqa: E402
+
+# (name, method, path template, body builder key, request count multiplier)
+SCENARIOS: List[Tuple[str, str, str, Optional[str], float]] = [
+    ("list_repos", "GET", "/api/repos", None, 1),
+    ("get_repo", "GET", "/api/repos/{repo_id}", None, 1),
+    ("list_commits", "GET", "/api/commits?repo_id={repo_id}", None, 1),
+    ("get_commit", "GET", "/api/commits/{commit_id}", None, 1),
+    ("suggest", "GET", "/api/suggest?prefix=更&repo_id={repo_id}", None, 1),
+    ("list_issues", "GET", "/api/repos/{repo_id}/issues", None, 1),
+    ("reminders", "GET", "/api/reminders?days=60", None, 1),
+    ("stats", "GET", "/api/repos/{repo_id}/stats", None, 1),
+    ("trends", "GET", "/api/repos/{repo_id}/trends?months=12", None, 1),
+    ("create_commit", "POST", "/api/commits", "commit", 1),
+    ("update_commit", "PUT", "/api/commits/{commit_id}", "commit_patch", 1),
+    ("delete_commit", "DELETE", "/api/commits/{created_commit_id}", None, 1),
+    ("create_issue", "POST", "/api/repos/{repo_id}/issues", "issue", 1),
+    ("update_issue", "PATCH", "/api/issues/{issue_id}", "issue_patch", 1),
+    ("delete_issue", "DELETE", "/api/issues/{created_issue_id}", None, 1),
+    ("update_repo", "PUT", "/api/repos/{repo_id}", "repo", 0.5),
+    ("export_pdf", "GET", "/api/repos/{repo_id}/export/pdf-base64", None, 0.05),
+    ("create_repo", "POST", "/api/repos", "new_repo", 0.25),
+    ("delete_repo", "DELETE", "/api/repos/{created_repo_id}", None, 0.25),
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class Workload:
+    """Picks users/repos round-robin and remembers ids created by write scenarios for later ones"""
+
+    def __init__(self, fleet: Dict[str, List[Dict[str, Any]]], seed: int) -> None:
+        from auth import create_access_token
+
+        self.rng = random.Random(seed)
+        self.repos = [(r["user_openid"], str(r["_id"]), r["current_mileage"]) for r in fleet["repos"]]
+        self.commits: Dict[str, List[str]] = {}
+        for commit in fleet["commits"]:
+            self.commits.setdefault(commit["repo_id"], []).append(str(commit["_id"]))
+        self.issues: Dict[str, List[str]] = {}
+        for issue in fleet["issues"]:
+            self.issues.setdefault(issue["repo_id"], []).append(str(issue["_id"]))
+        self.tokens = {openid: create_access_token(openid) for openid in {r[0] for r in self.repos}}
+        self.created: Dict[str, List[Tuple[str, str]]] = {"commit": [], "issue": [], "repo": []}
+        self._next = 0
+
+    def request(self, method: str, template: str, body_kind: Optional[str]) -> Tuple[str, str, Any, Dict[str, str]]:
+        openid, repo_id, mileage = self.repos[self._next % len(self.repos)]
+        self._next += 1
+        params: Dict[str, Any] = {"repo_id": repo_id}
+        for kind in ("commit", "issue", "repo"):
+            if f"{{created_{kind}_id}}" in template:
+                openid, params[f"created_{kind}_id"] = self.created[kind].pop()
+        if "{commit_id}" in template:
+            params["commit_id"] = self.rng.choice(self.commits.get(repo_id) or ["0" * 24])
+        if "{issue_id}" in template:
+            params["issue_id"] = self.rng.choice(self.issues.get(repo_id) or ["0" * 24])
+
+        body = {
+            None: None,
+            "commit": {"repo_id": repo_id, "title": "加油费用", "type": "fuel", "mileage": mileage + self._next,
+                       "cost": {"parts": 300, "labor": 0}},
+            "commit_patch": {"message": "benchmark update"},
+            "issue": {"repo_id": repo_id, "title": "下次保养", "due_mileage": mileage + 5000},
+            "issue_patch": {"priority": self.rng.choice(["high", "medium", "low"])},
+            "repo": {"name": "基准测试车辆", "current_mileage": mileage},
+            "new_repo": {"name": "基准测试新车", "current_mileage": 1000, "initial_mileage": 1000},
+        }[body_kind]
+        headers = {"Authorization": f"Bearer {self.tokens[openid]}"}
+        return method, template.format(**params), body, headers
+
+    def remember(self, name: str, headers: Dict[str, str], response: httpx.Response) -> None:
+        kind = {"create_commit": "commit", "create_issue": "issue", "create_repo": "repo"}.get(name)
+        if kind and response.status_code == 200:
+            token = headers["Authorization"][len("Bearer "):]
+            openid = next(o for o, t in self.tokens.items() if t == token)
+            self.created[kind].append((openid, response.json()["_id"]))
+
+
+async def run_scenario(client: httpx.AsyncClient, workload: Workload, name: str, method: str, template: str,
+                       body_kind: Optional[str], count: int, concurrency: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    queue: asyncio.Queue = asyncio.Queue()
+    for _ in range(count):
+        queue.put_nowait(workload.request(method, template, body_kind))
+
+    async def worker() -> None:
+        while not queue.empty():
+            req_method, url, body, headers = queue.get_nowait()
+            started = time.perf_counter()
+            response = await client.request(req_method, url, json=body, headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            workload.remember(name, headers, response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(min(concurrency, count))])
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "statuses": statuses,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(statistics.fmean(latencies), 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+    }
+
+
+async def open_database(backend: str, mongo_url: str) -> Tuple[Any, Callable[[], Any]]:
+    from database import db_manager
+
+    if backend == "mongo":
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        client = AsyncIOMotorClient(mongo_url, serverSelectionTimeoutMS=2000)
+        await client.drop_database("autorepo_bench")
+        db_manager.client = client
+        db_manager.db = client.autorepo_bench
+        await db_manager.create_indexes()
+
+        async def close() -> None:
+            await client.drop_database("autorepo_bench")
+            client.close()
+        return db_manager.db, close
+
+    directory = tempfile.mkdtemp(prefix="autorepo-bench-")
+    if backend == "sqlite":
+        from sqlite_db import SQLiteDatabase
+
+        sqlite = SQLiteDatabase(os.path.join(directory, "bench.sqlite3"))
+        db_manager.client = None
+        db_manager.db = sqlite
+
+        async def close_sqlite() -> None:
+            sqlite.close()
+            shutil.rmtree(directory, ignore_errors=True)
+        return sqlite, close_sqlite
+
+    from mock_db import MockDatabase
+
+    os.environ["DATA_DIR"] = directory
+    db = MockDatabase()
+    db_manager.client = None
+    db_manager.db = db
+
+    async def close_mock() -> None:
+        if os.path.exists(db.file_path):
+            os.remove(db.file_path)
+    return db, close_mock
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from main import app
+    from ratelimit import limiter
+    from reminders import reminder_engine
+
+    limiter.enabled = False
+    db, close = await open_database(args.backend, args.mongo_url)
+    fleet = generate_fleet(args.users, args.vehicles, args.commits, args.issues, args.seed)
+    started = time.perf_counter()
+    await load_fleet(db, fleet)
+    print(f"Loaded {len(fleet['repos'])} repos, {len(fleet['commits'])} commits, {len(fleet['issues'])} issues "
+          f"into {args.backend} in {time.perf_counter() - started:.2f}s")
+    await reminder_engine.rebuild(db)
+
+    workload = Workload(fleet, args.seed)
+    results: Dict[str, Any] = {}
+    transport = httpx.ASGITransport(app=app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name, method, template, body_kind, multiplier in SCENARIOS:
+                if args.only and name not in args.only:
+                    continue
+                count = max(1, int(args.requests * multiplier))
+                if "{created_" in template:
+                    kind = template.split("{created_")[1].split("_id}")[0]
+                    count = min(count, len(workload.created[kind]))
+                    if not count:
+                        continue
+                results[name] = await run_scenario(
+                    client, workload, name, method, template, body_kind, count, args.concurrency
+                )
+                r = results[name]
+                print(f"{name:14s} n={r['requests']:5d} p50={r['p50_ms']:9.2f}ms p95={r['p95_ms']:9.2f}ms "
+                      f"p99={r['p99_ms']:9.2f}ms {r['throughput_rps']:8.1f} req/s {r['statuses']}")
+    finally:
+        await close()
+
+    return {
+        "meta": {
+            "backend": args.backend,
+            "users": args.users,
+            "vehicles": args.vehicles,
+            "commits_per_vehicle": args.commits,
+            "issues_per_vehicle": args.issues,
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "seed": args.seed,
+            "python": platform.python_version(),
+            "at": datetime.now().isoformat(timespec="seconds"),
+        },
+        "routes": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> int:
+    """Print per-route changes against a baseline; returns the number of regressions beyond threshold"""
+    regressions = 0
+    print(f"\nCompared with baseline from {baseline['meta'].get('at')} (regression threshold {threshold:.0%})")
+    for name, result in current["routes"].items():
+        before = baseline["routes"].get(name)
+        if not before:
+            continue
+        changes = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            delta = (result[metric] - before[metric]) / before[metric] if before[metric] else 0
+            changes.append(f"{metric[:-3]} {delta:+7.1%}")
+            regressions += delta > threshold
+        rps = before["throughput_rps"]
+        delta = (result["throughput_rps"] - rps) / rps if rps else 0
+        changes.append(f"rps {delta:+7.1%}")
+        regressions += delta < -threshold
+        print(f"{name:14s} " + "  ".join(changes))
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["mock", "sqlite", "mongo"], default="mock")
+    parser.add_argument("--mongo-url", default=os.getenv("MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--vehicles", type=int, default=2)
+    parser.add_argument("--commits", type=int, default=500, help="commits per vehicle")
+    parser.add_argument("--issues", type=int, default=20, help="issues per vehicle")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--save", help="write results to this JSON baseline")
+    parser.add_argument("--compare", help="compare with a previously saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative change counted as a regression")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"Saved results to {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"{regressions} regressions beyond threshold")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
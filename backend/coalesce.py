@@ -0,0 +1,125 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+# How long a finished result keeps answering identical requests (e.g. client retries); per worker, see
+# RequestCoalescer for what that means with several workers
+COALESCE_LINGER_SECONDS = float(os.getenv("COALESCE_LINGER_SECONDS", "2"))
+COALESCE_MAX_RESULTS = 1024
+
+Key = Tuple[Any, ...]
+
+
+class RequestCoalescer:
+    """
+    Single-flight for read endpoints.
+    Identical concurrent requests (same route, user, repo, params and repo version) await one shared
+    computation, and the result lingers briefly for requests arriving just after it finished.
+    Writes bump the repo version, so nothing computed before a write is ever served after it.
+
+    Single-worker only: versions live in this process, and a write handled by another worker does
+    not bump them. With several workers a read may then be answered from a computation that started
+    before that write, or from a lingering result up to COALESCE_LINGER_SECONDS old. Such deployments
+    should run with COALESCE_LINGER_SECONDS=0, which leaves only requests overlapping a computation
+    that was already running when the other worker's write landed.
+    """
+
+    def __init__(self, linger_seconds: float = COALESCE_LINGER_SECONDS, max_results: int = COALESCE_MAX_RESULTS):
+        self.linger_seconds = linger_seconds
+        self.max_results = max_results
+        self._inflight: Dict[Key, asyncio.Future] = {}
+        self._recent: "OrderedDict[Key, Tuple[float, Any]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self.reset_metrics()
+
+    def reset_metrics(self) -> None:
+        self.computed = 0
+        self.shared = 0
+        self.lingered = 0
+
+    def reset(self) -> None:
+        self._inflight.clear()
+        self._recent.clear()
+        self._versions.clear()
+        self.reset_metrics()
+
+    def version(self, repo_id: Optional[str]) -> int:
+        return self._versions.get(repo_id, 0)
+
+    def bump(self, repo_id: Optional[str]) -> None:
+        """Mark a repo's data as changed; in-flight and lingering results for it stop being shared"""
+        if repo_id:
+            self._versions[repo_id] = self._versions.get(repo_id, 0) + 1
+
+    def _key(self, route: str, user_openid: str, repo_id: Optional[str], params: Dict[str, Any]) -> Key:
+        return (route, user_openid, repo_id, tuple(sorted(params.items())), self.version(repo_id))
+
+    def _remember(self, key: Key, result: Any) -> None:
+        now = time.monotonic()
+        self._recent[key] = (now + self.linger_seconds, result)
+        self._recent.move_to_end(key)
+        while self._recent:
+            oldest_key, (expires_at, _) = next(iter(self._recent.items()))
+            if expires_at > now and len(self._recent) <= self.max_results:
+                break
+            del self._recent[oldest_key]
+
+    async def run(self, route: str, user_openid: str, repo_id: Optional[str], params: Dict[str, Any],
+                  compute: Callable[[], Awaitable[Any]]) -> Any:
+        key = self._key(route, user_openid, repo_id, params)
+
+        recent = self._recent.get(key)
+        if recent is not None and recent[0] > time.monotonic():
+            self.lingered += 1
+            return recent[1]
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.shared += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only recompute when the leading request was cancelled, not this one
+                if not pending.cancelled():
+                    raise
+                self.shared -= 1
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self.computed += 1
+        try:
+            result = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            # A write that landed during the computation already bumped the version; don't linger then
+            if self.linger_seconds > 0 and self.version(repo_id) == key[-1]:
+                self._remember(key, result)
+            return result
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def stats(self) -> Dict[str, Any]:
+        saved = self.shared + self.lingered
+        total = self.computed + saved
+        return {
+            "computed": self.computed,
+            "shared_in_flight": self.shared,
+            "served_from_linger": self.lingered,
+            "saved": saved,
+            "saved_ratio": round(saved / total, 3) if total else 0,
+            "in_flight": len(self._inflight),
+            "lingering": len(self._recent),
+        }
+
+
+request_coalescer = RequestCoalescer()
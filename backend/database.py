@@ -1,8 +1,12 @@
 from typing import Any
 import os
 
+from metrics import INSTRUMENTATION_ENABLED, InstrumentedDatabase
+
 ENVIRONMENT = os.getenv("ENVIRONMENT", "development")
 REQUIRE_MONGODB = os.getenv("REQUIRE_MONGODB", "false").lower() == "true"
+# mongo (falls back to the JSON mock when unreachable), sqlite or mock
+DB_BACKEND = os.getenv("DB_BACKEND", "mongo").lower()
 
 
 class DatabaseManager:
@@ -11,6 +15,23 @@ class DatabaseManager:
         self.db: Any = None
 
     async def connect(self) -> None:
+        if DB_BACKEND == "sqlite":
+            import sqlite_db
+            self.db = sqlite_db.SQLiteDatabase()
+            self.client = None
+            print(f"Using SQLite database at {self.db.path}")
+        elif DB_BACKEND == "mock":
+            import mock_db  # type: ignore[import-not-found]
+            self.db = mock_db.open_mock_database()
+            self.client = None
+            print("Using Mock Database")
+        else:
+            await self._connect_mongo()
+
+        if INSTRUMENTATION_ENABLED:
+            self.db = InstrumentedDatabase(self.db)
+
+    async def _connect_mongo(self) -> None:
         mongo_url = os.getenv("MONGO_URL", "mongodb://localhost:27017")
         try:
             from motor.motor_asyncio import AsyncIOMotorClient
@@ -23,7 +44,7 @@ class DatabaseManager:
                 raise RuntimeError(f"MongoDB connection required (REQUIRE_MONGODB=true): {e}")
             print(f"Warning: Could not connect to MongoDB ({e}). Using Mock Database.")
             import mock_db  # type: ignore[import-not-found]
-            self.db = mock_db.MockDatabase()
+            self.db = mock_db.open_mock_database()
             self.client = None
 
     async def create_indexes(self) -> None:
@@ -51,11 +72,37 @@ class DatabaseManager:
             ("due_mileage", 1),
             ("status", 1)
         ])
+        
+        await self.db.issues.create_index([
+            ("user_openid", 1),
+            ("repo_id", 1),
+            ("status", 1),
+            ("priority_rank", 1),
+            ("due_date", 1)
+        ])
+        
+        await self.db.commit_archive.create_index([("user_openid", 1), ("repo_id", 1)])
+        await self.db.commit_archive.create_index([("user_openid", 1), ("id_min", 1), ("id_max", 1)])
+        
+        # Startup rebuild of the reminder index
+        await self.db.issues.create_index([("status", 1), ("due_date", 1)])
+        await self.db.issues.create_index([("status", 1), ("due_mileage", 1)])
+        
+        await self.db.refresh_tokens.create_index("family")
+        await self.db.refresh_tokens.create_index([("openid", 1), ("expires_at", 1)])
+        # Rotated refresh tokens are kept for reuse detection until they expire, then removed by the TTL monitor
+        await self.db.refresh_tokens.create_index("expire_at", expireAfterSeconds=0)
+        
+        # Idempotency keys are removed by Mongo's TTL monitor once expire_at passes
+        await self.db.idempotency_keys.create_index("expire_at", expireAfterSeconds=0)
 
     async def close(self) -> None:
         if self.client:
             self.client.close()
             print("Closed MongoDB connection")
+        elif self.db is not None:
+            # SQLite connections; the mock writes out changes still waiting for a group commit
+            self.db.close()
 
 db_manager = DatabaseManager()
 
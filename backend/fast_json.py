@@ -0,0 +1,115 @@
+import json
+import os
+import typing
+from typing import Any, Callable, Dict, Iterable, List, Type, Union
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # the schema encoders still skip pydantic; rows are then dumped with json
+    orjson = None
+
+# Serialize list responses (repos, commits, issues) with per-model row encoders instead of response_model
+FAST_JSON_RESPONSES = os.getenv("FAST_JSON_RESPONSES", "false").lower() == "true"
+
+
+class _Mismatch(Exception):
+    """A stored value the fast path does not know to be valid as-is"""
+
+
+def _required() -> Any:
+    raise _Mismatch
+
+
+def _converter(annotation: Any) -> Callable[[Any], Any]:
+    """What pydantic's validation then JSON serialization does to an already valid value of this type"""
+    args = typing.get_args(annotation)
+    if typing.get_origin(annotation) is Union and type(None) in args and len(args) == 2:
+        inner = _converter(args[0] if args[1] is type(None) else args[1])
+        return lambda value: None if value is None else inner(value)
+    if annotation is str or annotation is int or annotation is bool:
+        def exact(value: Any) -> Any:
+            if type(value) is not annotation:
+                raise _Mismatch
+            return value
+        return exact
+    if annotation is float:
+        def number(value: Any) -> Any:
+            kind = type(value)
+            if kind is float:
+                return value
+            if kind is int:
+                return float(value)
+            raise _Mismatch
+        return number
+    if typing.get_origin(annotation) is list and args == (str,):
+        def strings(value: Any) -> Any:
+            if type(value) is not list or any(type(item) is not str for item in value):
+                raise _Mismatch
+            return list(value)
+        return strings
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        nested = RowEncoder(annotation)
+
+        def model(value: Any) -> Any:
+            if not isinstance(value, dict):
+                raise _Mismatch
+            return nested.row(value)
+        return model
+    raise TypeError(f"No row encoder for {annotation!r}")
+
+
+class RowEncoder:
+    """
+    Serializes stored documents exactly as response_model=List[model] would, without building models:
+    each field's value is checked to already have its declared type and emitted as pydantic would
+    (by alias, ints widened where a float is declared, defaults filled in, unknown keys dropped).
+    A document the checks do not cover goes through the model like before.
+    """
+
+    def __init__(self, model: Type[BaseModel]) -> None:
+        self.model = model
+        self.fields = []
+        for name, info in model.model_fields.items():
+            if info.is_required():
+                factory = _required
+            else:
+                factory = info.default_factory or (lambda default=info.default: default)
+            self.fields.append((info.alias or name, _converter(info.annotation), factory))
+
+    def row(self, doc: Dict[str, Any]) -> Dict[str, Any]:
+        out = {}
+        for key, convert, factory in self.fields:
+            out[key] = convert(doc[key] if key in doc else factory())
+        return out
+
+    def rows(self, docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        out = []
+        for doc in docs:
+            try:
+                out.append(self.row(doc))
+            except _Mismatch:
+                out.append(self.model.model_validate(doc).model_dump(mode="json", by_alias=True))
+        return out
+
+    def encode(self, docs: Iterable[Dict[str, Any]]) -> bytes:
+        rows = self.rows(docs)
+        if orjson is not None:
+            return orjson.dumps(rows)
+        return json.dumps(rows, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+_encoders: Dict[Type[BaseModel], RowEncoder] = {}
+
+
+def list_response(model: Type[BaseModel], docs: List[Dict[str, Any]]) -> Any:
+    """The route's return value for a list of stored documents (ids already strings)"""
+    if not FAST_JSON_RESPONSES:
+        return docs
+    encoder = _encoders.get(model)
+    if encoder is None:
+        encoder = _encoders[model] = RowEncoder(model)
+    # A returned Response bypasses response_model; the OpenAPI schema still comes from the decorator
+    return Response(content=encoder.encode(docs), media_type="application/json")
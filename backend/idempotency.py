@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# A pending key whose request has not finished after this long is considered abandoned
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "60"))
+# How long a duplicate handled by another worker waits for the original before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+IDEMPOTENCY_POLL_SECONDS = 0.1
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+
+def _now_ms() -> float:
+    return datetime.now().timestamp() * 1000
+
+
+def request_hash(payload: Any) -> str:
+    body = json.dumps(jsonable_encoder(payload), sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Replays the stored response of a write that already ran under the same Idempotency-Key.
+    Keys live in the idempotency_keys collection (TTL-indexed on Mongo, pruned at startup on the mock)
+    and are scoped per user and operation. While the first request is still running, duplicates
+    wait for it: in-process via a shared future, across workers by polling the stored record.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.replayed = 0
+        self.executed = 0
+
+    def reset(self) -> None:
+        self._inflight.clear()
+        self.replayed = 0
+        self.executed = 0
+
+    async def _claim(self, db: Any, record_id: str, digest: str) -> Optional[Dict[str, Any]]:
+        """Insert a pending record for the key; returns the existing record if someone else holds it"""
+        now = _now_ms()
+        lock = {
+            "status": "pending",
+            "request_hash": digest,
+            "created_at": now,
+            "locked_until": now + IDEMPOTENCY_LOCK_SECONDS * 1000,
+            "expires_at": now + IDEMPOTENCY_TTL_HOURS * 3600 * 1000,
+            # Mongo's TTL monitor reads stored dates as UTC, so the expiry must be an aware UTC time
+            "expire_at": datetime.now(timezone.utc) + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+            "status_code": None,
+            "response": None,
+        }
+        try:
+            await db.idempotency_keys.insert_one({"_id": record_id, **lock})
+            return None
+        except DuplicateKeyError:
+            pass
+
+        existing = await db.idempotency_keys.find_one({"_id": record_id})
+        if existing is None:
+            return await self._claim(db, record_id, digest)
+
+        # Expired records (not yet removed by the TTL monitor) and abandoned pending ones can be taken over
+        expired = existing["expires_at"] < now
+        abandoned = existing["status"] == "pending" and existing["locked_until"] < now
+        if expired or abandoned:
+            result = await db.idempotency_keys.update_one(
+                {"_id": record_id, "status": existing["status"], "locked_until": existing["locked_until"]},
+                {"$set": lock}
+            )
+            if result.modified_count == 1:
+                return None
+            existing = await db.idempotency_keys.find_one({"_id": record_id}) or existing
+        return existing
+
+    async def _await_done(self, db: Any, record_id: str) -> Optional[Dict[str, Any]]:
+        local = self._inflight.get(record_id)
+        if local is not None:
+            await asyncio.shield(local)
+        deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record = await db.idempotency_keys.find_one({"_id": record_id})
+            if record is None or record["status"] == "done":
+                return record
+            if asyncio.get_running_loop().time() >= deadline:
+                raise HTTPException(status_code=409, detail="相同的请求正在处理中，请稍后重试")
+            await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+    def _replay(self, record: Dict[str, Any]) -> Any:
+        self.replayed += 1
+        if record["status_code"] >= 400:
+            raise HTTPException(status_code=record["status_code"], detail=record["response"])
+        return record["response"]
+
+    async def run(self, db: Any, user_openid: str, operation: str, key: Optional[str], payload: Any,
+                  handler: Callable[[], Awaitable[Any]]) -> Any:
+        if not key:
+            return await handler()
+        if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            raise HTTPException(status_code=400, detail="Idempotency-Key 过长")
+
+        record_id = f"{user_openid}:{operation}:{key}"
+        digest = request_hash(payload)
+
+        while True:
+            existing = await self._claim(db, record_id, digest)
+            if existing is None:
+                break
+            if existing["request_hash"] != digest:
+                raise HTTPException(status_code=422, detail="Idempotency-Key 已用于不同的请求")
+            if existing["status"] == "pending":
+                existing = await self._await_done(db, record_id)
+                if existing is None:
+                    # The original failed and released the key; run it ourselves
+                    continue
+            return self._replay(existing)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[record_id] = future
+        try:
+            try:
+                result = await handler()
+            except HTTPException as e:
+                # Client errors are deterministic for the same payload and are replayed as-is
+                if e.status_code < 500:
+                    await self._store(db, record_id, e.status_code, e.detail)
+                else:
+                    await self._release(db, record_id)
+                raise
+            except BaseException:
+                await self._release(db, record_id)
+                raise
+            self.executed += 1
+            await self._store(db, record_id, 200, jsonable_encoder(result))
+            return result
+        finally:
+            future.set_result(None)
+            del self._inflight[record_id]
+
+    async def _store(self, db: Any, record_id: str, status_code: int, response: Any) -> None:
+        await db.idempotency_keys.update_one(
+            {"_id": record_id},
+            {"$set": {"status": "done", "status_code": status_code, "response": response, "locked_until": None}}
+        )
+
+    async def _release(self, db: Any, record_id: str) -> None:
+        """Forget a key whose request failed so a retry runs it again"""
+        await db.idempotency_keys.delete_one({"_id": record_id, "status": "pending"})
+
+    async def prune(self, db: Any) -> None:
+        """Drop expired keys; Mongo's TTL monitor does this on its own"""
+        await db.idempotency_keys.delete_many({"expires_at": {"$lt": _now_ms()}})
+
+    def stats(self) -> Dict[str, Any]:
+        return {"executed": self.executed, "replayed": self.replayed, "in_flight": len(self._inflight)}
+
+
+idempotency_store = IdempotencyStore()
@@ -1,18 +1,32 @@
 import os
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
+from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
-from database import db_manager
 from dotenv import load_dotenv
 
+# Before any local import: modules read their settings from the environment when imported
 load_dotenv()
 
+from database import db_manager, get_db
+from reminders import reminder_engine
+from purge import repo_purger
+from archive import commit_archive
+from migrations import start_migrations
+from auth import require_admin, token_cache
+from wechat import wechat_client
+from admission import admission_controller
+from coalesce import request_coalescer
+from idempotency import idempotency_store
+from metrics import INSTRUMENTATION_ENABLED, METRICS_ENABLED, MetricsMiddleware, metrics
+from slowlog import slow_query_log
+from profiling import PROFILING_ENABLED, ProfilingMiddleware, profiler
+from ratelimit import limiter
+
 app = FastAPI(title="AutoRepo API", version="2.0.0")
 
-# Rate limiting configuration
-limiter = Limiter(key_func=get_remote_address)
+# Rate limiting configuration (shared by every router, see ratelimit.py)
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
@@ -40,13 +54,43 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency/status metrics and the route context for the slow-query log;
+# with both disabled the middleware is not installed at all
+if INSTRUMENTATION_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+if METRICS_ENABLED:
+    metrics.register_stats("auth_token_cache", token_cache.stats)
+    metrics.register_stats("wechat_session", wechat_client.stats)
+    metrics.register_stats("admission", admission_controller.stats)
+    metrics.register_stats("coalescing", request_coalescer.stats)
+    metrics.register_stats("idempotency", idempotency_store.stats)
+
+# On-demand and sampled request profiling; not installed unless ADMIN_TOKEN or PROFILE_SAMPLE_RATE is set
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+    metrics.register_stats("profiling", profiler.stats)
+
 @app.on_event("startup")
 async def startup_db_client():
     await db_manager.connect()
+    await wechat_client.start()
     await db_manager.create_indexes()
+    if not db_manager.client:
+        # Mongo expires idempotency keys through a TTL index; the mock prunes them here
+        await idempotency_store.prune(db_manager.db)
+    start_migrations(get_db)
+    await reminder_engine.rebuild(db_manager.db)
+    reminder_engine.start(get_db)
+    repo_purger.start(get_db)
+    await repo_purger.resume(db_manager.db)
+    commit_archive.start(get_db)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await reminder_engine.stop()
+    await repo_purger.stop()
+    await commit_archive.stop()
+    await wechat_client.close()
     await db_manager.close()
 
 @app.get("/")
@@ -68,7 +112,31 @@ async def health_check():
         "jwt_secret_configured": jwt_set,
         "jwt_secret_length": jwt_len,
         "wechat_appid_configured": appid_set,
-        "wechat_secret_configured": secret_set
+        "wechat_secret_configured": secret_set,
+        "auth_token_cache": token_cache.stats(),
+        "wechat_session": wechat_client.stats(),
+        "admission": admission_controller.stats(),
+        "coalescing": request_coalescer.stats(),
+        "idempotency": idempotency_store.stats()
+    }
+
+@app.get("/api/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition of request, database and component metrics"""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics disabled")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/debug/slow-queries", dependencies=[Depends(require_admin)])
+async def slow_queries(limit: int = 20):
+    """Most expensive query shapes (by total time) and the latest slow samples"""
+    if not slow_query_log.enabled:
+        raise HTTPException(status_code=404, detail="Slow-query log disabled (set SLOW_QUERY_MS)")
+    limit = max(1, min(limit, 100))
+    return {
+        "threshold_ms": slow_query_log.threshold_ms,
+        "top": slow_query_log.top(limit),
+        "recent": slow_query_log.recent(limit)
     }
 
 from routes import router as api_router
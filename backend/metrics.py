@@ -0,0 +1,337 @@
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from slowlog import current_request, slow_query_log
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# The middleware and database wrapper are needed by either metrics or the slow-query log
+INSTRUMENTATION_ENABLED = METRICS_ENABLED or slow_query_log.enabled
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Collection methods timed by the database wrapper
+DB_OPERATIONS = {
+    "find_one", "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+    "delete_one", "delete_many", "count_documents", "find_one_and_update", "create_index",
+}
+DB_CURSOR_OPERATIONS = {"find", "aggregate"}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.total += seconds
+        self.count += 1
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.counts[i] += 1
+                return
+        self.counts[-1] += 1
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class MetricsRegistry:
+    """
+    In-process request and database metrics, rendered in the Prometheus text exposition format.
+    Stats already kept by other components (token cache, admission, ...) are exported as gauges
+    through registered stats sources.
+    """
+
+    def __init__(self) -> None:
+        self._stats_sources: List[Tuple[str, Callable[[], Dict[str, Any]]]] = []
+        self.reset()
+
+    def reset(self) -> None:
+        self.in_flight = 0
+        self.http_latency: Dict[Labels, Histogram] = {}
+        self.http_responses: Dict[Labels, int] = {}
+        self.db_latency: Dict[Labels, Histogram] = {}
+        self.db_errors: Dict[Labels, int] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float) -> None:
+        labels = (("method", method), ("route", route))
+        histogram = self.http_latency.get(labels)
+        if histogram is None:
+            histogram = self.http_latency[labels] = Histogram()
+        histogram.observe(seconds)
+        status_labels = labels + (("status", str(status)),)
+        self.http_responses[status_labels] = self.http_responses.get(status_labels, 0) + 1
+
+    def observe_db(self, collection: str, operation: str, seconds: float, failed: bool = False) -> None:
+        labels = (("collection", collection), ("operation", operation))
+        histogram = self.db_latency.get(labels)
+        if histogram is None:
+            histogram = self.db_latency[labels] = Histogram()
+        histogram.observe(seconds)
+        if failed:
+            self.db_errors[labels] = self.db_errors.get(labels, 0) + 1
+
+    def register_stats(self, prefix: str, source: Callable[[], Dict[str, Any]]) -> None:
+        self._stats_sources.append((prefix, source))
+
+    # --- Exposition ---
+
+    @staticmethod
+    def _histogram_lines(name: str, help_text: str, series: Dict[Labels, Histogram]) -> List[str]:
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for labels, histogram in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                cumulative += count
+                bucket = _format_labels(labels, f'le="{bound}"')
+                lines.append(f"{name}_bucket{bucket} {cumulative}")
+            inf_bucket = _format_labels(labels, 'le="+Inf"')
+            lines.append(f"{name}_bucket{inf_bucket} {histogram.count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+        return lines
+
+    @staticmethod
+    def _counter_lines(name: str, help_text: str, series: Dict[Labels, int]) -> List[str]:
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines.extend(f"{name}{_format_labels(labels)} {value}" for labels, value in sorted(series.items()))
+        return lines
+
+    @staticmethod
+    def _flatten(prefix: str, stats: Dict[str, Any], out: Dict[str, float]) -> None:
+        for key, value in stats.items():
+            name = f"{prefix}_{key}".replace("-", "_").replace(".", "_").replace("+", "")
+            if isinstance(value, dict):
+                MetricsRegistry._flatten(name, value, out)
+            elif isinstance(value, bool):
+                out[name] = int(value)
+            elif isinstance(value, (int, float)):
+                out[name] = value
+
+    def render(self) -> str:
+        lines = [
+            "# HELP autorepo_http_requests_in_flight HTTP requests currently being served",
+            "# TYPE autorepo_http_requests_in_flight gauge",
+            f"autorepo_http_requests_in_flight {self.in_flight}",
+        ]
+        lines += self._histogram_lines(
+            "autorepo_http_request_duration_seconds", "HTTP request latency by route", self.http_latency
+        )
+        lines += self._counter_lines("autorepo_http_responses_total", "HTTP responses by status", self.http_responses)
+        lines += self._histogram_lines(
+            "autorepo_db_operation_duration_seconds", "Database operation latency", self.db_latency
+        )
+        lines += self._counter_lines("autorepo_db_operation_errors_total", "Failed database operations", self.db_errors)
+
+        for prefix, source in self._stats_sources:
+            gauges: Dict[str, float] = {}
+            try:
+                self._flatten(f"autorepo_{prefix}", source(), gauges)
+            except Exception as e:
+                print(f"Metrics source {prefix} failed: {e}")
+                continue
+            for name, value in gauges.items():
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and status per route template, plus the in-flight gauge"""
+
+    def __init__(self, app: Any, registry: MetricsRegistry = metrics) -> None:
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        registry = self.registry
+        registry.in_flight += 1
+        token = current_request.set(scope)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_request.reset(token)
+            registry.in_flight -= 1
+            # The router stores the matched route in the shared scope; label by its template, not the raw path
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            registry.observe_request(scope["method"], route, status, time.perf_counter() - started)
+
+
+# --- Database instrumentation ---
+
+class InstrumentedCursor:
+    """Times a find/aggregate cursor from creation until it is exhausted or read with to_list"""
+
+    def __init__(self, cursor: Any, owner: "InstrumentedCollection", operation: str, elapsed: float,
+                 args: tuple, kwargs: Dict[str, Any]):
+        self._cursor = cursor
+        self._owner = owner
+        self._operation = operation
+        self._elapsed = elapsed
+        self._args = args
+        self._kwargs = kwargs
+        self._sort: Any = None
+        self._docs = 0
+        self._iterator: Optional[Any] = None
+
+    def _finish(self, failed: bool = False) -> None:
+        self._owner._observe(self._operation, self._elapsed, failed, self._args, self._kwargs, self._docs, self._sort)
+
+    def sort(self, key_or_list: Any, direction: Any = None) -> "InstrumentedCursor":
+        self._sort = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else key_or_list
+        if direction is None:
+            self._cursor = self._cursor.sort(key_or_list)
+        else:
+            self._cursor = self._cursor.sort(key_or_list, direction)
+        return self
+
+    def skip(self, count: int) -> "InstrumentedCursor":
+        self._cursor = self._cursor.skip(count)
+        return self
+
+    def limit(self, count: int) -> "InstrumentedCursor":
+        self._cursor = self._cursor.limit(count)
+        return self
+
+    async def to_list(self, *args: Any, **kwargs: Any) -> List[Any]:
+        started = time.perf_counter()
+        try:
+            result = await self._cursor.to_list(*args, **kwargs)
+        except Exception:
+            self._elapsed += time.perf_counter() - started
+            self._finish(failed=True)
+            raise
+        self._elapsed += time.perf_counter() - started
+        self._docs = len(result)
+        self._finish()
+        return result
+
+    def __aiter__(self) -> "InstrumentedCursor":
+        self._iterator = self._cursor.__aiter__()
+        return self
+
+    async def __anext__(self) -> Any:
+        started = time.perf_counter()
+        try:
+            item = await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self._elapsed += time.perf_counter() - started
+            self._finish()
+            raise
+        except Exception:
+            self._elapsed += time.perf_counter() - started
+            self._finish(failed=True)
+            raise
+        self._elapsed += time.perf_counter() - started
+        self._docs += 1
+        return item
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+
+class InstrumentedCollection:
+    def __init__(self, collection: Any, name: str, registry: MetricsRegistry) -> None:
+        self._collection = collection
+        self._name = name
+        self._registry = registry
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self._collection, name)
+        if name in DB_OPERATIONS:
+            return self._timed(name, attr)
+        if name in DB_CURSOR_OPERATIONS:
+            return self._timed_cursor(name, attr)
+        return attr
+
+    def _observe(self, operation: str, seconds: float, failed: bool, args: tuple, kwargs: Dict[str, Any],
+                 docs: Optional[int] = None, sort: Any = None) -> None:
+        self._registry.observe_db(self._name, operation, seconds, failed)
+        if slow_query_log.enabled:
+            slow_query_log.record(self._collection, self._name, operation, seconds, args, kwargs, docs, sort)
+
+    def _timed(self, operation: str, method: Callable[..., Any]) -> Callable[..., Any]:
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            started = time.perf_counter()
+            result = None
+            failed = True
+            try:
+                result = await method(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self._observe(operation, time.perf_counter() - started, failed, args, kwargs, _affected(result))
+        return wrapper
+
+    def _timed_cursor(self, operation: str, method: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(*args: Any, **kwargs: Any) -> InstrumentedCursor:
+            started = time.perf_counter()
+            cursor = method(*args, **kwargs)
+            return InstrumentedCursor(cursor, self, operation, time.perf_counter() - started, args, kwargs)
+        return wrapper
+
+
+def _affected(result: Any) -> Optional[int]:
+    """Documents returned or touched by a single operation, for the slow-query log"""
+    if result is None:
+        return 0
+    if isinstance(result, dict):
+        return 1
+    for attr in ("deleted_count", "modified_count"):
+        count = getattr(result, attr, None)
+        if isinstance(count, int):
+            return count
+    inserted = getattr(result, "inserted_ids", None)
+    return len(inserted) if inserted is not None else None
+
+
+class InstrumentedDatabase:
+    """
+    Transparent wrapper over a Motor database or MockDatabase that times every collection operation.
+    Anything that is not a collection (client helpers, MockDatabase.save, ...) passes straight through.
+    """
+
+    def __init__(self, db: Any, registry: MetricsRegistry = metrics) -> None:
+        self._db = db
+        self._registry = registry
+        self._collections: Dict[str, InstrumentedCollection] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        wrapped = self._collections.get(name)
+        if wrapped is not None:
+            return wrapped
+        attr = getattr(self._db, name)
+        if name.startswith("_") or not (hasattr(attr, "find_one") and hasattr(attr, "insert_one")):
+            return attr
+        wrapped = self._collections[name] = InstrumentedCollection(attr, name, self._registry)
+        return wrapped
+
+    def __getitem__(self, name: str) -> Any:
+        return self.__getattr__(name)
@@ -0,0 +1,166 @@
+import asyncio
+import os
+import socket
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from models import PRIORITY_RANKS, DEFAULT_PRIORITY_RANK
+
+MIGRATION_LOCK_SECONDS = int(os.getenv("MIGRATION_LOCK_SECONDS", "600"))
+LEGACY_OWNER_OPENID = os.getenv("LEGACY_OWNER_OPENID", "")
+
+MigrationFunc = Callable[[Any], Awaitable[None]]
+
+_registry: List[Tuple[str, MigrationFunc]] = []
+_task: Optional[asyncio.Task] = None
+
+
+class MigrationPending(Exception):
+    """Raised by a migration that cannot run yet; it is left pending and retried on the next startup"""
+
+
+def migration(name: str) -> Callable[[MigrationFunc], MigrationFunc]:
+    """Register a one-shot migration. Migrations run once, in registration order, under a lock."""
+    def decorator(func: MigrationFunc) -> MigrationFunc:
+        if any(existing == name for existing, _ in _registry):
+            raise ValueError(f"Migration {name} registered twice")
+        _registry.append((name, func))
+        return func
+    return decorator
+
+
+def _now_ms() -> float:
+    return datetime.now().timestamp() * 1000
+
+
+async def _acquire(db: Any, name: str, owner: str) -> bool:
+    """Take the migration's lock document; a lock whose lease ran out can be taken over"""
+    now = _now_ms()
+    lock = {
+        "status": "running",
+        "owner": owner,
+        "started_at": now,
+        "locked_until": now + MIGRATION_LOCK_SECONDS * 1000,
+    }
+    try:
+        await db.migrations.insert_one({"_id": name, **lock})
+        return True
+    except DuplicateKeyError:
+        pass
+
+    result = await db.migrations.update_one(
+        {
+            "_id": name,
+            "$or": [
+                {"status": {"$in": ["pending", "failed"]}},
+                {"status": "running", "locked_until": {"$lt": now}},
+            ]
+        },
+        {"$set": lock}
+    )
+    return result.modified_count == 1
+
+
+async def _finish(db: Any, name: str, status: str, note: Optional[str] = None) -> None:
+    await db.migrations.update_one(
+        {"_id": name},
+        {"$set": {"status": status, "finished_at": _now_ms(), "note": note, "locked_until": None}}
+    )
+
+
+async def run_migrations(db: Any) -> None:
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    for name, func in _registry:
+        state = await db.migrations.find_one({"_id": name})
+        if state and state.get("status") == "done":
+            continue
+        if not await _acquire(db, name, owner):
+            print(f"Migration {name} is being run by another process, skipping")
+            continue
+
+        started = time.perf_counter()
+        try:
+            await func(db)
+        except MigrationPending as e:
+            print(f"Migration {name} pending: {e}")
+            await _finish(db, name, "pending", str(e))
+            continue
+        except Exception as e:
+            print(f"Migration {name} failed: {e}")
+            await _finish(db, name, "failed", str(e))
+            continue
+        await _finish(db, name, "done")
+        print(f"Migration {name} done in {time.perf_counter() - started:.3f}s")
+
+
+def start_migrations(get_db: Callable[[], Any]) -> None:
+    """Run pending migrations in the background so startup is not blocked on them"""
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(run_migrations(get_db()))
+
+
+# --- Registered migrations ---
+
+@migration("0001_legacy_repo_owner")
+async def assign_legacy_repo_owner(db: Any) -> None:
+    """
+    Repos created before multi-tenant support have no user_openid.
+    They used to be claimed by the first user with no repos on every get_repos call;
+    they are now assigned once to LEGACY_OWNER_OPENID along with their commits and issues.
+    """
+    legacy = await db.repos.find({"user_openid": None}, {"_id": 1}).to_list(length=None)
+    if not legacy:
+        return
+    if not LEGACY_OWNER_OPENID:
+        # Nobody can see these repos (every query is scoped to an owner) until they are assigned
+        print(
+            f"Warning: {len(legacy)} repos have no owner and are hidden from every user. "
+            "Set LEGACY_OWNER_OPENID to the openid that should own them and restart; "
+            "this is checked again on every startup."
+        )
+        raise MigrationPending(f"{len(legacy)} ownerless repos found; set LEGACY_OWNER_OPENID to assign them")
+
+    repo_ids = [str(doc["_id"]) for doc in legacy]
+    owner = {"$set": {"user_openid": LEGACY_OWNER_OPENID}}
+    await db.repos.update_many({"_id": {"$in": [doc["_id"] for doc in legacy]}, "user_openid": None}, owner)
+    await db.commits.update_many({"repo_id": {"$in": repo_ids}, "user_openid": None}, owner)
+    await db.issues.update_many({"repo_id": {"$in": repo_ids}, "user_openid": None}, owner)
+
+
+@migration("0002_issue_priority_rank")
+async def backfill_priority_rank(db: Any) -> None:
+    """Backfill priority_rank for issues written before it was stored"""
+    missing = {"priority_rank": {"$exists": False}}
+    for priority, rank in PRIORITY_RANKS.items():
+        await db.issues.update_many({**missing, "priority": priority}, {"$set": {"priority_rank": rank}})
+    await db.issues.update_many(missing, {"$set": {"priority_rank": DEFAULT_PRIORITY_RANK}})
+
+
+CLOSED_ISSUE_STATUSES = {"closed", "done", "resolved", "completed", "finished", "fixed"}
+
+
+@migration("0003_issue_status")
+async def normalize_issue_status(db: Any) -> None:
+    """
+    Issues could be created with any status before it was validated; the issue list only reads
+    open and closed ones. Closed-like statuses become closed, anything else (or none) becomes open,
+    and the original value is kept in legacy_status.
+    """
+    legacy = await db.issues.find(
+        {"status": {"$nin": ["open", "closed"]}}, {"_id": 1, "status": 1}
+    ).to_list(length=None)
+    closed = 0
+    for doc in legacy:
+        legacy_status = doc.get("status")
+        status = "closed" if str(legacy_status or "").strip().lower() in CLOSED_ISSUE_STATUSES else "open"
+        closed += status == "closed"
+        await db.issues.update_one(
+            {"_id": doc["_id"], "status": legacy_status},
+            {"$set": {"status": status, "legacy_status": legacy_status}}
+        )
+    if legacy:
+        print(f"Normalized {len(legacy)} issue statuses: {closed} closed, {len(legacy) - closed} open")
@@ -1,25 +1,77 @@
 
+import asyncio
+import hashlib
 import json
 import os
+import re
+import threading
+import uuid
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+import mock_records
+import mock_snapshot
+
+try:
+    import fcntl
+except ImportError:  # Windows: coherent mode is unavailable
+    fcntl = None
+
+# Share one data file safely between several worker processes (file locks plus a write journal)
+MOCK_DB_COHERENT = os.getenv("MOCK_DB_COHERENT", "false").lower() == "true"
+MOCK_DB_JOURNAL_MAX_BYTES = int(os.getenv("MOCK_DB_JOURNAL_MAX_BYTES", str(4 * 1024 * 1024)))
+# Coalesce snapshot writes made within this many ms into one background flush (0 = write on every change)
+MOCK_DB_FLUSH_WINDOW_MS = float(os.getenv("MOCK_DB_FLUSH_WINDOW_MS", "0"))
+# With a flush window, writes return once their batch is on disk; false acknowledges them immediately
+MOCK_DB_FLUSH_WAIT = os.getenv("MOCK_DB_FLUSH_WAIT", "true").lower() == "true"
+# fsync each snapshot before it replaces the previous one
+MOCK_DB_FSYNC = os.getenv("MOCK_DB_FSYNC", "false").lower() == "true"
+# Snapshot format: json (readable) or binary (memory-mapped, each collection decoded on first use)
+MOCK_DB_FORMAT = os.getenv("MOCK_DB_FORMAT", "json").lower()
+# Keep repos, commits and issues as compact __slots__ records instead of dicts (less memory, slower scans)
+MOCK_DB_COMPACT = os.getenv("MOCK_DB_COMPACT", "false").lower() == "true"
+# Store each user's repos, commits and issues in their own file, loaded on demand
+MOCK_DB_SHARDED = os.getenv("MOCK_DB_SHARDED", "false").lower() == "true"
+# Tenant shards kept in memory; the least recently used one is dropped beyond this
+MOCK_DB_MAX_TENANTS = int(os.getenv("MOCK_DB_MAX_TENANTS", "256"))
+
+TENANT_COLLECTIONS = ("repos", "commits", "issues", "commit_archive")
 
 class MockCursor:
+    """
+    Results over a snapshot of a collection. Documents are handed out as shallow copies, so callers
+    may modify what they get back (routes stringify _id in place) without touching stored data.
+    """
+
     def __init__(self, data):
         self.data = data
         self.idx = 0
 
     def sort(self, key_or_list, direction=None):
-        # Very basic sort implementation
         if isinstance(key_or_list, list):
-            # Just take the first sort key for simplicity
-            key, direction = key_or_list[0]
+            keys = key_or_list
         else:
-            key = key_or_list
-            direction = direction or 1
-            
-        reverse = direction == -1
-        self.data.sort(key=lambda x: x.get(key, 0), reverse=reverse)
+            keys = [(key_or_list, direction or 1)]
+        
+        # Stable sorts applied from the last key to the first; missing/None sorts first like MongoDB
+        for key, key_direction in reversed(keys):
+            self.data.sort(
+                key=lambda x, k=key: (0, 0) if x.get(k) is None else (1, x.get(k)),
+                reverse=key_direction == -1
+            )
+        return self
+
+    def skip(self, count):
+        self.data = self.data[count:]
+        return self
+
+    def limit(self, count):
+        if count:
+            self.data = self.data[:count]
         return self
 
     def __aiter__(self):
@@ -29,31 +81,99 @@ class MockCursor:
         if self.idx < len(self.data):
             val = self.data[self.idx]
             self.idx += 1
-            return val
+            return dict(val)
         else:
             raise StopAsyncIteration
 
     async def to_list(self, length=None):
         if length:
-            return self.data[:length]
-        return self.data
+            return [dict(doc) for doc in self.data[:length]]
+        return [dict(doc) for doc in self.data]
 
 class MockCollection:
+    """
+    One collection as a copy-on-write list. Writers never modify the published list or a stored
+    document: they build a new version and publish it by assigning data, one writer at a time per
+    collection. Readers take whatever version is current without locking.
+    """
+
     def __init__(self, name, db):
         self.name = name
         self.db = db
-        self.data = []
+        self._data = []
+        # Documents still encoded in a binary snapshot, decoded on first access
+        self._pending = None
+        # Record type documents are packed into with MOCK_DB_COMPACT (None keeps plain dicts)
+        self.record = mock_records.RECORD_TYPES.get(name) if getattr(db, "compact", False) else None
+        self._write_lock = None
+        self._write_lock_loop = None
+
+    @property
+    def data(self):
+        if self._pending is not None:
+            self._data = self._adopt(self._pending.decode())
+            self._pending = None
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._pending = None
+        self._data = value
 
-    def find(self, query=None):
+    def _stored(self, doc):
+        """The form a document is kept in: a record in compact mode, otherwise the dict itself"""
+        return doc if self.record is None else self.record.pack(doc)
+
+    def _adopt(self, docs):
+        """Take over a freshly loaded list; packed in place so each dict is freed as soon as it is replaced"""
+        if self.record is not None:
+            for index, doc in enumerate(docs):
+                docs[index] = self.record.pack(doc)
+        return docs
+
+    @asynccontextmanager
+    async def _writer(self):
+        """Serialize writers of this collection; in coherent mode also hold the file lock"""
+        loop = asyncio.get_running_loop()
+        if self._write_lock_loop is not loop:
+            # asyncio locks belong to one event loop (tests run several)
+            self._write_lock = asyncio.Lock()
+            self._write_lock_loop = loop
+        # Counted from before the lock is awaited, so a sharded database never evicts a shard with a write queued
+        self.db._writers += 1
+        try:
+            async with self._write_lock:
+                if self.db._closed:
+                    # Its snapshot would overwrite whatever the file's new owner has written since
+                    raise RuntimeError(f"Mock database {self.db.file_path} is closed")
+                with self.db.writing():
+                    yield
+        finally:
+            self.db._writers -= 1
+
+    def find(self, query=None, projection=None):
+        if self.db is not None:
+            self.db.refresh()
         if not query:
-            return MockCursor(list(self.data))
-        
-        filtered = []
-        for item in self.data:
-            match = self._match_document(item, query)
-            if match:
-                filtered.append(item)
+            filtered = list(self.data)
+        else:
+            filtered = []
+            for item in self.data:
+                match = self._match_document(item, query)
+                if match:
+                    filtered.append(item)
+        if projection:
+            filtered = [self._project(item, projection) for item in filtered]
         return MockCursor(filtered)
+
+    def _project(self, item, projection):
+        """Apply an inclusion or exclusion projection; _id is kept unless excluded"""
+        if any(projection.values()):
+            doc = {k: item[k] for k, v in projection.items() if v and k in item}
+            if projection.get("_id", 1) and "_id" in item:
+                doc["_id"] = item["_id"]
+            return doc
+        return {k: v for k, v in item.items() if projection.get(k, 1)}
     
     def _match_document(self, item, query):
         """Check if document matches query with MongoDB operator support"""
@@ -105,6 +225,12 @@ class MockCollection:
                 if "$in" in v:
                     if field_value not in v["$in"]:
                         return False
+                if "$nin" in v:
+                    if field_value in v["$nin"]:
+                        return False
+                if "$exists" in v:
+                    if (k in item) != bool(v["$exists"]):
+                        return False
                 if "$regex" in v:
                     import re
                     pattern = v["$regex"]
@@ -118,68 +244,119 @@ class MockCollection:
                 return False
         return True
 
-    async def find_one(self, query):
-        cursor = self.find(query)
+    async def find_one(self, query, projection=None, sort=None):
+        cursor = self.find(query, projection)
+        if sort:
+            cursor.sort(sort)
         result = await cursor.to_list()
         return result[0] if result else None
 
+    def _locate(self, data, query):
+        for index, item in enumerate(data):
+            if self._match_document(item, query):
+                return index
+        return None
+
+    def _updated(self, item, update):
+        doc = dict(item)
+        doc.update(update.get("$set", {}))
+        return self._stored(doc)
+
     async def insert_one(self, document):
-        if "_id" not in document:
-            document["_id"] = ObjectId()
-        self.data.append(document)
-        
-        # Save to file persistence
-        self.db.save()
-        
+        async with self._writer():
+            if "_id" not in document:
+                document["_id"] = ObjectId()
+            elif any(d.get("_id") == document["_id"] for d in self.data):
+                # Explicit ids must be unique, as in MongoDB (used for lock documents)
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} _id: {document['_id']}")
+            # The caller keeps its dict (with the new _id, as pymongo does); the stored one is private
+            stored = self._stored(dict(document))
+            self.data = self.data + [stored]
+
+            # Save to file persistence
+            self.db.changed(self.name, put=[stored])
+        await self.db.written()
+
         class Result:
             inserted_id = document["_id"]
         return Result()
 
+    async def insert_many(self, documents, ordered=True):
+        async with self._writer():
+            existing = {str(d.get("_id")) for d in self.data}
+            for document in documents:
+                if "_id" not in document:
+                    document["_id"] = ObjectId()
+                elif str(document["_id"]) in existing:
+                    raise DuplicateKeyError(
+                        f"E11000 duplicate key error collection: {self.name} _id: {document['_id']}"
+                    )
+                existing.add(str(document["_id"]))
+            stored = [self._stored(dict(document)) for document in documents]
+            self.data = self.data + stored
+            self.db.changed(self.name, put=stored)
+        await self.db.written()
+
+        class Result:
+            inserted_ids = [document["_id"] for document in documents]
+        return Result()
+
     async def update_one(self, query, update):
-        item = await self.find_one(query)
-        if item:
-            if "$set" in update:
-                for k, v in update["$set"].items():
-                    item[k] = v
-            self.db.save()
-        return None
+        async with self._writer():
+            data = list(self.data)
+            index = self._locate(data, query)
+            if index is not None:
+                data[index] = self._updated(data[index], update)
+                self.data = data
+                self.db.changed(self.name, put=[data[index]])
+        await self.db.written()
+        class Result:
+            matched_count = modified_count = 0 if index is None else 1
+        return Result()
 
     async def update_many(self, query, update):
         # Simplified update many
-        cursor = self.find(query)
-        items = await cursor.to_list()
-        count = 0
-        for item in items:
-            if "$set" in update:
-                for k, v in update["$set"].items():
-                    item[k] = v
-            count += 1
-        if count > 0:
-            self.db.save()
+        async with self._writer():
+            data = list(self.data)
+            items = []
+            for index, item in enumerate(data):
+                if self._match_document(item, query):
+                    data[index] = self._updated(item, update)
+                    items.append(data[index])
+            count = len(items)
+            if count > 0:
+                self.data = data
+                self.db.changed(self.name, put=items)
+        await self.db.written()
+        class Result:
+            matched_count = modified_count = count
+        return Result()
 
     async def delete_one(self, query):
-        item = await self.find_one(query)
-        if item:
-            self.data = [d for d in self.data if d is not item]
-            self.db.save()
-            class Result:
-                deleted_count = 1
-            return Result()
+        async with self._writer():
+            data = self.data
+            index = self._locate(data, query)
+            if index is not None:
+                item = data[index]
+                self.data = data[:index] + data[index + 1:]
+                self.db.changed(self.name, deleted=[item])
+        await self.db.written()
         class Result:
-            deleted_count = 0
+            deleted_count = 0 if index is None else 1
         return Result()
 
     async def delete_many(self, query):
-        cursor = self.find(query)
-        items = await cursor.to_list()
-        ids_to_delete = set()
-        for item in items:
-            ids_to_delete.add(str(item.get("_id")))
-        original_count = len(self.data)
-        self.data = [d for d in self.data if str(d.get("_id")) not in ids_to_delete]
-        deleted_count = original_count - len(self.data)
-        if deleted_count > 0:
-            self.db.save()
+        async with self._writer():
+            items = self.find(query).data
+            ids_to_delete = set()
+            for item in items:
+                ids_to_delete.add(str(item.get("_id")))
+            original_count = len(self.data)
+            self.data = [d for d in self.data if str(d.get("_id")) not in ids_to_delete]
+            deleted_count = original_count - len(self.data)
+            if deleted_count > 0:
+                self.db.changed(self.name, deleted=items)
+        await self.db.written()
         class Result:
             pass
         Result.deleted_count = deleted_count
@@ -188,6 +365,8 @@ class MockCollection:
     # Enhanced aggregation pipeline support
     def aggregate(self, pipeline):
         """Support MongoDB aggregation pipeline stages"""
+        if self.db is not None:
+            self.db.refresh()
         data = list(self.data)
         
         for stage in pipeline:
@@ -241,10 +420,15 @@ class MockCollection:
                     data = results
             
             elif "$addFields" in stage:
+                # New documents: the stored ones may be shared with other readers
                 add_fields_spec = stage["$addFields"]
+                extended = []
                 for doc in data:
+                    doc = dict(doc)
                     for field, expr in add_fields_spec.items():
                         doc[field] = self._evaluate_expression(expr, doc)
+                    extended.append(doc)
+                data = extended
             
             elif "$sort" in stage:
                 # Sort documents
@@ -277,7 +461,7 @@ class MockCollection:
         temp_collection = MockCollection("temp", self.db)
         temp_collection.data = data
         result_cursor = temp_collection.aggregate(pipeline)
-        return result_cursor.data
+        return [dict(doc) for doc in result_cursor.data]
     
     def _apply_accumulator(self, expr, docs):
         if isinstance(expr, dict):
@@ -291,7 +475,7 @@ class MockCollection:
                     for doc in docs:
                         val = doc
                         for part in field_path:
-                            val = val.get(part, 0) if isinstance(val, dict) else 0
+                            val = val.get(part, 0) if isinstance(val, Mapping) else 0
                         total += val or 0
                     return total
                 elif isinstance(field_or_val, dict):
@@ -320,7 +504,7 @@ class MockCollection:
                 field_path = expr[1:].split(".")
                 val = doc
                 for part in field_path:
-                    val = val.get(part) if isinstance(val, dict) else None
+                    val = val.get(part) if isinstance(val, Mapping) else None
                 return val
             return expr
         
@@ -369,48 +553,697 @@ class MockCollection:
 
 
 class MockDatabase:
-    def __init__(self):
+    """
+    JSON-file database for development and small deployments.
+
+    With MOCK_DB_COHERENT=true several processes (uvicorn workers) can share one data file: writes
+    take an exclusive file lock and append their effect to a journal next to the snapshot instead of
+    rewriting it, and every read first checks the journal, replaying only the records other
+    processes appended since the last check. The journal is folded back into the snapshot once it
+    grows past MOCK_DB_JOURNAL_MAX_BYTES.
+
+    Otherwise every change rewrites the snapshot, unless MOCK_DB_FLUSH_WINDOW_MS is set: changes then
+    only mark the database dirty, and a background task writes all changes made within the window as
+    one snapshot in a worker thread (group commit).
+    """
+
+    def __init__(self, file_path=None):
         self.collections = {}
-        data_dir = os.getenv("DATA_DIR", "/data")
-        if not os.path.exists(data_dir):
+        if file_path is None:
+            file_path = os.path.join(os.getenv("DATA_DIR", "/data"), "mock_db_data.json")
+        data_dir = os.path.dirname(file_path)
+        if data_dir and not os.path.exists(data_dir):
             os.makedirs(data_dir, exist_ok=True)
-        self.file_path = os.path.join(data_dir, "mock_db_data.json")
-        self.load()
+        self.file_path = file_path
+        self.coherent = MOCK_DB_COHERENT
+        self.format = MOCK_DB_FORMAT
+        self.compact = MOCK_DB_COMPACT
+        # Records applied from the current journal epoch; bumped on every write by any process
+        self.generation = 0
+        self._epoch = None
+        self._journal_offset = 0
+        self._journal_stat = None
+        self._lock_file = None
+        self._lock_depth = 0
+        # Group commit (not used in coherent mode, where each change is a journal append under the file lock)
+        self.flush_window = 0 if self.coherent else MOCK_DB_FLUSH_WINDOW_MS / 1000
+        self.flush_wait = MOCK_DB_FLUSH_WAIT
+        self.fsync = MOCK_DB_FSYNC
+        self.flushes = 0
+        # Changes made, on disk, and written by the latest snapshot
+        self._changes = 0
+        self._flushed = 0
+        self._written = 0
+        self._flusher = None
+        self._flush_waiters = []
+        self._file_lock = threading.Lock()
+        # Writes waiting for or holding a collection's writer lock; closed databases refuse writes
+        self._writers = 0
+        self._closed = False
+        if self.coherent:
+            if fcntl is None:
+                raise RuntimeError("MOCK_DB_COHERENT requires fcntl file locks (not available on this platform)")
+            with self._locked(fcntl.LOCK_EX):
+                self._reload()
+        else:
+            self.load()
 
     def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
         if name not in self.collections:
             self.collections[name] = MockCollection(name, self)
         return self.collections[name]
 
+    def close(self):
+        self._closed = True
+        if self._flushed < self._changes:
+            self._flush()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    @property
+    def journal_path(self):
+        return self.file_path + ".journal"
+
+    @property
+    def binary_path(self):
+        return os.path.splitext(self.file_path)[0] + ".bin"
+
     def load(self):
-        if os.path.exists(self.file_path):
+        binary = self.format == "binary"
+        path, other = (self.binary_path, self.file_path) if binary else (self.file_path, self.binary_path)
+        try:
+            if not os.path.exists(path):
+                if os.path.exists(other):
+                    self._convert(other, binary)
+            elif binary:
+                self._load_binary(path)
+            else:
+                self._load_json(path)
+        except Exception as e:
+            print(f"Error loading mock DB: {e}")
+
+    def _load_json(self, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            if self.compact:
+                # Each dict is packed as soon as it is decoded, so the dicts never all exist at once
+                data = _decode_snapshot(f.read(), self._restored)
+            else:
+                data = json.load(f)
+                for col_data in data.values():
+                    # Restore ObjectIds
+                    for doc in col_data:
+                        _restore_id(doc)
+            for col_name, col_data in data.items():
+                self.__getattr__(col_name).data = col_data
+
+    def _restored(self, col_name, doc):
+        _restore_id(doc)
+        return self.__getattr__(col_name)._stored(doc)
+
+    def _load_binary(self, path):
+        for col_name, pending in mock_snapshot.open_snapshot(path).items():
+            c = self.__getattr__(col_name)
+            c._data = []
+            c._pending = pending
+
+    def _convert(self, source, from_json):
+        """Adopt a snapshot written in the other format; the source is kept as <name>.bak"""
+        if from_json:
+            self._load_json(source)
+        else:
+            self._load_binary(source)
+        self._write_snapshot()
+        os.replace(source, source + ".bak")
+        print(f"Converted mock DB snapshot {source} to {self.format}")
+
+    def save(self):
+        if self.coherent:
+            with self._locked(fcntl.LOCK_EX):
+                self._compact()
+        else:
+            self._flush()
+
+    def _write_snapshot(self):
+        self._write_versions(self._versions(), self._changes)
+
+    def _versions(self):
+        # Published collection versions are never modified, so they can be written from another thread
+        return [
+            (name, col._pending if col._pending is not None else col.data)
+            for name, col in self.collections.items()
+        ]
+
+    def _write_versions(self, versions, changes):
+        with self._file_lock:
+            if changes < self._written:
+                # A newer snapshot got to the file first (close() while a flush was in its thread)
+                return
+            if self.format == "binary":
+                mock_snapshot.write_snapshot(self.binary_path, versions, fsync=self.fsync)
+            else:
+                data = {
+                    # Collections still pending from a binary snapshot are decoded only to be written out
+                    name: [_serializable(doc) for doc in (
+                        docs.decode() if isinstance(docs, mock_snapshot.LazyCollection) else docs
+                    )]
+                    for name, docs in versions
+                }
+                # Written beside the target and renamed: a crash or a reader never sees a partial file
+                tmp_path = f"{self.file_path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2, ensure_ascii=False, default=str)
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                os.replace(tmp_path, self.file_path)
+            self._written = changes
+
+    # --- Group commit ---
+
+    def _flush(self):
+        changes = self._changes
+        self._write_snapshot()
+        self._flushed = max(self._flushed, changes)
+        self.flushes += 1
+        self._release_waiters()
+
+    def _release_waiters(self, error=None):
+        waiting = []
+        for target, future in self._flush_waiters:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            elif target <= self._flushed:
+                future.set_result(None)
+            else:
+                waiting.append((target, future))
+        self._flush_waiters = waiting
+
+    def _schedule_flush(self):
+        if not self.flush_window:
+            return False
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return False
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush_loop())
+        return True
+
+    async def _flush_loop(self):
+        """Wait out the window, then write every change made so far as one snapshot off the event loop"""
+        while self._flushed < self._changes:
+            await asyncio.sleep(self.flush_window)
+            changes = self._changes
+            versions = self._versions()
             try:
-                with open(self.file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    for col_name, col_data in data.items():
-                        c = self.__getattr__(col_name)
-                        # Restore ObjectIds
-                        for doc in col_data:
-                            if "_id" in doc:
-                            try:
-                                    doc["_id"] = ObjectId(doc["_id"])
-                                except Exception:
-                                    pass
-                        c.data = col_data
+                await asyncio.to_thread(self._write_versions, versions, changes)
             except Exception as e:
-                print(f"Error loading mock DB: {e}")
+                # The changes stay pending; the next change schedules another attempt
+                print(f"Error flushing mock DB: {e}")
+                self._release_waiters(e)
+                return
+            self._flushed = max(self._flushed, changes)
+            self.flushes += 1
+            self._release_waiters()
+
+    async def durable(self):
+        """Wait until every change made so far is on disk"""
+        target = self._changes
+        if self._flushed >= target:
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._flush_waiters.append((target, future))
+        if not self._schedule_flush():
+            self._flush()
+        await future
+
+    async def written(self):
+        """Called by every write once it has released its collection: waits for its batch if configured"""
+        if self.flush_wait:
+            await self.durable()
+
+    # --- Coherent multi-process mode ---
+
+    @contextmanager
+    def _locked(self, mode):
+        """flock on a sidecar file; re-entrant within the process (nested sections share the outer lock)"""
+        if self._lock_file is None:
+            self._lock_file = open(self.file_path + ".lock", "a+")
+        if self._lock_depth == 0:
+            fcntl.flock(self._lock_file, mode)
+        self._lock_depth += 1
+        try:
+            yield
+        finally:
+            self._lock_depth -= 1
+            if self._lock_depth == 0:
+                fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def writing(self):
+        """Wrap a read-modify-write; in coherent mode it runs under the exclusive lock on current data"""
+        if not self.coherent:
+            yield
+            return
+        with self._locked(fcntl.LOCK_EX):
+            self._catch_up()
+            yield
+
+    def changed(self, collection, put=(), deleted=()):
+        """Persist the effect of a write: documents inserted or updated (post-images) and deleted"""
+        if not self.coherent:
+            self._changes += 1
+            if not self._schedule_flush():
+                self._flush()
+            return
+        record = {"gen": self.generation + 1, "c": collection}
+        if put:
+            record["put"] = [_serializable(doc) for doc in put]
+        if deleted:
+            record["del"] = [str(doc.get("_id")) for doc in deleted]
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+            self._journal_offset = f.tell()
+        self.generation += 1
+        self._journal_stat = self._stat_journal()
+        if self._journal_offset > MOCK_DB_JOURNAL_MAX_BYTES:
+            self._compact()
+
+    def refresh(self):
+        """Bring this process up to date with writes from other processes; a stat() when nothing changed"""
+        if not self.coherent or self._lock_depth:
+            return
+        if self._stat_journal() == self._journal_stat:
+            return
+        with self._locked(fcntl.LOCK_SH):
+            self._catch_up()
+
+    def _stat_journal(self):
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_ino, st.st_size)
+
+    def _catch_up(self):
+        stat = self._stat_journal()
+        if stat == self._journal_stat:
+            return
+        if stat is None:
+            self._reload()
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            header = json.loads(f.readline() or "{}")
+            if header.get("epoch") != self._epoch:
+                # The journal was folded into a new snapshot by another process
+                self._reload()
+                return
+            f.seek(self._journal_offset)
+            self._replay(f)
+        self._journal_stat = stat
+
+    def _replay(self, f):
+        # Records are applied to new versions of the collections, published once the batch is read
+        versions, positions = {}, {}
+        try:
+            for line in iter(f.readline, ""):
+                if not line.endswith("\n"):
+                    break
+                record = json.loads(line)
+                name = record["c"]
+                collection = self.__getattr__(name)
+                if name not in versions:
+                    versions[name] = list(collection.data)
+                data = versions[name]
+                if name not in positions:
+                    positions[name] = {str(d.get("_id")): i for i, d in enumerate(data)}
+                for doc in record.get("put", ()):
+                    _restore_id(doc)
+                    doc = collection._stored(doc)
+                    index = positions[name].get(str(doc["_id"]))
+                    if index is None:
+                        positions[name][str(doc["_id"])] = len(data)
+                        data.append(doc)
+                    else:
+                        data[index] = doc
+                if record.get("del"):
+                    removed = set(record["del"])
+                    versions[name] = [d for d in data if str(d.get("_id")) not in removed]
+                    del positions[name]
+                self.generation = record["gen"]
+                self._journal_offset = f.tell()
+        finally:
+            for name, data in versions.items():
+                self.__getattr__(name).data = data
+
+    def _reload(self):
+        for collection in self.collections.values():
+            collection.data = []
+        self.load()
+        self.generation = 0
+        if not os.path.exists(self.journal_path):
+            self._new_journal()
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as f:
+            self._epoch = json.loads(f.readline() or "{}").get("epoch")
+            self._journal_offset = f.tell()
+            self._replay(f)
+        self._journal_stat = self._stat_journal()
+
+    def _new_journal(self):
+        self._epoch = uuid.uuid4().hex
+        tmp_path = f"{self.journal_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"epoch": self._epoch}) + "\n")
+            self._journal_offset = f.tell()
+        os.replace(tmp_path, self.journal_path)
+        self.generation = 0
+        self._journal_stat = self._stat_journal()
+
+    def _compact(self):
+        self._catch_up()
+        self._write_snapshot()
+        self._new_journal()
+
+
+def _restore_id(doc):
+    if "_id" in doc:
+        try:
+            doc["_id"] = ObjectId(doc["_id"])
+        except Exception:
+            pass
+
+
+_JSON_SPACE = re.compile(r"\s*")
+
+
+def _decode_snapshot(text, store):
+    """Decode a JSON snapshot one document at a time, keeping store(collection, doc) for each"""
+    decoder = json.JSONDecoder()
+
+    def token(i):
+        i = _JSON_SPACE.match(text, i).end()
+        return i, text[i:i + 1]
+
+    def expect(i, char):
+        i, found = token(i)
+        if found != char:
+            raise ValueError(f"Expected {char!r} at offset {i} of the mock DB snapshot")
+        return token(i + 1)
+
+    data = {}
+    i, char = expect(0, "{")
+    while char != "}":
+        name, i = decoder.raw_decode(text, i)
+        i, char = expect(i, ":")
+        i, char = expect(i, "[")
+        docs = data[name] = []
+        while char != "]":
+            doc, i = decoder.raw_decode(text, i)
+            docs.append(store(name, doc))
+            i, char = token(i)
+            if char == ",":
+                i, char = token(i + 1)
+        i, char = token(i + 1)
+        if char == ",":
+            i, char = token(i + 1)
+    return data
+
+
+def _serializable(doc):
+    # Convert ObjectIds to strings for JSON
+    d = dict(doc)
+    if "_id" in d:
+        d["_id"] = str(d["_id"])
+    return d
+
+
+# --- Per-tenant sharding ---
+
+_SCATTER = object()
+
+
+def _tenant_of(query):
+    """The shard a query is confined to: an openid, None for ownerless documents, or _SCATTER"""
+    if not isinstance(query, dict) or "user_openid" not in query:
+        return _SCATTER
+    value = query["user_openid"]
+    return value if value is None or isinstance(value, str) else _SCATTER
+
+
+def shard_key(user_openid):
+    if re.fullmatch(r"[A-Za-z0-9_-]{1,64}", user_openid):
+        return user_openid
+    return "h-" + hashlib.sha1(user_openid.encode("utf-8")).hexdigest()
+
+
+class ShardedCollection:
+    """Routes operations on a tenant collection to the shard named by the query's user_openid"""
+
+    def __init__(self, name, db):
+        self.name = name
+        self.db = db
+
+    def _shards(self, query):
+        """The collections a query has to visit; a lazy iterator, as scattered visits load tenants one by one"""
+        tenant = _tenant_of(query)
+        if tenant is _SCATTER:
+            return (getattr(shard, self.name) for shard in self.db.all_shards())
+        return iter([getattr(self.db.shard(tenant), self.name)])
+
+    def find(self, query=None, projection=None):
+        tenant = _tenant_of(query)
+        if tenant is not _SCATTER:
+            return getattr(self.db.shard(tenant), self.name).find(query, projection)
+        return MockCursor([doc for shard in self._shards(query) for doc in shard.find(query, projection).data])
+
+    async def find_one(self, query, projection=None, sort=None):
+        cursor = self.find(query, projection)
+        if sort:
+            cursor.sort(sort)
+        result = await cursor.to_list()
+        return result[0] if result else None
+
+    def aggregate(self, pipeline):
+        first = pipeline[0].get("$match") if pipeline else None
+        tenant = _tenant_of(first)
+        if tenant is not _SCATTER:
+            return getattr(self.db.shard(tenant), self.name).aggregate(pipeline)
+        merged = MockCollection(self.name, None)
+        merged.data = [doc for shard in self._shards(first) for doc in shard.find(first).data]
+        return merged.aggregate(pipeline)
+
+    async def insert_one(self, document):
+        return await getattr(self.db.shard(document.get("user_openid")), self.name).insert_one(document)
+
+    async def insert_many(self, documents, ordered=True):
+        groups = {}
+        for document in documents:
+            groups.setdefault(document.get("user_openid"), []).append(document)
+        for tenant, group in groups.items():
+            await getattr(self.db.shard(tenant), self.name).insert_many(group)
+
+        class Result:
+            inserted_ids = [document["_id"] for document in documents]
+        return Result()
+
+    async def _move(self, query, update, limit):
+        # Changing a document's owner moves it to the new owner's shard
+        target = getattr(self.db.shard(update["$set"]["user_openid"]), self.name)
+        moved = 0
+        for shard in self._shards(query):
+            for item in shard.find(query).data[:limit - moved if limit else None]:
+                await shard.delete_one({"_id": item["_id"]})
+                await target.insert_one({**item, **update["$set"]})
+                moved += 1
+        return moved
+
+    async def _update(self, query, update, limit):
+        if "user_openid" in update.get("$set", {}):
+            count = await self._move(query, update, limit)
+        else:
+            count = 0
+            for shard in self._shards(query):
+                result = await (shard.update_one(query, update) if limit else shard.update_many(query, update))
+                count += result.matched_count
+                if limit and count:
+                    break
+
+        class Result:
+            matched_count = modified_count = count
+        return Result()
+
+    async def update_one(self, query, update):
+        return await self._update(query, update, 1)
+
+    async def update_many(self, query, update):
+        return await self._update(query, update, 0)
+
+    async def delete_one(self, query):
+        for shard in self._shards(query):
+            result = await shard.delete_one(query)
+            if result.deleted_count:
+                return result
+        return result
+
+    async def delete_many(self, query):
+        count = 0
+        for shard in self._shards(query):
+            count += (await shard.delete_many(query)).deleted_count
+
+        class Result:
+            deleted_count = count
+        return Result()
+
+
+class ShardedMockDatabase:
+    """
+    MockDatabase partitioned by tenant: each user's repos, commits and issues live in
+    DATA_DIR/tenants/<openid>/mock_db_data.json and are loaded on first access, with at most
+    MOCK_DB_MAX_TENANTS kept in memory. Ownerless documents and every other collection stay in
+    DATA_DIR/mock_db_data.json. Queries that do not name a user_openid (startup rebuilds, sweeps)
+    visit every shard: tenants that are not in memory are loaded one at a time for the visit and
+    dropped after it, so background jobs neither hold every tenant nor evict the ones serving
+    requests. Each shard is an ordinary MockDatabase, so MOCK_DB_COHERENT applies per shard.
+    """
+
+    def __init__(self, max_tenants=MOCK_DB_MAX_TENANTS):
+        data_dir = os.getenv("DATA_DIR", "/data")
+        self.file_path = os.path.join(data_dir, "mock_db_data.json")
+        self.directory = os.path.join(data_dir, "tenants")
+        self.max_tenants = max_tenants
+        self.default = MockDatabase(self.file_path)
+        self.collections = {name: ShardedCollection(name, self) for name in TENANT_COLLECTIONS}
+        self._tenants = OrderedDict()
+        # Tenants loaded for a scattered query only, outside the LRU
+        self._visiting = {}
+        self.loads = 0
+        self.evictions = 0
+        self.visits = 0
+        if not os.path.isdir(self.directory):
+            self._split_single_file()
+        self._drop_owned_from_default()
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name in self.collections:
+            return self.collections[name]
+        return getattr(self.default, name)
+
+    def shard(self, user_openid):
+        if user_openid is None:
+            return self.default
+        return self._tenant(shard_key(user_openid))
+
+    def _open(self, key):
+        return MockDatabase(os.path.join(self.directory, key, "mock_db_data.json"))
+
+    def _tenant(self, key):
+        db = self._tenants.get(key)
+        if db is not None:
+            self._tenants.move_to_end(key)
+            return db
+        # A tenant being visited by a scattered query is adopted, never opened twice
+        db = self._visiting.pop(key, None)
+        if db is None:
+            db = self._open(key)
+            self.loads += 1
+        self._tenants[key] = db
+        self._evict()
+        return db
+
+    def _evict(self):
+        # Once its pending changes are written, an idle shard can simply be dropped. The one just requested
+        # and any with a write queued or running stay (over the limit if need be): that write would land on
+        # a closed instance.
+        for key in list(self._tenants)[:-1]:
+            if len(self._tenants) <= self.max_tenants:
+                return
+            if self._tenants[key]._writers:
+                continue
+            self._tenants.pop(key).close()
+            self.evictions += 1
+
+    def all_shards(self):
+        yield self.default
+        keys = set(self._tenants)
+        if os.path.isdir(self.directory):
+            keys.update(os.listdir(self.directory))
+        for key in sorted(keys):
+            db = self._tenants.get(key) or self._visiting.get(key)
+            if db is not None:
+                yield db
+                continue
+            db = self._visiting[key] = self._open(key)
+            self.visits += 1
+            try:
+                yield db
+            finally:
+                # Unless a request adopted it meanwhile
+                if self._visiting.get(key) is db:
+                    del self._visiting[key]
+                    db.close()
 
     def save(self):
-        data = {}
-        for name, col in self.collections.items():
-            # Convert ObjectIds to strings for JSON
-            serializable_data = []
-            for doc in col.data:
-                d = doc.copy()
-                if "_id" in d:
-                    d["_id"] = str(d["_id"])
-                serializable_data.append(d)
-            data[name] = serializable_data
-            
-        with open(self.file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        self.default.save()
+        for db in self._tenants.values():
+            db.save()
+
+    def close(self):
+        self.default.close()
+        for db in [*self._tenants.values(), *self._visiting.values()]:
+            db.close()
+
+    def stats(self):
+        return {
+            "loaded_tenants": len(self._tenants),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "scatter_visits": self.visits,
+        }
+
+    def _split_single_file(self):
+        """One-time move of an existing single-file database into per-tenant shards"""
+        staging = f"{self.directory}.{os.getpid()}.tmp"
+        tenants = {}
+        for name in TENANT_COLLECTIONS:
+            for doc in getattr(self.default, name).data:
+                if isinstance(doc.get("user_openid"), str):
+                    tenants.setdefault(shard_key(doc["user_openid"]), {}).setdefault(name, []).append(doc)
+        for key, collections in tenants.items():
+            shard = MockDatabase(os.path.join(staging, key, "mock_db_data.json"))
+            for name, docs in collections.items():
+                getattr(shard, name).data = docs
+            shard._write_snapshot()
+            shard.close()
+        os.makedirs(staging, exist_ok=True)
+        try:
+            os.rename(staging, self.directory)
+            print(f"Split mock database into {len(tenants)} tenant shards")
+        except OSError:
+            # Another worker finished the split first
+            for root, dirs, files in os.walk(staging, topdown=False):
+                for entry in files:
+                    os.remove(os.path.join(root, entry))
+                for entry in dirs:
+                    os.rmdir(os.path.join(root, entry))
+            os.rmdir(staging)
+
+    def _drop_owned_from_default(self):
+        for name in TENANT_COLLECTIONS:
+            collection = getattr(self.default, name)
+            with self.default.writing():
+                owned = [doc for doc in collection.data if isinstance(doc.get("user_openid"), str)]
+                if owned:
+                    collection.data = [doc for doc in collection.data if not isinstance(doc.get("user_openid"), str)]
+                    self.default.changed(name, deleted=owned)
+
+
+def open_mock_database():
+    return ShardedMockDatabase() if MOCK_DB_SHARDED else MockDatabase()
@@ -0,0 +1,145 @@
+"""
+Compact in-memory documents for MockDatabase (MOCK_DB_COMPACT=true).
+
+Repos, commits and issues are kept as __slots__ records whose fields come from the pydantic models
+instead of as dicts: no per-document key table, nested models (the commit's cost) as records of their
+own, lists as tuples (all empty ones are the same object) and low-cardinality strings interned so
+every record shares one copy. Fields a model does not know about live in a small per-record dict.
+
+Records are read-only mappings, so the mock's matcher, sorting and aggregation use them like the
+dicts they replace; plain dicts with fresh lists are only built when a document leaves the store.
+"""
+import sys
+import typing
+from collections.abc import Mapping
+from typing import Any, Dict, Optional, Type
+
+from pydantic import BaseModel
+
+from models import Commit, Issue, Repo
+
+MODELS = {"repos": Repo, "commits": Commit, "issues": Issue}
+# Fields the routes store beside the model's own
+STORED_FIELDS = {
+    "repos": ("deleted_at", "purge_progress"),
+    "issues": ("priority_rank",),
+}
+# Values repeated across many documents (owner, vehicle, record type, template titles, currency)
+LOW_CARDINALITY = frozenset({
+    "user_openid", "repo_id", "title", "type", "status", "priority", "labels", "currency", "branch", "color",
+})
+_EMPTY = ()
+_MISSING = object()
+
+
+class Record(Mapping):
+    __slots__ = ("_extra",)
+    _fields: tuple = ()
+    _field_set: frozenset = frozenset()
+    _nested: Dict[str, Type["Record"]] = {}
+    # Slot descriptors' setters by field, bypassing __setattr__
+    _setters: Dict[str, Any] = {}
+
+    @classmethod
+    def pack(cls, doc: Mapping) -> "Record":
+        record = cls.__new__(cls)
+        setters = cls._setters
+        extra = None
+        for key, value in doc.items():
+            setter = setters.get(key)
+            if setter is None:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+                continue
+            kind = type(value)
+            if kind is str:
+                if key in LOW_CARDINALITY:
+                    value = sys.intern(value)
+            elif kind is list:
+                value = tuple(_share(key, item) for item in value) if value else _EMPTY
+            elif kind is dict and key in cls._nested and value.keys() <= cls._nested[key]._field_set:
+                value = cls._nested[key].pack(value)
+            setter(record, value)
+        _set_extra(record, extra)
+        return record
+
+    def __getitem__(self, key: str) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in self._field_set:
+            value = getattr(self, key, _MISSING)
+            if value is _MISSING:
+                return default
+            if type(value) is tuple:
+                return list(value)
+            if key in self._nested and type(value) is self._nested[key]:
+                return dict(value)
+            return value
+        if self._extra is not None:
+            return self._extra.get(key, default)
+        return default
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._field_set:
+            return hasattr(self, key)  # type: ignore[arg-type]
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self):
+        for key in self._fields:
+            if hasattr(self, key):
+                yield key
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise TypeError("records are immutable; store a new one instead")
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+
+_set_extra = Record.__dict__["_extra"].__set__
+
+
+def _share(key: str, value: Any) -> Any:
+    if type(value) is str and key in LOW_CARDINALITY:
+        return sys.intern(value)
+    return value
+
+
+def _model_type(annotation: Any) -> Optional[Type[BaseModel]]:
+    for candidate in (annotation, *typing.get_args(annotation)):
+        if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+            return candidate
+    return None
+
+
+def record_type(model: Type[BaseModel], stored: tuple = ()) -> Type[Record]:
+    """A Record subclass with one slot per model field (by alias, so Field(alias="_id") is _id)"""
+    fields, nested = [], {}
+    for name, info in model.model_fields.items():
+        key = info.alias or name
+        fields.append(key)
+        sub_model = _model_type(info.annotation)
+        if sub_model is not None:
+            nested[key] = record_type(sub_model)
+    fields.extend(field for field in stored if field not in fields)
+    cls = type(f"{model.__name__}Record", (Record,), {
+        "__slots__": tuple(fields),
+        "_fields": tuple(fields),
+        "_field_set": frozenset(fields),
+        "_nested": nested,
+    })
+    cls._setters = {field: cls.__dict__[field].__set__ for field in fields}
+    return cls
+
+
+RECORD_TYPES = {name: record_type(model, STORED_FIELDS.get(name, ())) for name, model in MODELS.items()}
@@ -0,0 +1,136 @@
+"""
+Binary snapshot format for MockDatabase (MOCK_DB_FORMAT=binary).
+
+    magic "ARMDB" | u8 version | u32 collection count
+    per collection: u16 name length | name (utf-8) | u8 encoding | u32 document count | u64 offset | u64 length
+    data region: each collection's encoded documents
+
+Collections whose documents all have ObjectId ids and otherwise plain JSON values (repos, commits,
+issues) are stored as a column of raw 12-byte ids followed by one compact JSON array: a single C parse
+that shares key strings between documents, with no per-document id parsing. Anything else (datetimes,
+string ids) falls back to consecutive BSON documents. Collections are decoded on first access; ones
+that are never touched cost neither parse time nor resident memory, and are copied byte for byte into
+the next snapshot.
+"""
+import json
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import bson
+from bson import ObjectId
+from bson.errors import InvalidDocument
+
+MAGIC = b"ARMDB"
+VERSION = 1
+HEADER = struct.Struct("<5sBI")
+ENTRY = struct.Struct("<BIQQ")
+ID_SIZE = 12
+# Collection encodings
+JSON_ROWS = 0
+BSON_DOCUMENTS = 1
+
+
+class LazyCollection:
+    """Documents of one collection, still encoded in the mapped snapshot"""
+
+    def __init__(self, buffer: mmap.mmap, encoding: int, offset: int, length: int, count: int) -> None:
+        self.buffer = buffer
+        self.encoding = encoding
+        self.offset = offset
+        self.length = length
+        self.count = count
+
+    def raw(self) -> bytes:
+        return self.buffer[self.offset:self.offset + self.length]
+
+    def decode(self) -> List[Dict[str, Any]]:
+        end = self.offset + self.length
+        if self.encoding == BSON_DOCUMENTS:
+            with memoryview(self.buffer) as view:
+                return bson.decode_all(view[self.offset:end])
+        ids_end = self.offset + self.count * ID_SIZE
+        ids = self.buffer[self.offset:ids_end]
+        documents = json.loads(self.buffer[ids_end:end])
+        for i, doc in enumerate(documents):
+            doc["_id"] = ObjectId(ids[i * ID_SIZE:(i + 1) * ID_SIZE])
+        return documents
+
+
+def _encode_rows(documents: List[Dict[str, Any]]) -> Optional[bytes]:
+    """ids column plus JSON array, or None when the documents need BSON to keep their types"""
+    if not all(type(doc.get("_id")) is ObjectId for doc in documents):
+        return None
+    try:
+        # The id keeps its key position as a null placeholder
+        rows = json.dumps(
+            [{**doc, "_id": None} for doc in documents], ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+    except TypeError:
+        return None
+    return b"".join(doc["_id"].binary for doc in documents) + rows
+
+
+def _encode_bson(doc: Dict[str, Any]) -> bytes:
+    try:
+        return bson.encode(doc)
+    except InvalidDocument:
+        # Values BSON has no type for are stored as strings, as the JSON snapshot does
+        _id = doc.get("_id")
+        sanitized = json.loads(json.dumps(doc, default=str))
+        if _id is not None:
+            sanitized["_id"] = _id
+        return bson.encode(sanitized)
+
+
+def write_snapshot(path: str, collections: Iterable[Tuple[str, Any]], fsync: bool = False) -> None:
+    """collections yields (name, documents) where documents is a list of dicts or a LazyCollection"""
+    entries, blobs = [], []
+    offset = 0
+    for name, documents in collections:
+        if isinstance(documents, LazyCollection):
+            encoding, blob, count = documents.encoding, documents.raw(), documents.count
+        else:
+            encoding, blob, count = JSON_ROWS, _encode_rows(documents), len(documents)
+            if blob is None:
+                encoding, blob = BSON_DOCUMENTS, b"".join(_encode_bson(doc) for doc in documents)
+        entries.append((name.encode("utf-8"), encoding, count, offset, len(blob)))
+        blobs.append(blob)
+        offset += len(blob)
+
+    # Written beside the target and renamed: the old file may still be mapped by this or another process
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(entries)))
+        for name, encoding, count, start, length in entries:
+            f.write(struct.pack("<H", len(name)) + name + ENTRY.pack(encoding, count, start, length))
+        for blob in blobs:
+            f.write(blob)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def open_snapshot(path: str) -> Dict[str, LazyCollection]:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return {}
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, count = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} mock database snapshot")
+
+    position = HEADER.size
+    entries = []
+    for _ in range(count):
+        (name_length,) = struct.unpack_from("<H", buffer, position)
+        name = buffer[position + 2:position + 2 + name_length].decode("utf-8")
+        position += 2 + name_length
+        entries.append((name, *ENTRY.unpack_from(buffer, position)))
+        position += ENTRY.size
+    return {
+        name: LazyCollection(buffer, encoding, position + start, length, documents)
+        for name, encoding, documents, start, length in entries
+    }
@@ -2,6 +2,13 @@ from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 
+PRIORITY_RANKS = {"high": 0, "medium": 1, "low": 2}
+DEFAULT_PRIORITY_RANK = 99
+
+def priority_rank(priority: Optional[str]) -> int:
+    """Numeric sort key stored alongside an issue's priority so ordering can be served by an index"""
+    return PRIORITY_RANKS.get(priority or "", DEFAULT_PRIORITY_RANK)
+
 class Cost(BaseModel):
     parts: float = 0
     labor: float = 0
@@ -0,0 +1,191 @@
+import asyncio
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from auth import ADMIN_TOKEN, verify_admin_token
+
+PROFILE_DIR = os.path.join(os.getenv("DATA_DIR", "/data"), "profiles")
+# Fraction of requests sampled in the background into per-route profiles (0 disables, 0.001 = 1 in 1000)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+# The middleware is only installed when something can trigger it
+PROFILING_ENABLED = bool(ADMIN_TOKEN) or PROFILE_SAMPLE_RATE > 0
+
+PROFILE_HEADER = b"x-profile"
+ADMIN_HEADER = b"x-admin-token"
+
+
+def _route_name(scope: Dict[str, Any]) -> str:
+    route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+    return f"{scope.get('method', '')} {route}"
+
+
+def _file_stem(route: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+
+
+class StackSampler:
+    """
+    Low-overhead wall-clock sampler: a daemon thread snapshots every thread's Python stack at a fixed
+    interval and counts them as collapsed stacks ("thread;module:func;...") ready for flamegraph.pl
+    or speedscope. Event-loop samples include whatever else the loop ran during the request.
+    """
+
+    def __init__(self, interval_ms: float = PROFILE_SAMPLE_INTERVAL_MS) -> None:
+        self.interval = interval_ms / 1000
+        self.stacks: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            parts = []
+            while frame is not None:
+                code = frame.f_code
+                parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            parts.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(parts))] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.stacks
+
+
+def write_collapsed(path: str, stacks: Counter) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(f"{stack} {count}\n")
+
+
+class Profiler:
+    """Per-request profiles on demand, plus background-sampled per-route aggregates"""
+
+    def __init__(self, directory: str = PROFILE_DIR, sample_rate: float = PROFILE_SAMPLE_RATE) -> None:
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.route_stacks: Dict[str, Counter] = {}
+        # Only one cProfile can be enabled per thread; concurrent requests fall back to the sampler
+        self.cprofile_active = False
+        self.profiled = 0
+        self.sampled = 0
+
+    def _path(self, *parts: str) -> str:
+        path = os.path.join(self.directory, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def request_path(self, mode: str, scope: Dict[str, Any]) -> str:
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        suffix = "pstats" if mode == "cprofile" else "collapsed"
+        return self._path(f"{stamp}-{_file_stem(scope.get('path', ''))}.{suffix}")
+
+    async def merge_route(self, route: str, stacks: Counter) -> None:
+        aggregate = self.route_stacks.setdefault(route, Counter())
+        aggregate.update(stacks)
+        self.sampled += 1
+        snapshot = Counter(aggregate)
+        await asyncio.to_thread(write_collapsed, self._path("routes", f"{_file_stem(route)}.collapsed"), snapshot)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sample_rate": self.sample_rate,
+            "profiled_requests": self.profiled,
+            "sampled_requests": self.sampled,
+            "routes": len(self.route_stacks),
+        }
+
+
+profiler = Profiler()
+
+
+class ProfilingMiddleware:
+    """
+    Profiles single requests on demand (X-Admin-Token plus X-Profile: cprofile|sample) and a random
+    PROFILE_SAMPLE_RATE fraction of all requests into per-route collapsed stacks under DATA_DIR/profiles.
+    Not installed at all unless ADMIN_TOKEN or PROFILE_SAMPLE_RATE is set.
+    """
+
+    def __init__(self, app: Any, profiler: Profiler = profiler) -> None:
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = None
+        headers = dict(scope.get("headers") or [])
+        requested = headers.get(PROFILE_HEADER)
+        if requested is not None and verify_admin_token(headers.get(ADMIN_HEADER, b"").decode("latin-1")):
+            mode = "sample" if requested.strip().lower() == b"sample" else "cprofile"
+
+        if mode is not None:
+            await self._profile_request(mode, scope, receive, send)
+        elif self.profiler.sample_rate > 0 and random.random() < self.profiler.sample_rate:
+            sampler = StackSampler()
+            sampler.start()
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                stacks = sampler.stop()
+                await self.profiler.merge_route(_route_name(scope), stacks)
+        else:
+            await self.app(scope, receive, send)
+
+    async def _profile_request(self, mode: str, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if self.profiler.cprofile_active:
+            mode = "sample"
+        path = self.profiler.request_path(mode, scope)
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-profile-file", os.path.basename(path).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        started = time.perf_counter()
+        if mode == "cprofile":
+            # cProfile sees every coroutine the loop thread runs while enabled, not just this request's
+            self.profiler.cprofile_active = True
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                profile.disable()
+                self.profiler.cprofile_active = False
+                await asyncio.to_thread(profile.dump_stats, path)
+        else:
+            sampler = StackSampler()
+            sampler.start()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                await asyncio.to_thread(write_collapsed, path, sampler.stop())
+        self.profiler.profiled += 1
+        print(f"Profiled {_route_name(scope)} ({mode}) in {time.perf_counter() - started:.3f}s -> {path}")
@@ -0,0 +1,151 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from bson import ObjectId
+
+PURGE_BATCH_SIZE = int(os.getenv("PURGE_BATCH_SIZE", "500"))
+PURGE_MAX_ATTEMPTS = int(os.getenv("PURGE_MAX_ATTEMPTS", "8"))
+PURGE_RETRY_MAX_SECONDS = 300
+
+
+def live_repo_filter(tombstones: Iterable[str]) -> Dict[str, Any]:
+    """Extra query terms that hide commits/issues belonging to tombstoned repos"""
+    tombstones = list(tombstones)
+    if not tombstones:
+        return {}
+    return {"repo_id": {"$nin": tombstones}}
+
+
+class RepoPurger:
+    """
+    Cascade deletion for repos.
+    Deleting a repo only writes a tombstone (deleted_at) and hides it from reads; the tombstones are read
+    from the database, so a repo deleted through one worker is hidden by all of them. A background
+    worker then removes its commits (hot and archived) and issues in bounded batches, recording progress on the
+    tombstone and retrying with backoff, and finally removes the repo document itself.
+    """
+
+    def __init__(self, batch_size: int = PURGE_BATCH_SIZE) -> None:
+        self.batch_size = batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._attempts: Dict[str, int] = {}
+
+    def reset(self) -> None:
+        self._attempts.clear()
+
+    async def deleted_repo_ids(self, db: Any, user_openid: Optional[str] = None) -> Set[str]:
+        """Ids of tombstoned repos (of one user, or of everyone)"""
+        query: Dict[str, Any] = {"deleted_at": {"$ne": None}}
+        if user_openid is not None:
+            query["user_openid"] = user_openid
+        return {str(repo["_id"]) async for repo in db.repos.find(query, {"_id": 1})}
+
+    async def live_filter(self, db: Any, user_openid: str) -> Dict[str, Any]:
+        return live_repo_filter(await self.deleted_repo_ids(db, user_openid))
+
+    async def tombstone(self, db: Any, repo_id: str, user_openid: str) -> None:
+        await db.repos.update_one(
+            {"_id": ObjectId(repo_id), "user_openid": user_openid},
+            {"$set": {
+                "deleted_at": datetime.now().timestamp() * 1000,
+                "purge_progress": {"commits": 0, "issues": 0, "attempts": 0, "last_error": None}
+            }}
+        )
+        self.schedule(repo_id, user_openid)
+
+    def schedule(self, repo_id: str, user_openid: str) -> None:
+        # Without a running worker the tombstone is picked up by resume() on next startup
+        if self._queue is not None:
+            self._queue.put_nowait((repo_id, user_openid))
+
+    async def _purge_collection(self, db: Any, name: str, repo_id: str, user_openid: str,
+                                progress: Dict[str, Any]) -> None:
+        collection = getattr(db, name)
+        while True:
+            batch = await collection.find(
+                {"repo_id": repo_id, "user_openid": user_openid}, {"_id": 1}
+            ).limit(self.batch_size).to_list(length=self.batch_size)
+            if not batch:
+                return
+            result = await collection.delete_many(
+                {"_id": {"$in": [doc["_id"] for doc in batch]}, "user_openid": user_openid}
+            )
+            progress[name] += result.deleted_count
+            await db.repos.update_one(
+                {"_id": ObjectId(repo_id), "user_openid": user_openid}, {"$set": {"purge_progress": dict(progress)}}
+            )
+            # Yield between batches so a long history never monopolises the event loop
+            await asyncio.sleep(0)
+
+    async def purge(self, db: Any, repo_id: str, user_openid: str) -> None:
+        tombstone = await db.repos.find_one(
+            {"_id": ObjectId(repo_id), "user_openid": user_openid, "deleted_at": {"$ne": None}}
+        )
+        if not tombstone:
+            return
+
+        progress = dict(tombstone.get("purge_progress") or {})
+        progress.setdefault("commits", 0)
+        progress.setdefault("issues", 0)
+        progress.setdefault("commit_archive", 0)
+        progress["attempts"] = progress.get("attempts", 0) + 1
+        try:
+            await self._purge_collection(db, "commits", repo_id, user_openid, progress)
+            await self._purge_collection(db, "issues", repo_id, user_openid, progress)
+            await self._purge_collection(db, "commit_archive", repo_id, user_openid, progress)
+        except Exception as e:
+            progress["last_error"] = str(e)
+            await db.repos.update_one(
+                {"_id": ObjectId(repo_id), "user_openid": user_openid}, {"$set": {"purge_progress": progress}}
+            )
+            raise
+
+        await db.repos.delete_one({"_id": ObjectId(repo_id), "user_openid": user_openid, "deleted_at": {"$ne": None}})
+        self._attempts.pop(repo_id, None)
+        print(f"Purged repo {repo_id}: {progress['commits']} commits, {progress['issues']} issues")
+
+    async def resume(self, db: Any) -> None:
+        """Queue purges of tombstones left by earlier processes"""
+        async for repo in db.repos.find({"deleted_at": {"$ne": None}}, {"_id": 1, "user_openid": 1}):
+            self.schedule(str(repo["_id"]), repo.get("user_openid"))
+
+    async def _run(self, get_db: Callable[[], Any]) -> None:
+        assert self._queue is not None
+        loop = asyncio.get_running_loop()
+        while True:
+            item: Tuple[str, str] = await self._queue.get()
+            repo_id, user_openid = item
+            try:
+                await self.purge(get_db(), repo_id, user_openid)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                attempts = self._attempts.get(repo_id, 0) + 1
+                self._attempts[repo_id] = attempts
+                if attempts >= PURGE_MAX_ATTEMPTS:
+                    print(f"Giving up purging repo {repo_id} after {attempts} attempts: {e}")
+                    continue
+                delay = min(2 ** attempts, PURGE_RETRY_MAX_SECONDS)
+                print(f"Purging repo {repo_id} failed ({e}), retrying in {delay}s")
+                loop.call_later(delay, self._queue.put_nowait, item)
+
+    def start(self, get_db: Callable[[], Any]) -> None:
+        if self._task is None:
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run(get_db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._queue = None
+
+
+repo_purger = RepoPurger()
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from fastapi import HTTPException, Request
+from limits.storage import Storage
+from slowapi import Limiter
+from slowapi.util import get_remote_address
+
+# memory:// is per process; use sqlite:///path/to/file.db to share limits across uvicorn workers
+# on one host, or any limits network store (redis://, memcached://) across hosts
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+
+# Expired counters are swept every this many increments
+SWEEP_EVERY = 1000
+
+
+class SQLiteStorage(Storage):
+    """
+    File-backed rate limit counters shared by every process on the host.
+    Each increment is a single atomic upsert (O(1), one row per key and window) in a WAL-mode
+    database with synchronous=OFF, since counters are ephemeral and need no durability.
+    Registered with `limits` under the sqlite:// scheme.
+    """
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: Optional[str] = None, wrap_exceptions: bool = False, **options) -> None:
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        path = (uri or "sqlite:///ratelimit.db")[len("sqlite://"):] or "ratelimit.db"
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS counters ("
+            "key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._increments = 0
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: int, amount: int = 1) -> int:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "INSERT INTO counters (key, count, expires_at) VALUES (?1, ?2, ?3) "
+                "ON CONFLICT(key) DO UPDATE SET "
+                "count = CASE WHEN expires_at <= ?4 THEN ?2 ELSE count + ?2 END, "
+                "expires_at = CASE WHEN expires_at <= ?4 THEN ?3 ELSE expires_at END "
+                "RETURNING count",
+                (key, amount, now + expiry, now)
+            ).fetchone()
+            self._increments += 1
+            if self._increments % SWEEP_EVERY == 0:
+                self._conn.execute("DELETE FROM counters WHERE expires_at <= ?", (now,))
+        return row[0]
+
+    def get(self, key: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT count FROM counters WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else time.time()
+
+    def check(self) -> bool:
+        try:
+            with self._lock:
+                self._conn.execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        with self._lock:
+            return self._conn.execute("DELETE FROM counters").rowcount
+
+    def clear(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM counters WHERE key = ?", (key,))
+
+
+def rate_limit_key(request: Request) -> str:
+    """Authenticated requests are limited per user; anonymous ones per remote address"""
+    authorization = request.headers.get("authorization")
+    if authorization and authorization.startswith("Bearer "):
+        from auth import resolve_token
+
+        try:
+            return f"user:{resolve_token(authorization[len('Bearer '):])}"
+        except HTTPException:
+            pass
+    return get_remote_address(request)
+
+
+limiter = Limiter(key_func=rate_limit_key, storage_uri=RATE_LIMIT_STORAGE_URI)
@@ -0,0 +1,342 @@
+import asyncio
+import heapq
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from bson import ObjectId
+
+from models import priority_rank
+from coalesce import request_coalescer
+
+REMINDER_SWEEP_SECONDS = int(os.getenv("REMINDER_SWEEP_SECONDS", "300"))
+REMINDER_REBUILD_SECONDS = int(os.getenv("REMINDER_REBUILD_SECONDS", "3600"))
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+# Repo expiry fields tracked as reminders, with the title shown to the user
+DOCUMENT_FIELDS = {
+    "compulsory_insurance_expiry": ("compulsory_insurance", "交强险到期"),
+    "commercial_insurance_expiry": ("commercial_insurance", "商业险到期"),
+    "inspection_expiry": ("inspection", "年检到期"),
+}
+
+Key = Tuple[str, ...]
+
+
+def _now_ms() -> float:
+    return datetime.now().timestamp() * 1000
+
+
+class ReminderEngine:
+    """
+    In-process index of everything that can come due: open issues with a due date or due mileage,
+    and repo document expiries. Min-heaps keyed by due time and by due mileage (per repo) let writes
+    and the periodic sweep find newly due issues without scanning every open issue.
+    Heap entries are invalidated lazily: an entry is live only while its seq matches the tracked item.
+    Only indexed issues are escalated; ones written by other worker processes are indexed by the
+    periodic rebuild and escalated by the sweep that follows it.
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+        self._rebuild_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def reset(self) -> None:
+        self.ready = False
+        # Changes made while a rebuild is scanning, replayed onto the new index before it is swapped in
+        self._journal: Optional[List[Tuple[str, tuple]]] = None
+        self._clear()
+
+    def _clear(self) -> None:
+        self._items: Dict[Key, Dict[str, Any]] = {}
+        self._repos: Dict[str, Dict[str, Any]] = {}
+        self._by_user: Dict[str, Set[Key]] = {}
+        self._by_repo: Dict[str, Set[Key]] = {}
+        self._time_heap: List[Tuple[float, int, Key]] = []
+        self._mileage_heaps: Dict[str, List[Tuple[int, int, Key]]] = {}
+        self._seq = 0
+
+    # --- Index maintenance ---
+
+    def _add(self, key: Key, item: Dict[str, Any]) -> None:
+        self._remove(key)
+        self._seq += 1
+        item["seq"] = self._seq
+        self._items[key] = item
+        self._by_user.setdefault(item["user_openid"], set()).add(key)
+        self._by_repo.setdefault(item["repo_id"], set()).add(key)
+
+        # Only issues that can still be escalated need a heap entry
+        if item["kind"] == "issue" and item["priority"] != "high":
+            if item.get("due_date") is not None:
+                heapq.heappush(self._time_heap, (item["due_date"], item["seq"], key))
+            if item.get("due_mileage") is not None:
+                heap = self._mileage_heaps.setdefault(item["repo_id"], [])
+                heapq.heappush(heap, (item["due_mileage"], item["seq"], key))
+
+    def _remove(self, key: Key) -> None:
+        item = self._items.pop(key, None)
+        if item is None:
+            return
+        self._by_user.get(item["user_openid"], set()).discard(key)
+        self._by_repo.get(item["repo_id"], set()).discard(key)
+
+    def _is_live(self, seq: int, key: Key) -> bool:
+        item = self._items.get(key)
+        return item is not None and item["seq"] == seq and item["priority"] != "high"
+
+    def _log(self, method: str, *args: Any) -> None:
+        if self._journal is not None:
+            self._journal.append((method, args))
+
+    def track_repo(self, repo: Dict[str, Any]) -> None:
+        self._log("track_repo", repo)
+        repo_id = str(repo["_id"])
+        user_openid = repo.get("user_openid")
+        if not user_openid:
+            return
+        self._repos[repo_id] = {
+            "user_openid": user_openid,
+            "name": repo.get("name"),
+            "current_mileage": repo.get("current_mileage") or 0,
+        }
+        for field, (kind, title) in DOCUMENT_FIELDS.items():
+            key = ("repo", repo_id, field)
+            if repo.get(field) is None:
+                self._remove(key)
+                continue
+            self._add(key, {
+                "kind": kind,
+                "user_openid": user_openid,
+                "repo_id": repo_id,
+                "title": title,
+                "priority": None,
+                "due_date": repo[field],
+                "due_mileage": None,
+            })
+
+    def forget_repo(self, repo_id: str) -> None:
+        self._log("forget_repo", repo_id)
+        for key in list(self._by_repo.pop(repo_id, set())):
+            self._remove(key)
+        self._repos.pop(repo_id, None)
+        self._mileage_heaps.pop(repo_id, None)
+
+    def track_issue(self, issue: Dict[str, Any]) -> None:
+        self._log("track_issue", issue)
+        key = ("issue", str(issue["_id"]))
+        due_date = issue.get("due_date")
+        due_mileage = issue.get("due_mileage")
+        if issue.get("status") != "open" or (due_date is None and due_mileage is None):
+            self._remove(key)
+            return
+        self._add(key, {
+            "kind": "issue",
+            "user_openid": issue.get("user_openid"),
+            "repo_id": issue.get("repo_id"),
+            "issue_id": str(issue["_id"]),
+            "title": issue.get("title"),
+            "priority": issue.get("priority"),
+            "due_date": due_date,
+            "due_mileage": due_mileage,
+        })
+
+    def forget_issue(self, issue_id: str, repo_id: Optional[str] = None) -> None:
+        self._log("forget_issue", issue_id, repo_id)
+        key = ("issue", issue_id)
+        item = self._items.get(key)
+        if item is not None and (repo_id is None or item["repo_id"] == repo_id):
+            self._remove(key)
+
+    def set_mileage(self, repo_id: str, mileage: int) -> None:
+        self._log("set_mileage", repo_id, mileage)
+        repo = self._repos.get(repo_id)
+        if repo is not None:
+            repo["current_mileage"] = mileage
+
+    def raise_mileage(self, repo_id: str, mileage: int) -> None:
+        self._log("raise_mileage", repo_id, mileage)
+        repo = self._repos.get(repo_id)
+        if repo is not None and mileage > repo["current_mileage"]:
+            repo["current_mileage"] = mileage
+
+    # --- Due detection ---
+
+    def pop_due_by_mileage(self, repo_id: str, mileage: int) -> List[str]:
+        """Raise the repo's known mileage and return open issues whose due mileage has been reached"""
+        self.raise_mileage(repo_id, mileage)
+
+        due = []
+        heap = self._mileage_heaps.get(repo_id, [])
+        while heap and heap[0][0] <= mileage:
+            _, seq, key = heapq.heappop(heap)
+            if self._is_live(seq, key):
+                due.append(key[1])
+        return due
+
+    def pop_due_by_time(self, now_ms: float) -> List[str]:
+        due = []
+        while self._time_heap and self._time_heap[0][0] <= now_ms:
+            _, seq, key = heapq.heappop(self._time_heap)
+            if self._is_live(seq, key):
+                due.append(key[1])
+        return due
+
+    def pop_all_due(self, now_ms: float) -> List[str]:
+        due = set(self.pop_due_by_time(now_ms))
+        for repo_id, repo in list(self._repos.items()):
+            due.update(self.pop_due_by_mileage(repo_id, repo["current_mileage"]))
+        return list(due)
+
+    def mark_escalated(self, issue_ids: List[str]) -> None:
+        self._log("mark_escalated", issue_ids)
+        for issue_id in issue_ids:
+            item = self._items.get(("issue", issue_id))
+            if item is not None:
+                item["priority"] = "high"
+                # Escalation reorders the repo's issue list
+                request_coalescer.bump(item["repo_id"])
+
+    # --- Queries ---
+
+    def for_user(self, user_openid: str, now_ms: float, days: int, mileage_window: int) -> List[Dict[str, Any]]:
+        horizon = now_ms + days * DAY_MS
+        reminders = []
+        for key in self._by_user.get(user_openid, set()):
+            item = self._items[key]
+            repo = self._repos.get(item["repo_id"], {})
+
+            remaining_mileage = None
+            if item["due_mileage"] is not None:
+                remaining_mileage = item["due_mileage"] - repo.get("current_mileage", 0)
+
+            due_by_time = item["due_date"] is not None and item["due_date"] <= horizon
+            due_by_mileage = remaining_mileage is not None and remaining_mileage <= mileage_window
+            if not (due_by_time or due_by_mileage):
+                continue
+
+            overdue = (item["due_date"] is not None and item["due_date"] <= now_ms) or (
+                remaining_mileage is not None and remaining_mileage <= 0
+            )
+            reminders.append({
+                "kind": item["kind"],
+                "repo_id": item["repo_id"],
+                "repo_name": repo.get("name"),
+                "issue_id": item.get("issue_id"),
+                "title": item["title"],
+                "priority": item["priority"],
+                "due_date": item["due_date"],
+                "due_mileage": item["due_mileage"],
+                "remaining_mileage": remaining_mileage,
+                "overdue": overdue,
+            })
+
+        reminders.sort(key=lambda r: (
+            not r["overdue"],
+            r["due_date"] if r["due_date"] is not None else float("inf"),
+            r["remaining_mileage"] if r["remaining_mileage"] is not None else float("inf"),
+        ))
+        return reminders
+
+    # --- Lifecycle ---
+
+    async def rebuild(self, db: Any, only_if_needed: bool = False) -> None:
+        """
+        Rebuild the index from the database into a fresh one and swap it in. The current index keeps
+        serving (ready stays as it was) while the scan runs; changes made meanwhile are replayed onto
+        the new index so none are lost.
+        """
+        async with self._rebuild_lock:
+            if only_if_needed and self.ready:
+                return
+            started = time.perf_counter()
+            fresh = ReminderEngine()
+            self._journal = []
+            try:
+                async for repo in db.repos.find({"user_openid": {"$ne": None}, "deleted_at": None}):
+                    fresh.track_repo(repo)
+                for due_field in ("due_date", "due_mileage"):
+                    async for issue in db.issues.find({"status": "open", due_field: {"$ne": None}}):
+                        # Skips issues of ownerless or tombstoned repos
+                        if issue.get("repo_id") in fresh._repos:
+                            fresh.track_issue(issue)
+                for method, args in self._journal:
+                    getattr(fresh, method)(*args)
+            finally:
+                self._journal = None
+            self._items, self._repos = fresh._items, fresh._repos
+            self._by_user, self._by_repo = fresh._by_user, fresh._by_repo
+            self._time_heap, self._mileage_heaps, self._seq = fresh._time_heap, fresh._mileage_heaps, fresh._seq
+            self.ready = True
+            print(f"Reminder index rebuilt: {len(self._items)} items in {time.perf_counter() - started:.3f}s")
+
+    async def ensure_ready(self, db: Any) -> None:
+        if not self.ready:
+            # Callers queued behind a running rebuild reuse it instead of starting another
+            await self.rebuild(db, only_if_needed=True)
+
+    async def escalate(self, db: Any, issue_ids: List[str]) -> None:
+        # One update per owner, so each one stays on that user's data (one shard when sharded)
+        by_user: Dict[str, List[ObjectId]] = {}
+        for issue_id in issue_ids:
+            item = self._items.get(("issue", issue_id))
+            if item is not None and item["user_openid"]:
+                by_user.setdefault(item["user_openid"], []).append(ObjectId(issue_id))
+        for user_openid, ids in by_user.items():
+            await db.issues.update_many(
+                {"_id": {"$in": ids}, "user_openid": user_openid, "status": "open"},
+                {"$set": {"priority": "high", "priority_rank": priority_rank("high")}}
+            )
+        self.mark_escalated(issue_ids)
+
+    async def escalate_by_mileage(self, db: Any, repo_id: str, user_openid: str, mileage: int) -> None:
+        """Escalate the repo's indexed open issues whose due mileage has been reached"""
+        await self.ensure_ready(db)
+        await self.escalate(db, self.pop_due_by_mileage(repo_id, mileage))
+
+    async def sweep(self, db: Any) -> int:
+        """
+        Escalate every indexed issue that came due by date or mileage since the last sweep. Issues only
+        other workers have indexed are picked up once the periodic rebuild has loaded them.
+        """
+        await self.ensure_ready(db)
+        due = self.pop_all_due(_now_ms())
+        await self.escalate(db, due)
+        return len(due)
+
+    async def _run(self, get_db: Callable[[], Any]) -> None:
+        last_rebuild = time.monotonic()
+        while True:
+            await asyncio.sleep(REMINDER_SWEEP_SECONDS)
+            try:
+                db = get_db()
+                # Periodic rebuild heals drift from writes handled by other worker processes
+                if time.monotonic() - last_rebuild >= REMINDER_REBUILD_SECONDS:
+                    await self.rebuild(db)
+                    last_rebuild = time.monotonic()
+                escalated = await self.sweep(db)
+                if escalated:
+                    print(f"Reminder sweep escalated {escalated} issues")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Reminder sweep failed: {e}")
+
+    def start(self, get_db: Callable[[], Any]) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(get_db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+reminder_engine = ReminderEngine()
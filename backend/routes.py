@@ -1,16 +1,28 @@
-from fastapi import APIRouter, HTTPException, Body, Depends, Request
+from fastapi import APIRouter, HTTPException, Body, Depends, Header, Request
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-from slowapi import Limiter
-from slowapi.util import get_remote_address
-from models import Repo, Commit, Issue, CommitPatch, IssuePatch
+from models import Repo, Commit, Issue, CommitPatch, IssuePatch, priority_rank
 from database import get_db
 from bson import ObjectId
 from auth import get_current_user
+from ratelimit import limiter
+from suggest import title_suggester
+from reminders import reminder_engine
+from purge import repo_purger
+from admission import admission_controller
+from coalesce import request_coalescer
+from idempotency import idempotency_store
+from archive import commit_archive, add_month
+from fast_json import list_response
 import re
 
 router = APIRouter()
-limiter = Limiter(key_func=get_remote_address)
+
+# Concurrency classes for expensive or mutating endpoints, see admission.py
+WRITES = Depends(admission_controller.limit("writes"))
+ANALYTICS = Depends(admission_controller.limit("analytics"))
+EXPORT = Depends(admission_controller.limit("export"))
 
 def parse_oid(id_str: str, name: str = "id") -> ObjectId:
     """Parse string to ObjectId with proper error handling"""
@@ -19,6 +31,20 @@ def parse_oid(id_str: str, name: str = "id") -> ObjectId:
     except Exception:
         raise HTTPException(status_code=400, detail=f"Invalid {name} format")
 
+def repo_query(repo_id: str, user_openid: str) -> dict:
+    """Query for one of the user's repos, excluding repos that are tombstoned for deletion"""
+    return {"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid, "deleted_at": None}
+
+async def commit_query(db, commit_id: str, user_openid: str) -> dict:
+    """Query for one of the user's commits, excluding commits of tombstoned repos (deleted by any worker)"""
+    oid = parse_oid(commit_id, "commit_id")
+    return {"_id": oid, "user_openid": user_openid, **await repo_purger.live_filter(db, user_openid)}
+
+async def issue_query(db, issue_id: str, user_openid: str) -> dict:
+    """Query for one of the user's issues, excluding issues of tombstoned repos (deleted by any worker)"""
+    oid = parse_oid(issue_id, "issue_id")
+    return {"_id": oid, "user_openid": user_openid, **await repo_purger.live_filter(db, user_openid)}
+
 # --- Repos (Cars) ---
 
 @router.get("/repos", response_model=List[Repo])
@@ -26,37 +52,33 @@ async def get_repos(user_openid: str = Depends(get_current_user)):
     db = get_db()
     repos = []
     # Filter by user_openid for multi-tenant support
-    cursor = db.repos.find({"user_openid": user_openid})
+    # (legacy ownerless repos are assigned by the 0001_legacy_repo_owner migration)
+    cursor = db.repos.find({"user_openid": user_openid, "deleted_at": None})
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
         repos.append(doc)
     
-    # Data migration: If no repos found, check for legacy data without user_openid
-    if not repos:
-        legacy_cursor = db.repos.find({"user_openid": None})
-        legacy_count = 0
-        async for doc in legacy_cursor:
-            legacy_count += 1
-            doc["_id"] = str(doc["_id"])
-            repos.append(doc)
-        
-        # Assign legacy data to current user
-        if legacy_count > 0:
-            await db.repos.update_many(
-                {"user_openid": None},
-                {"$set": {"user_openid": user_openid}}
-            )
-    
-    return repos
+    return list_response(Repo, repos)
+
+@router.post("/repos", response_model=Repo, dependencies=[WRITES])
+async def create_repo(
+    repo: Repo,
+    user_openid: str = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    return await idempotency_store.run(
+        get_db(), user_openid, "create_repo", idempotency_key,
+        repo.model_dump(exclude_unset=True), lambda: insert_repo(repo, user_openid)
+    )
 
-@router.post("/repos", response_model=Repo)
-async def create_repo(repo: Repo, user_openid: str = Depends(get_current_user)):
+async def insert_repo(repo: Repo, user_openid: str):
     db = get_db()
     repo_dict = repo.dict(exclude={"id"})
     repo_dict["user_openid"] = user_openid
     result = await db.repos.insert_one(repo_dict)
     repo_id = str(result.inserted_id)
     repo_dict["_id"] = repo_id
+    reminder_engine.track_repo(repo_dict)
     
     # Auto-create purchase record if purchase_cost exists
     if repo.purchase_cost and repo.purchase_cost > 0:
@@ -76,23 +98,24 @@ async def create_repo(repo: Repo, user_openid: str = Depends(get_current_user)):
             "timestamp": repo.purchase_date if repo.purchase_date else datetime.now().timestamp() * 1000
         }
         await db.commits.insert_one(purchase_commit)
+        title_suggester.record(user_openid, repo_id, purchase_commit["title"])
     
     return repo_dict
 
 @router.get("/repos/{repo_id}", response_model=Repo)
 async def get_repo(repo_id: str, user_openid: str = Depends(get_current_user)):
     db = get_db()
-    repo = await db.repos.find_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
+    repo = await db.repos.find_one(repo_query(repo_id, user_openid))
         
     if repo:
         repo["_id"] = str(repo["_id"])
         return repo
     raise HTTPException(status_code=404, detail="Repo not found")
 
-@router.put("/repos/{repo_id}")
+@router.put("/repos/{repo_id}", dependencies=[WRITES])
 async def update_repo(repo_id: str, repo: Repo, user_openid: str = Depends(get_current_user)):
     db = get_db()
-    existing = await db.repos.find_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
+    existing = await db.repos.find_one(repo_query(repo_id, user_openid))
         
     if not existing:
         raise HTTPException(status_code=404, detail="Repo not found")
@@ -100,9 +123,10 @@ async def update_repo(repo_id: str, repo: Repo, user_openid: str = Depends(get_c
     update_data = repo.dict(exclude_unset=True, exclude={"id", "created_at", "user_openid"})
     
     await db.repos.update_one(
-        {"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid},
+        repo_query(repo_id, user_openid),
         {"$set": update_data}
     )
+    reminder_engine.track_repo({**existing, **update_data})
     
     old_purchase_cost = existing.get("purchase_cost") or 0
     new_purchase_cost = repo.purchase_cost or 0
@@ -113,6 +137,10 @@ async def update_repo(repo_id: str, repo: Repo, user_openid: str = Depends(get_c
             "user_openid": user_openid,
             "type": "purchase"
         })
+        if not existing_purchase_commit:
+            archived = await commit_archive.find(db, existing, {"type": "purchase"})
+            if archived and await commit_archive.thaw(db, str(archived[0]["_id"]), user_openid):
+                existing_purchase_commit = archived[0]
         
         purchase_date = repo.purchase_date if repo.purchase_date else (
             existing.get("purchase_date") or datetime.now().timestamp() * 1000
@@ -120,7 +148,7 @@ async def update_repo(repo_id: str, repo: Repo, user_openid: str = Depends(get_c
         
         if existing_purchase_commit:
             await db.commits.update_one(
-                {"_id": existing_purchase_commit["_id"]},
+                {"_id": existing_purchase_commit["_id"], "user_openid": user_openid},
                 {"$set": {
                     "message": f"车辆购买成本：¥{new_purchase_cost}",
                     "cost": {
@@ -148,21 +176,24 @@ async def update_repo(repo_id: str, repo: Repo, user_openid: str = Depends(get_c
                 "timestamp": purchase_date
             }
             await db.commits.insert_one(purchase_commit)
+            title_suggester.record(user_openid, repo_id, purchase_commit["title"])
     
+    request_coalescer.bump(repo_id)
     return {"status": "updated", "id": repo_id}
 
-@router.delete("/repos/{repo_id}")
+@router.delete("/repos/{repo_id}", dependencies=[WRITES])
 async def delete_repo(repo_id: str, user_openid: str = Depends(get_current_user)):
     db = get_db()
-    repo = await db.repos.find_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
+    repo = await db.repos.find_one(repo_query(repo_id, user_openid))
 
     if not repo:
         raise HTTPException(status_code=404, detail="Repo not found")
 
-    await db.repos.delete_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
-
-    await db.commits.delete_many({"repo_id": repo_id, "user_openid": user_openid})
-    await db.issues.delete_many({"repo_id": repo_id, "user_openid": user_openid})
+    # Tombstone now, purge commits and issues in the background
+    await repo_purger.tombstone(db, repo_id, user_openid)
+    title_suggester.forget_repo(user_openid, repo_id)
+    reminder_engine.forget_repo(repo_id)
+    request_coalescer.bump(repo_id)
 
     return {"status": "deleted", "id": repo_id}
 
@@ -182,7 +213,7 @@ async def get_commits(
 ):
     db = get_db()
     
-    repo = await db.repos.find_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
+    repo = await db.repos.find_one(repo_query(repo_id, user_openid))
     if not repo:
         raise HTTPException(status_code=404, detail="Repo not found or access denied")
     
@@ -220,13 +251,51 @@ async def get_commits(
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
         commits.append(doc)
-    return commits
+    return list_response(Commit, await commit_archive.merge(db, repo, query, commits))
 
-@router.post("/commits", response_model=Commit)
-async def create_commit(commit: Commit, user_openid: str = Depends(get_current_user)):
+SUGGEST_MAX_LIMIT = 20
+
+@router.get("/suggest")
+async def suggest_titles(
+    prefix: str = "",
+    repo_id: Optional[str] = None,
+    limit: int = 8,
+    user_openid: str = Depends(get_current_user)
+):
+    """
+    Autocomplete commit titles by prefix, most frequently used first.
+    Scoped to one vehicle when repo_id is given, otherwise across all of the user's vehicles.
+    """
     db = get_db()
     
-    repo = await db.repos.find_one({"_id": parse_oid(commit.repo_id, "repo_id"), "user_openid": user_openid})
+    if len(prefix) > 64:
+        raise HTTPException(status_code=400, detail="Prefix too long")
+    if limit < 1 or limit > SUGGEST_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Limit must be between 1 and {SUGGEST_MAX_LIMIT}")
+    
+    if repo_id:
+        repo = await db.repos.find_one(repo_query(repo_id, user_openid))
+        if not repo:
+            raise HTTPException(status_code=404, detail="Repo not found or access denied")
+    
+    return await title_suggester.suggest(db, user_openid, prefix, limit, repo_id or None)
+
+@router.post("/commits", response_model=Commit, dependencies=[WRITES])
+async def create_commit(
+    commit: Commit,
+    user_openid: str = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    # A replayed key returns the original commit without re-running the mileage and issue side effects
+    return await idempotency_store.run(
+        get_db(), user_openid, "create_commit", idempotency_key,
+        commit.model_dump(exclude_unset=True), lambda: insert_commit(commit, user_openid)
+    )
+
+async def insert_commit(commit: Commit, user_openid: str):
+    db = get_db()
+    
+    repo = await db.repos.find_one(repo_query(commit.repo_id, user_openid))
     if not repo:
         raise HTTPException(status_code=404, detail="Repo not found or access denied")
     
@@ -235,6 +304,7 @@ async def create_commit(commit: Commit, user_openid: str = Depends(get_current_u
     
     result = await db.commits.insert_one(commit_dict)
     commit_dict["_id"] = str(result.inserted_id)
+    title_suggester.record(user_openid, commit.repo_id, commit.title)
     
     if commit.mileage is not None:
         update_result = await db.repos.update_one(
@@ -263,25 +333,24 @@ async def create_commit(commit: Commit, user_openid: str = Depends(get_current_u
                 "closed_by_commit_id": commit_dict["_id"]
             }}
         )
+        for issue_id in commit.closes_issues:
+            reminder_engine.forget_issue(issue_id, commit.repo_id)
 
     if commit.mileage is not None:
-        await db.issues.update_many(
-            {
-                "repo_id": commit.repo_id,
-                "user_openid": user_openid,
-                "status": "open",
-                "due_mileage": {"$ne": None, "$lte": commit.mileage}
-            },
-            {"$set": {"priority": "high"}}
-    )
+        # Escalate open issues whose due mileage is now reached
+        await reminder_engine.escalate_by_mileage(db, commit.repo_id, user_openid, commit.mileage)
     
+    request_coalescer.bump(commit.repo_id)
     return commit_dict
 
 @router.get("/commits/{commit_id}", response_model=Commit)
 async def get_commit(commit_id: str, user_openid: str = Depends(get_current_user)):
     db = get_db()
+    query = await commit_query(db, commit_id, user_openid)
     
-    commit = await db.commits.find_one({"_id": parse_oid(commit_id, "commit_id"), "user_openid": user_openid})
+    commit = await db.commits.find_one(query)
+    if not commit:
+        commit = await commit_archive.find_commit(db, str(parse_oid(commit_id, "commit_id")), user_openid)
     if not commit:
         raise HTTPException(status_code=404, detail="Commit not found")
     
@@ -289,11 +358,14 @@ async def get_commit(commit_id: str, user_openid: str = Depends(get_current_user
     
     return commit
 
-@router.put("/commits/{commit_id}")
+@router.put("/commits/{commit_id}", dependencies=[WRITES])
 async def update_commit(commit_id: str, patch: CommitPatch, user_openid: str = Depends(get_current_user)):
     db = get_db()
+    query = await commit_query(db, commit_id, user_openid)
     
-    existing = await db.commits.find_one({"_id": parse_oid(commit_id, "commit_id"), "user_openid": user_openid})
+    existing = await db.commits.find_one(query)
+    if not existing and await commit_archive.thaw(db, str(parse_oid(commit_id, "commit_id")), user_openid):
+        existing = await db.commits.find_one(query)
     if not existing:
         raise HTTPException(status_code=404, detail="Commit not found")
     
@@ -302,15 +374,20 @@ async def update_commit(commit_id: str, patch: CommitPatch, user_openid: str = D
     if not clean_data:
         raise HTTPException(status_code=400, detail="No valid fields to update")
     
+    old_title = existing.get("title")
     await db.commits.update_one(
-        {"_id": parse_oid(commit_id, "commit_id"), "user_openid": user_openid},
+        query,
         {"$set": clean_data}
     )
     
+    if "title" in clean_data and clean_data["title"] != old_title:
+        title_suggester.forget(user_openid, existing.get("repo_id"), old_title)
+        title_suggester.record(user_openid, existing.get("repo_id"), clean_data["title"])
+    
     if "mileage" in clean_data and clean_data["mileage"]:
         repo_id = existing.get("repo_id")
         if repo_id:
-            repo = await db.repos.find_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
+            repo = await db.repos.find_one(repo_query(repo_id, user_openid))
             if repo and clean_data["mileage"] > repo.get("current_mileage", 0):
                 await db.repos.update_one(
                     {"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid},
@@ -319,34 +396,44 @@ async def update_commit(commit_id: str, patch: CommitPatch, user_openid: str = D
                         "current_head": clean_data.get("title", existing.get("title"))
                     }}
                 )
+                await reminder_engine.escalate_by_mileage(db, repo_id, user_openid, clean_data["mileage"])
     
-    updated = await db.commits.find_one({"_id": parse_oid(commit_id, "commit_id"), "user_openid": user_openid})
+    request_coalescer.bump(existing.get("repo_id"))
+    updated = await db.commits.find_one(query)
     if not updated:
         raise HTTPException(status_code=404, detail="Commit not found after update")
     updated["_id"] = str(updated["_id"])
     
     return updated
 
-@router.delete("/commits/{commit_id}")
+@router.delete("/commits/{commit_id}", dependencies=[WRITES])
 async def delete_commit(commit_id: str, user_openid: str = Depends(get_current_user)):
     db = get_db()
+    query = await commit_query(db, commit_id, user_openid)
     
-    commit = await db.commits.find_one({"_id": parse_oid(commit_id, "commit_id"), "user_openid": user_openid})
+    commit = await db.commits.find_one(query)
+    if not commit and await commit_archive.thaw(db, str(parse_oid(commit_id, "commit_id")), user_openid):
+        commit = await db.commits.find_one(query)
     if not commit:
         raise HTTPException(status_code=404, detail="Commit not found")
     
     repo_id = commit.get("repo_id")
     
-    result = await db.commits.delete_one({"_id": parse_oid(commit_id, "commit_id"), "user_openid": user_openid})
+    result = await db.commits.delete_one(query)
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=500, detail="Failed to delete commit")
+    title_suggester.forget(user_openid, repo_id, commit.get("title"))
     
     if repo_id:
         latest_commit = await db.commits.find_one(
             {"repo_id": repo_id, "user_openid": user_openid},
             sort=[("mileage", -1)]
         )
+        repo = await db.repos.find_one(repo_query(repo_id, user_openid))
+        archived = await commit_archive.latest_by_mileage(db, repo) if repo else None
+        if archived and (not latest_commit or (archived.get("mileage") or 0) > (latest_commit.get("mileage") or 0)):
+            latest_commit = archived
         
         if latest_commit:
             await db.repos.update_one(
@@ -356,16 +443,16 @@ async def delete_commit(commit_id: str, user_openid: str = Depends(get_current_u
                     "current_head": latest_commit.get("title", "")
                 }}
             )
-        else:
-            repo = await db.repos.find_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
-            if repo:
-                await db.repos.update_one(
-                    {"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid},
-                    {"$set": {
-                        "current_mileage": repo.get("initial_mileage", 0),
-                        "current_head": ""
-                    }}
-                )
+            reminder_engine.set_mileage(repo_id, latest_commit.get("mileage") or 0)
+        elif repo:
+            await db.repos.update_one(
+                {"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid},
+                {"$set": {
+                    "current_mileage": repo.get("initial_mileage", 0),
+                    "current_head": ""
+                }}
+            )
+            reminder_engine.set_mileage(repo_id, repo.get("initial_mileage", 0))
     
     if commit.get("closes_issues"):
         issue_ids = [parse_oid(i_id, "issue_id") for i_id in commit["closes_issues"]]
@@ -381,111 +468,177 @@ async def delete_commit(commit_id: str, user_openid: str = Depends(get_current_u
                 "closed_by_commit_id": None
             }}
         )
+        async for issue in db.issues.find({"_id": {"$in": issue_ids}, "repo_id": repo_id, "user_openid": user_openid}):
+            reminder_engine.track_issue(issue)
     
+    request_coalescer.bump(repo_id)
     return {"message": "Commit deleted successfully", "id": commit_id}
 
 # --- Issues (Reminders/Tasks) ---
 
-@router.post("/repos/{repo_id}/issues", response_model=Issue)
-async def create_issue(repo_id: str, issue: Issue, user_openid: str = Depends(get_current_user)):
+# Anything else stored before statuses were validated is normalized by migration 0003_issue_status
+VALID_ISSUE_STATUSES = {"open", "closed"}
+
+@router.post("/repos/{repo_id}/issues", response_model=Issue, dependencies=[WRITES])
+async def create_issue(
+    repo_id: str,
+    issue: Issue,
+    user_openid: str = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    return await idempotency_store.run(
+        get_db(), user_openid, "create_issue", idempotency_key,
+        {"repo_id": repo_id, **issue.model_dump(exclude_unset=True)}, lambda: insert_issue(repo_id, issue, user_openid)
+    )
+
+async def insert_issue(repo_id: str, issue: Issue, user_openid: str):
     db = get_db()
     
-    repo = await db.repos.find_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
+    if issue.status not in VALID_ISSUE_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid status. Must be one of: {', '.join(VALID_ISSUE_STATUSES)}"
+        )
+    
+    repo = await db.repos.find_one(repo_query(repo_id, user_openid))
     if not repo:
         raise HTTPException(status_code=404, detail="Repo not found or access denied")
     
     issue.repo_id = repo_id
     issue_dict = issue.dict(exclude={"id"})
     issue_dict["user_openid"] = user_openid
+    issue_dict["priority_rank"] = priority_rank(issue.priority)
     
     result = await db.issues.insert_one(issue_dict)
     issue_dict["_id"] = str(result.inserted_id)
+    reminder_engine.track_issue(issue_dict)
+    request_coalescer.bump(repo_id)
     return issue_dict
 
-VALID_ISSUE_STATUSES = {"open", "closed"}
+ISSUES_MAX_LIMIT = 200
 
 @router.get("/repos/{repo_id}/issues", response_model=List[Issue])
-async def get_issues(repo_id: str, user_openid: str = Depends(get_current_user), status: Optional[str] = None):
+async def get_issues(
+    repo_id: str,
+    user_openid: str = Depends(get_current_user),
+    status: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 0
+):
+    params = {"status": status, "skip": skip, "limit": limit}
+    issues = await request_coalescer.run(
+        "issues", user_openid, repo_id, params, lambda: list_issues(repo_id, user_openid, status, skip, limit)
+    )
+    return list_response(Issue, issues)
+
+async def list_issues(repo_id: str, user_openid: str, status: Optional[str], skip: int, limit: int):
     db = get_db()
     
-    repo = await db.repos.find_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
+    repo = await db.repos.find_one(repo_query(repo_id, user_openid))
     if not repo:
         raise HTTPException(status_code=404, detail="Repo not found or access denied")
     
     if status and status not in VALID_ISSUE_STATUSES:
         raise HTTPException(status_code=400, detail=f"Invalid status. Must be one of: {', '.join(VALID_ISSUE_STATUSES)}")
+    if skip < 0 or limit < 0 or limit > ISSUES_MAX_LIMIT:
+        raise HTTPException(status_code=400, detail=f"Invalid pagination. Limit must be at most {ISSUES_MAX_LIMIT}")
+    
+    # An equality/$in on status keeps the (user_openid, repo_id, status, priority_rank, due_date)
+    # index usable for the sort, so listing is an index scan with no blocking sort stage
+    query = {
+        "repo_id": repo_id,
+        "user_openid": user_openid,
+        "status": status if status else {"$in": sorted(VALID_ISSUE_STATUSES)}
+    }
     
-    pipeline = [
-        {"$match": {"repo_id": repo_id, "user_openid": user_openid}},
-    ]
-    
-    if status:
-        pipeline[0]["$match"]["status"] = status
-    
-    pipeline.extend([
-        {"$addFields": {
-            "priority_order": {
-                "$switch": {
-                    "branches": [
-                        {"case": {"$eq": ["$priority", "high"]}, "then": 0},
-                        {"case": {"$eq": ["$priority", "medium"]}, "then": 1},
-                        {"case": {"$eq": ["$priority", "low"]}, "then": 2}
-                    ],
-                    "default": 99
-                }
-            }
-        }},
-        {"$sort": {"priority_order": 1, "due_date": 1}},
-        {"$project": {"priority_order": 0}}
-    ])
+    cursor = db.issues.find(query).sort([("priority_rank", 1), ("due_date", 1)])
+    if skip:
+        cursor = cursor.skip(skip)
+    if limit:
+        cursor = cursor.limit(limit)
     
     issues = []
-    cursor = db.issues.aggregate(pipeline)
     async for doc in cursor:
         doc["_id"] = str(doc["_id"])
         issues.append(doc)
 
     return issues
 
-@router.patch("/issues/{issue_id}", response_model=Issue)
+@router.patch("/issues/{issue_id}", response_model=Issue, dependencies=[WRITES])
 async def update_issue(issue_id: str, patch: IssuePatch = Body(...), user_openid: str = Depends(get_current_user)):
     db = get_db()
+    query = await issue_query(db, issue_id, user_openid)
     
     clean_data = patch.model_dump(exclude_unset=True)
     
     if not clean_data:
         raise HTTPException(status_code=400, detail="No valid fields to update")
+    if "status" in clean_data and clean_data["status"] not in VALID_ISSUE_STATUSES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid status. Must be one of: {', '.join(VALID_ISSUE_STATUSES)}"
+        )
+    if "priority" in clean_data:
+        clean_data["priority_rank"] = priority_rank(clean_data["priority"])
     
     await db.issues.update_one(
-        {"_id": parse_oid(issue_id, "issue_id"), "user_openid": user_openid},
+        query,
         {"$set": clean_data}
     )
     
-    updated_doc = await db.issues.find_one({"_id": parse_oid(issue_id, "issue_id"), "user_openid": user_openid})
+    updated_doc = await db.issues.find_one(query)
     if updated_doc:
         updated_doc["_id"] = str(updated_doc["_id"])
+        reminder_engine.track_issue(updated_doc)
+        request_coalescer.bump(updated_doc.get("repo_id"))
         return updated_doc
     raise HTTPException(status_code=404, detail="Issue not found")
 
-@router.delete("/issues/{issue_id}")
+@router.delete("/issues/{issue_id}", dependencies=[WRITES])
 async def delete_issue(issue_id: str, user_openid: str = Depends(get_current_user)):
     db = get_db()
+    query = await issue_query(db, issue_id, user_openid)
     
-    issue = await db.issues.find_one({"_id": parse_oid(issue_id, "issue_id"), "user_openid": user_openid})
+    issue = await db.issues.find_one(query)
     if not issue:
         raise HTTPException(status_code=404, detail="Issue not found")
     
-    await db.issues.delete_one({"_id": parse_oid(issue_id, "issue_id"), "user_openid": user_openid})
+    await db.issues.delete_one(query)
+    reminder_engine.forget_issue(issue_id)
+    request_coalescer.bump(issue.get("repo_id"))
     return {"status": "deleted", "id": issue_id}
 
+# --- Reminders (across all vehicles) ---
+
+@router.get("/reminders")
+async def get_reminders(
+    user_openid: str = Depends(get_current_user),
+    days: int = 30,
+    mileage_window: int = 1000
+):
+    """
+    Upcoming and overdue items across all of the user's vehicles:
+    open issues due by date or mileage, and expiring insurance / inspection documents.
+    """
+    db = get_db()
+    
+    if days < 0 or days > 366 or mileage_window < 0:
+        raise HTTPException(status_code=400, detail="Invalid reminder window")
+    
+    await reminder_engine.ensure_ready(db)
+    return reminder_engine.for_user(user_openid, datetime.now().timestamp() * 1000, days, mileage_window)
+
 # --- Insights / Stats ---
 
-@router.get("/repos/{repo_id}/stats")
+@router.get("/repos/{repo_id}/stats", dependencies=[ANALYTICS])
 @limiter.limit("60/minute")
 async def get_repo_stats(request: Request, repo_id: str, user_openid: str = Depends(get_current_user)):
+    return await request_coalescer.run("stats", user_openid, repo_id, {}, lambda: repo_stats(repo_id, user_openid))
+
+async def repo_stats(repo_id: str, user_openid: str):
     db = get_db()
     
-    repo = await db.repos.find_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
+    repo = await db.repos.find_one(repo_query(repo_id, user_openid))
     if not repo:
         raise HTTPException(status_code=404, detail="Repo not found")
         
@@ -519,11 +672,14 @@ async def get_repo_stats(request: Request, repo_id: str, user_openid: str = Depe
     ]
     
     result = await db.commits.aggregate(pipeline).to_list(length=1)
+    # Archived history only contributes its segment summaries
+    cold = await commit_archive.totals(db, repo)
     
     total_cost = 0
-    total_parts = 0
-    total_labor = 0
-    chart_data = []
+    total_parts = cold["parts"]
+    total_labor = cold["labor"]
+    composition = dict(cold["by_type"])
+    total_fuel_cost = composition.get("fuel")
     fuel_cost_per_km = 0
     
     if result:
@@ -531,19 +687,23 @@ async def get_repo_stats(request: Request, repo_id: str, user_openid: str = Depe
         
         if facets.get("totals") and len(facets["totals"]) > 0:
             totals = facets["totals"][0]
-            total_parts = totals.get("total_parts", 0)
-            total_labor = totals.get("total_labor", 0)
-            total_cost = total_parts + total_labor
+            total_parts += totals.get("total_parts", 0)
+            total_labor += totals.get("total_labor", 0)
         
-        if facets.get("composition"):
-            chart_data = [{"name": item["_id"], "value": item["value"]} for item in facets["composition"]]
-            for item in chart_data:
-                item["percentage"] = round((item["value"] / total_cost) * 100, 1) if total_cost > 0 else 0
+        for item in facets.get("composition") or []:
+            composition[item["_id"]] = composition.get(item["_id"], 0) + item["value"]
         
         if facets.get("fuel") and len(facets["fuel"]) > 0:
-            total_fuel_cost = facets["fuel"][0].get("total_fuel_cost", 0)
-            driven_mileage = current_mileage - repo.get("initial_mileage", 0)
-            fuel_cost_per_km = round(total_fuel_cost / driven_mileage, 2) if driven_mileage > 0 else 0
+            total_fuel_cost = (total_fuel_cost or 0) + facets["fuel"][0].get("total_fuel_cost", 0)
+    
+    total_cost = total_parts + total_labor
+    chart_data = [{"name": name, "value": value} for name, value in composition.items()]
+    for item in chart_data:
+        item["percentage"] = round((item["value"] / total_cost) * 100, 1) if total_cost > 0 else 0
+    
+    if total_fuel_cost is not None:
+        driven_mileage = current_mileage - repo.get("initial_mileage", 0)
+        fuel_cost_per_km = round(total_fuel_cost / driven_mileage, 2) if driven_mileage > 0 else 0
 
     driven_mileage = current_mileage - repo.get("initial_mileage", 0)
     
@@ -556,15 +716,20 @@ async def get_repo_stats(request: Request, repo_id: str, user_openid: str = Depe
         "composition": chart_data
     }
 
-@router.get("/repos/{repo_id}/trends")
+@router.get("/repos/{repo_id}/trends", dependencies=[ANALYTICS])
 async def get_repo_trends(repo_id: str, user_openid: str = Depends(get_current_user), months: int = 12):
+    return await request_coalescer.run(
+        "trends", user_openid, repo_id, {"months": months}, lambda: repo_trends(repo_id, user_openid, months)
+    )
+
+async def repo_trends(repo_id: str, user_openid: str, months: int):
     """
     Monthly trend aggregation for line charts
     Returns: mileage progression and cost trends by month
     """
     db = get_db()
     
-    repo = await db.repos.find_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
+    repo = await db.repos.find_one(repo_query(repo_id, user_openid))
     if not repo:
         raise HTTPException(status_code=404, detail="Repo not found")
     
@@ -611,22 +776,25 @@ async def get_repo_trends(repo_id: str, user_openid: str = Depends(get_current_u
     
     result = await db.commits.aggregate(pipeline).to_list(length=1)
     
-    if not result or len(result) == 0:
-        return {"months": [], "total_months": 0}
-    
-    all_costs = result[0].get("all_costs", [])
-    fuel_costs = result[0].get("fuel_costs", [])
+    all_costs = result[0].get("all_costs", []) if result else []
+    fuel_costs = result[0].get("fuel_costs", []) if result else []
     
     fuel_map = {item["_id"]: item["fuel_cost"] for item in fuel_costs}
     
-    monthly_data = []
+    # Months of archived commits come from segment summaries, merged with the hot aggregation
+    by_month = await commit_archive.months(db, repo, start_timestamp)
     for item in all_costs:
-        month = item["_id"]
+        add_month(by_month, item["_id"], item["total_cost"], item["max_mileage"], fuel_map.get(item["_id"], 0),
+                  item["count"])
+    
+    monthly_data = []
+    for month in sorted(by_month):
+        item = by_month[month]
         monthly_data.append({
             "month": month,
-            "cost": item["total_cost"],
+            "cost": item["cost"],
             "mileage": item["max_mileage"],
-            "fuel_cost": fuel_map.get(month, 0),
+            "fuel_cost": item["fuel_cost"],
             "count": item["count"]
         })
     
@@ -688,15 +856,17 @@ async def generate_pdf_buffer(repo_id: str, user_openid: str):
     
     db = get_db()
     
-    repo = await db.repos.find_one({"_id": parse_oid(repo_id, "repo_id"), "user_openid": user_openid})
+    repo = await db.repos.find_one(repo_query(repo_id, user_openid))
     if not repo:
         raise HTTPException(status_code=404, detail="Repo not found")
     
-    commits_cursor = db.commits.find({"repo_id": repo_id, "user_openid": user_openid}).sort("timestamp", -1)
+    commits_query = {"repo_id": repo_id, "user_openid": user_openid}
+    commits_cursor = db.commits.find(commits_query).sort("timestamp", -1)
     commits = []
     async for doc in commits_cursor:
         doc["_id"] = str(doc["_id"])
         commits.append(doc)
+    commits = await commit_archive.merge(db, repo, commits_query, commits)
     
     buffer = BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.75*inch, bottomMargin=0.75*inch)
@@ -796,14 +966,15 @@ async def generate_pdf_buffer(repo_id: str, user_openid: str):
         
         story.append(commit_table)
     
-    doc.build(story)
+    # Rendering is CPU bound; keep it off the event loop so other requests are still served
+    await run_in_threadpool(doc.build, story)
     buffer.seek(0)
     
     filename = f"车辆维护记录-{repo.get('name', 'vehicle')}.pdf"
     return buffer, filename
 
 
-@router.get("/repos/{repo_id}/export/pdf")
+@router.get("/repos/{repo_id}/export/pdf", dependencies=[EXPORT])
 @limiter.limit("10/minute")
 async def export_repo_to_pdf(request: Request, repo_id: str, user_openid: str = Depends(get_current_user)):
     """
@@ -832,7 +1003,7 @@ async def export_repo_to_pdf(request: Request, repo_id: str, user_openid: str =
         raise HTTPException(status_code=500, detail=f"PDF Export Failed: {str(e)}")
 
 
-@router.get("/repos/{repo_id}/export/pdf-base64")
+@router.get("/repos/{repo_id}/export/pdf-base64", dependencies=[EXPORT])
 @limiter.limit("10/minute")
 async def export_repo_to_pdf_base64(request: Request, repo_id: str, user_openid: str = Depends(get_current_user)):
     """
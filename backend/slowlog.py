@@ -0,0 +1,213 @@
+import asyncio
+import contextvars
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+# Opt-in: database operations slower than this many milliseconds are logged (0 disables)
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "0"))
+SLOW_QUERY_TOP_N = int(os.getenv("SLOW_QUERY_TOP_N", "20"))
+SLOW_QUERY_MAX_SHAPES = 500
+SLOW_QUERY_RECENT = 200
+# Capture explain() for the worst sample of each top shape (Mongo only)
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() == "true"
+
+LOGICAL_OPERATORS = {"$and", "$or", "$nor"}
+
+# ASGI scope of the request being served, set by MetricsMiddleware; the matched route is read from it
+current_request: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar(
+    "current_request", default=None
+)
+
+
+def current_route() -> Optional[str]:
+    scope = current_request.get()
+    if scope is None:
+        return None
+    route = getattr(scope.get("route"), "path", None)
+    return f"{scope.get('method')} {route or scope.get('path')}"
+
+
+def query_shape(query: Any) -> Any:
+    """
+    Strip values from a filter, keeping field names and operators:
+    {"a": 1, "b": {"$in": [1, 2]}} -> {"a": "?", "b": {"$in": "?"}}
+    """
+    if not isinstance(query, dict):
+        return "?"
+    shape = {}
+    for key in sorted(query):
+        value = query[key]
+        if key in LOGICAL_OPERATORS and isinstance(value, list):
+            shape[key] = [query_shape(item) for item in value]
+        elif isinstance(value, dict):
+            shape[key] = query_shape(value)
+        else:
+            shape[key] = "?"
+    return shape
+
+
+def pipeline_summary(pipeline: Any) -> List[Any]:
+    """Stage names of an aggregation pipeline, with $match shapes and $facet sub-pipelines expanded"""
+    summary: List[Any] = []
+    for stage in pipeline or []:
+        if not isinstance(stage, dict) or not stage:
+            continue
+        name = next(iter(stage))
+        body = stage[name]
+        if name == "$match":
+            summary.append({"$match": query_shape(body)})
+        elif name == "$facet" and isinstance(body, dict):
+            summary.append({"$facet": {facet: pipeline_summary(sub) for facet, sub in sorted(body.items())}})
+        elif name in ("$group", "$sort", "$project", "$addFields") and isinstance(body, dict):
+            summary.append({name: sorted(body)})
+        else:
+            summary.append(name)
+    return summary
+
+
+def sort_shape(sort: Any) -> Optional[List[Any]]:
+    if not sort:
+        return None
+    if isinstance(sort, str):
+        return [[sort, 1]]
+    return [list(item) if isinstance(item, (list, tuple)) else item for item in sort]
+
+
+def _json_safe(value: Any) -> Any:
+    from bson import json_util
+
+    return json.loads(json_util.dumps(value))
+
+
+class SlowQueryLog:
+    """
+    Records database operations slower than a threshold under a normalized query shape (values
+    stripped), keeps a rolling top-N of the most expensive shapes and a short list of recent
+    samples, and optionally captures explain() output for each shape's worst sample on Mongo.
+    """
+
+    def __init__(self, threshold_ms: float = SLOW_QUERY_MS, explain: bool = SLOW_QUERY_EXPLAIN) -> None:
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.reset()
+
+    @property
+    def enabled(self) -> bool:
+        return self.threshold_ms > 0
+
+    def reset(self) -> None:
+        self._shapes: Dict[str, Dict[str, Any]] = {}
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=SLOW_QUERY_RECENT)
+        self._explaining: set = set()
+
+    def record(self, raw_collection: Any, collection: str, operation: str, seconds: float,
+               args: tuple, kwargs: Dict[str, Any], docs: Optional[int] = None, sort: Any = None) -> None:
+        duration_ms = seconds * 1000
+        if not self.enabled or duration_ms < self.threshold_ms:
+            return
+
+        query = pipeline = None
+        if operation == "aggregate":
+            pipeline = args[0] if args else kwargs.get("pipeline")
+        elif not operation.startswith("insert"):
+            query = args[0] if args else kwargs.get("filter")
+        sort = sort or kwargs.get("sort")
+
+        shape = {
+            "collection": collection,
+            "operation": operation,
+            "filter": query_shape(query) if query is not None else None,
+            "sort": sort_shape(sort),
+            "pipeline": pipeline_summary(pipeline) if pipeline is not None else None,
+        }
+        fingerprint = hashlib.sha1(json.dumps(shape, sort_keys=True).encode()).hexdigest()[:12]
+        sample = {
+            "fingerprint": fingerprint,
+            "collection": collection,
+            "operation": operation,
+            "duration_ms": round(duration_ms, 2),
+            "docs": docs,
+            "route": current_route(),
+            "at": datetime.now().timestamp() * 1000,
+        }
+        self._recent.append(sample)
+        print(f"Slow query {duration_ms:.1f}ms {collection}.{operation} [{fingerprint}] route={sample['route']}")
+
+        entry = self._shapes.get(fingerprint)
+        if entry is None:
+            if len(self._shapes) >= SLOW_QUERY_MAX_SHAPES:
+                cheapest = min(self._shapes, key=lambda f: self._shapes[f]["total_ms"])
+                del self._shapes[cheapest]
+            entry = self._shapes[fingerprint] = {
+                "fingerprint": fingerprint,
+                "shape": shape,
+                "count": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "worst": None,
+                "explain": None,
+            }
+        entry["count"] += 1
+        entry["total_ms"] += duration_ms
+        if duration_ms > entry["max_ms"]:
+            entry["max_ms"] = duration_ms
+            entry["worst"] = sample
+            if self.explain and hasattr(raw_collection, "database") and self._is_top(fingerprint):
+                self._schedule_explain(entry, raw_collection, operation, query, pipeline, sort)
+
+    def _is_top(self, fingerprint: str) -> bool:
+        return any(entry["fingerprint"] == fingerprint for entry in self.top(SLOW_QUERY_TOP_N))
+
+    def _schedule_explain(self, entry: Dict[str, Any], raw_collection: Any, operation: str,
+                          query: Any, pipeline: Any, sort: Any) -> None:
+        if entry["fingerprint"] in self._explaining or operation not in ("find", "find_one", "aggregate"):
+            return
+        self._explaining.add(entry["fingerprint"])
+        try:
+            asyncio.get_running_loop().create_task(
+                self._explain(entry, raw_collection, operation, query, pipeline, sort)
+            )
+        except RuntimeError:
+            self._explaining.discard(entry["fingerprint"])
+
+    async def _explain(self, entry: Dict[str, Any], raw_collection: Any, operation: str,
+                       query: Any, pipeline: Any, sort: Any) -> None:
+        started = time.perf_counter()
+        try:
+            if operation == "aggregate":
+                plan = await raw_collection.database.command(
+                    "aggregate", raw_collection.name, pipeline=pipeline, explain=True
+                )
+            else:
+                cursor = raw_collection.find(query or {})
+                if sort:
+                    cursor = cursor.sort(sort)
+                if operation == "find_one":
+                    cursor = cursor.limit(1)
+                plan = await cursor.explain()
+            entry["explain"] = _json_safe(plan.get("queryPlanner", plan))
+            entry["explain_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        except Exception as e:
+            entry["explain"] = {"error": str(e)}
+        finally:
+            self._explaining.discard(entry["fingerprint"])
+
+    def top(self, limit: int = SLOW_QUERY_TOP_N) -> List[Dict[str, Any]]:
+        ranked = sorted(self._shapes.values(), key=lambda entry: entry["total_ms"], reverse=True)[:limit]
+        return [{
+            **entry,
+            "total_ms": round(entry["total_ms"], 2),
+            "max_ms": round(entry["max_ms"], 2),
+            "avg_ms": round(entry["total_ms"] / entry["count"], 2),
+        } for entry in ranked]
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return list(self._recent)[-limit:][::-1]
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,706 @@
+"""
+SQLite storage backend (DB_BACKEND=sqlite): the collection interface the routes use, on a WAL-mode
+database file. Documents are stored as JSON with generated, indexed columns for the hot fields; the
+common query shapes are translated to SQL and anything else is finished in Python with the mock's
+matcher, so behaviour matches MockDatabase while only the matching rows are ever loaded.
+
+Aggregations whose $match/$addFields/$group stages (also inside a $facet) use the shapes the stats and
+trends routes need are computed by SQLite, so only one row per group leaves the database; other
+pipelines load their matched rows and run through the mock's aggregation. Updates support $set and
+$unset only (see UPDATE_OPERATORS).
+
+Import an existing mock data file with:
+
+    python sqlite_db.py import /data/mock_db_data.json --target /data/autorepo.sqlite3
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError, OperationFailure
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+from mock_db import MockCollection, MockCursor
+
+SQLITE_PATH = os.getenv("SQLITE_PATH", os.path.join(os.getenv("DATA_DIR", "/data"), "autorepo.sqlite3"))
+# How long a writer waits for another process holding the write lock
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Top-level fields exposed as generated columns on every collection table
+INDEXED_FIELDS = ("user_openid", "repo_id", "timestamp", "mileage", "status", "due_mileage")
+
+# Indexes per collection over the generated columns, mirroring DatabaseManager.create_indexes
+COLLECTION_INDEXES: Dict[str, List[Tuple[str, ...]]] = {
+    "repos": [("user_openid",)],
+    "commits": [("user_openid", "repo_id", "timestamp"), ("repo_id", "mileage")],
+    "issues": [("user_openid", "repo_id", "status"), ("status", "due_mileage")],
+    "commit_archive": [("user_openid", "repo_id")],
+}
+
+FIELD_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*$")
+COMPARISONS = {"$gte": ">=", "$lte": "<=", "$gt": ">", "$lt": "<"}
+SUPPORTED_OPERATORS = set(COMPARISONS) | {"$ne", "$in", "$nin", "$exists", "$regex", "$options"}
+
+# Update operators this backend implements: $set (all MockDatabase implements) and $unset. Anything else is
+# rejected by check_update before the database is touched, whether or not a document would match.
+UPDATE_OPERATORS = {"$set", "$unset"}
+
+# $dateToString formats translated to strftime; the mock only substitutes these directives
+DATE_FORMAT_PATTERN = re.compile(r"^(%[Ymd]|[-/ :.])*$")
+
+# Finishes queries (and aggregation stages) SQL cannot express, with exactly the mock's semantics
+_matcher = MockCollection("_residual", None)
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return {"$oid": str(value)}
+    if isinstance(value, datetime):
+        return {"$date": value.timestamp() * 1000}
+    return str(value)
+
+
+def _object_hook(value: Dict[str, Any]) -> Any:
+    if len(value) == 1:
+        if "$oid" in value:
+            return ObjectId(value["$oid"])
+        if "$date" in value:
+            return datetime.fromtimestamp(value["$date"] / 1000)
+    return value
+
+
+def encode(document: Dict[str, Any]) -> Tuple[str, str]:
+    """(id, JSON) row for a document; ObjectId _ids live only in the id column"""
+    _id = document["_id"]
+    if isinstance(_id, ObjectId):
+        document = {key: value for key, value in document.items() if key != "_id"}
+    return str(_id), json.dumps(document, default=_json_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def decode(row_id: str, text: str) -> Dict[str, Any]:
+    # Quotes inside JSON strings are escaped, so '{"$' only ever appears for tagged values
+    document = json.loads(text, object_hook=_object_hook) if '{"$' in text else json.loads(text)
+    if "_id" in document:
+        return document
+    return {"_id": ObjectId(row_id), **document}
+
+
+@lru_cache(maxsize=256)
+def _compile(pattern: str, options: str) -> "re.Pattern[str]":
+    return re.compile(pattern, re.IGNORECASE if "i" in options else 0)
+
+
+def _regexp(pattern: str, options: str, value: Any) -> bool:
+    return _compile(pattern, options or "").search(str(value) if value else "") is not None
+
+
+def _column(field: str) -> Optional[str]:
+    if field == "_id":
+        return "id"
+    if field in INDEXED_FIELDS:
+        return f'"{field}"'
+    if FIELD_PATTERN.match(field):
+        return f"json_extract(doc, '$.{field}')"
+    return None
+
+
+def _bindable(field: str, value: Any) -> bool:
+    if field == "_id":
+        return isinstance(value, (ObjectId, str))
+    return value is None or isinstance(value, (str, int, float))
+
+
+def _bind(field: str, value: Any) -> Any:
+    return str(value) if field == "_id" else value
+
+
+def _condition(field: str, value: Any, params: List[Any]) -> Optional[str]:
+    """SQL for one {field: value} clause, or None when it has to be matched in Python"""
+    if field in ("$or", "$and"):
+        if not isinstance(value, list):
+            return None
+        parts = []
+        for clause in value:
+            sql = _where(clause, params) if isinstance(clause, dict) else None
+            if sql is None:
+                return None
+            parts.append(f"({sql})")
+        if not parts:
+            return "1" if field == "$and" else "0"
+        return "(" + (" OR " if field == "$or" else " AND ").join(parts) + ")"
+
+    column = _column(field)
+    if column is None or field.startswith("$"):
+        return None
+    if not isinstance(value, dict):
+        if not _bindable(field, value):
+            return None
+        if value is None:
+            return f"{column} IS NULL"
+        params.append(_bind(field, value))
+        return f"{column} = ?"
+
+    if not value or not set(value) <= SUPPORTED_OPERATORS:
+        return None
+    parts = []
+    for op, operand in value.items():
+        if op in COMPARISONS:
+            if operand is None or not _bindable(field, operand):
+                return None
+            parts.append(f"{column} {COMPARISONS[op]} ?")
+            params.append(_bind(field, operand))
+        elif op == "$ne":
+            if not _bindable(field, operand):
+                return None
+            if operand is None:
+                parts.append(f"{column} IS NOT NULL")
+            else:
+                parts.append(f"{column} IS NOT ?")
+                params.append(_bind(field, operand))
+        elif op in ("$in", "$nin"):
+            if not isinstance(operand, list) or not all(_bindable(field, item) for item in operand):
+                return None
+            values = [_bind(field, item) for item in operand if item is not None]
+            listed = f"{column} IN ({', '.join('?' * len(values))})" if values else "0"
+            params.extend(values)
+            if op == "$in":
+                parts.append(f"({listed} OR {column} IS NULL)" if None in operand else listed)
+            else:
+                null_check = "IS NOT NULL" if None in operand else "IS NULL"
+                parts.append(f"({column} {null_check} {'AND' if None in operand else 'OR'} NOT {listed})")
+        elif op == "$exists":
+            if field == "_id":
+                return None
+            parts.append(f"json_type(doc, '$.{field}') IS {'NOT ' if operand else ''}NULL")
+        elif op == "$regex":
+            if not isinstance(operand, str):
+                return None
+            parts.append(f"regexp(?, ?, {column})")
+            params.extend([operand, value.get("$options", "")])
+    return " AND ".join(parts) if parts else "1"
+
+
+def _where(query: Dict[str, Any], params: List[Any]) -> Optional[str]:
+    """Translate a whole query, or None if any part of it is not expressible in SQL"""
+    local: List[Any] = []
+    sql, residual = _split(query, local)
+    if residual:
+        return None
+    params.extend(local)
+    return sql
+
+
+def _split(query: Dict[str, Any], params: List[Any]) -> Tuple[str, Dict[str, Any]]:
+    """Translate the clauses SQL can express; return them with the residual query left for Python"""
+    clauses, residual = [], {}
+    for field, value in (query or {}).items():
+        local: List[Any] = []
+        sql = _condition(field, value, local)
+        if sql is None:
+            residual[field] = value
+        else:
+            clauses.append(sql)
+            params.extend(local)
+    return " AND ".join(clauses) or "1", residual
+
+
+def _order_by(sort: Optional[List[Tuple[str, int]]]) -> Optional[str]:
+    if not sort:
+        return ""
+    terms = []
+    for field, direction in sort:
+        column = _column(field)
+        if column is None:
+            return None
+        terms.append(f"{column} {'DESC' if direction == -1 else 'ASC'}")
+    return " ORDER BY " + ", ".join(terms)
+
+
+def _set_path(document: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        child = document.get(part)
+        if not isinstance(child, dict):
+            child = document[part] = {}
+        document = child
+    document[parts[-1]] = value
+
+
+def _unset_path(document: Dict[str, Any], path: str) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        document = document.get(part)
+        if not isinstance(document, dict):
+            return
+    document.pop(parts[-1], None)
+
+
+def check_update(update: Dict[str, Any]) -> None:
+    unsupported = set(update) - UPDATE_OPERATORS
+    if unsupported:
+        # Rejected like a server rejects an unknown modifier (FailedToParse)
+        raise OperationFailure(
+            f"SQLite backend only supports {sorted(UPDATE_OPERATORS)} updates, got {sorted(unsupported)}", code=9
+        )
+
+
+def apply_update(document: Dict[str, Any], update: Dict[str, Any]) -> Dict[str, Any]:
+    for path, value in update.get("$set", {}).items():
+        _set_path(document, path, value)
+    for path in update.get("$unset", {}):
+        _unset_path(document, path)
+    return document
+
+
+def _numeric(sql: str) -> str:
+    """The value where it is a number, else NULL (the mock skips non-numbers in $add and $sum)"""
+    return f"(CASE WHEN typeof({sql}) IN ('integer', 'real') THEN {sql} END)"
+
+
+def _expression(expr: Any, added: Dict[str, str]) -> Optional[str]:
+    """SQL for an aggregation expression, or None if it has to be evaluated in Python"""
+    if isinstance(expr, bool):
+        return None
+    if isinstance(expr, (int, float)):
+        return repr(expr) if math.isfinite(expr) else None
+    if isinstance(expr, str) and expr.startswith("$"):
+        return added.get(expr[1:]) or _column(expr[1:])
+    if not isinstance(expr, dict) or len(expr) != 1:
+        return None
+    op, operand = next(iter(expr.items()))
+    if op == "$toDate":
+        return _expression(operand, added)
+    if op in ("$add", "$ifNull") and isinstance(operand, list) and operand:
+        parts = [_expression(item, added) for item in operand]
+        if None in parts:
+            return None
+        if op == "$add":
+            return "(" + " + ".join(f"COALESCE({_numeric(part)}, 0)" for part in parts) + ")"
+        if len(parts) == 2:
+            return f"COALESCE({parts[0]}, {parts[1]})"
+    if op == "$dateToString" and isinstance(operand, dict) and set(operand) <= {"format", "date"}:
+        fmt = operand.get("format", "%Y-%m-%d")
+        date = _expression(operand.get("date"), added)
+        if date is None or not isinstance(fmt, str) or not DATE_FORMAT_PATTERN.match(fmt):
+            return None
+        # Epoch milliseconds in local time, as datetime.fromtimestamp does; anything else as text
+        return (f"(CASE WHEN typeof({date}) IN ('integer', 'real') "
+                f"THEN strftime('{fmt}', {date} / 1000.0, 'unixepoch', 'localtime') "
+                f"ELSE CAST({date} AS TEXT) END)")
+    return None
+
+
+def _accumulator(expr: Any, added: Dict[str, str]) -> Optional[str]:
+    if not isinstance(expr, dict) or len(expr) != 1:
+        return None
+    op, operand = next(iter(expr.items()))
+    if op == "$sum":
+        if isinstance(operand, int) and not isinstance(operand, bool):
+            return f"COUNT(*) * {operand}"
+        value = _expression(operand, added)
+        return f"COALESCE(SUM({_numeric(value)}), 0)" if value else None
+    if op == "$max" and isinstance(operand, str) and operand.startswith("$") and "." not in operand:
+        value = _expression(operand, added)
+        return f"COALESCE(MAX({value}), 0)" if value else None
+    return None
+
+
+class SQLiteCursor:
+    """Lazy find/aggregate cursor; the query runs on first iteration or to_list()"""
+
+    def __init__(self, collection: "SQLiteCollection", query: Optional[Dict[str, Any]] = None,
+                 projection: Optional[Dict[str, Any]] = None, pipeline: Optional[List[Dict[str, Any]]] = None):
+        self.collection = collection
+        self.query = query or {}
+        self.projection = projection
+        self.pipeline = pipeline
+        self._sort: Optional[List[Tuple[str, int]]] = None
+        self._skip = 0
+        self._limit = 0
+        self._docs: Optional[List[Dict[str, Any]]] = None
+        self._idx = 0
+
+    def sort(self, key_or_list: Any, direction: Optional[int] = None) -> "SQLiteCursor":
+        self._sort = list(key_or_list) if isinstance(key_or_list, list) else [(key_or_list, direction or 1)]
+        return self
+
+    def skip(self, count: int) -> "SQLiteCursor":
+        self._skip = count
+        return self
+
+    def limit(self, count: int) -> "SQLiteCursor":
+        self._limit = count
+        return self
+
+    async def _load(self) -> List[Dict[str, Any]]:
+        if self._docs is None:
+            if self.pipeline is not None:
+                self._docs = await self.collection._aggregate(self.pipeline)
+            else:
+                docs = await self.collection._select(self.query, self._sort, self._skip, self._limit)
+                if self.projection:
+                    docs = [_matcher._project(doc, self.projection) for doc in docs]
+                self._docs = docs
+        return self._docs
+
+    def __aiter__(self) -> "SQLiteCursor":
+        return self
+
+    async def __anext__(self) -> Dict[str, Any]:
+        docs = await self._load()
+        if self._idx >= len(docs):
+            raise StopAsyncIteration
+        self._idx += 1
+        return docs[self._idx - 1]
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = await self._load()
+        return docs[:length] if length else docs
+
+
+class SQLiteCollection:
+    def __init__(self, name: str, db: "SQLiteDatabase") -> None:
+        self.name = name
+        self.db = db
+        self.table = '"' + name.replace('"', '""') + '"'
+        db._ensure_table(name, self.table)
+
+    # --- Reads (worker threads) ---
+
+    def _fetch(self, sql: str, params: List[Any]) -> List[Tuple[str, str]]:
+        return self.db._reader().execute(sql, params).fetchall()
+
+    async def _select(self, query: Dict[str, Any], sort: Optional[List[Tuple[str, int]]] = None,
+                      skip: int = 0, limit: int = 0) -> List[Dict[str, Any]]:
+        # SQLite runs in a worker thread (it releases the GIL while reading pages); decoding and any
+        # residual matching stay on the loop, where they would hold the GIL either way
+        params: List[Any] = []
+        where, residual = _split(query, params)
+        order = _order_by(sort)
+        sql = f"SELECT id, doc FROM {self.table} WHERE {where}{order or ''}"
+        pushdown = not residual and order is not None
+        if pushdown and (limit or skip):
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit or -1, skip])
+
+        docs = [decode(row_id, text) for row_id, text in await asyncio.to_thread(self._fetch, sql, params)]
+        if pushdown:
+            return docs
+        if residual:
+            docs = [doc for doc in docs if _matcher._match_document(doc, residual)]
+        if order is None:
+            docs = MockCursor(docs).sort(sort).data
+        docs = docs[skip:]
+        return docs[:limit] if limit else docs
+
+    async def _group(self, query: Dict[str, Any], added: Dict[str, str],
+                     spec: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """One $group stage over the matched rows as a single SQL query, or None if it can't be expressed"""
+        params: List[Any] = []
+        where = _where(query, params)
+        key = spec.get("_id")
+        if key is None:
+            key_sql = None
+        elif isinstance(key, str) and key.startswith("$") and "." not in key:
+            key_sql = _expression(key, added)
+        else:
+            return None
+        if where is None or (key is not None and key_sql is None):
+            return None
+        names, columns = [], [key_sql or "NULL"]
+        for name, expr in spec.items():
+            if name == "_id":
+                continue
+            column = _accumulator(expr, added)
+            if column is None:
+                return None
+            names.append(name)
+            columns.append(column)
+        sql = f"SELECT {', '.join(columns)} FROM {self.table} WHERE {where}"
+        if key_sql:
+            # Groups in order of first appearance, like the mock
+            sql += f" GROUP BY {key_sql} ORDER BY MIN(rowid)"
+        rows = await asyncio.to_thread(self._fetch, sql, params)
+        return [{"_id": row[0], **dict(zip(names, row[1:]))} for row in rows]
+
+    async def _grouped(self, stages: List[Dict[str, Any]], query: Dict[str, Any],
+                       added: Dict[str, str]) -> Optional[List[Dict[str, Any]]]:
+        """
+        Run $match/$addFields stages ending in a $group (or a $facet of such pipelines) in SQL, with the
+        stages after the $group in Python on the grouped rows. None if the pipeline has another shape.
+        """
+        stages, query, added = list(stages), dict(query), dict(added)
+        while stages:
+            stage = stages[0]
+            if "$match" in stage and not set(stage["$match"]) & (set(query) | set(added)):
+                query.update(stages.pop(0)["$match"])
+            elif "$addFields" in stage:
+                fields = {name: _expression(expr, added) for name, expr in stage["$addFields"].items()}
+                if None in fields.values():
+                    return None
+                added.update(fields)
+                stages.pop(0)
+            else:
+                break
+        if not stages:
+            return None
+        if "$facet" in stages[0] and len(stages) == 1:
+            result = {}
+            for name, facet in stages[0]["$facet"].items():
+                rows = await self._grouped(facet, query, added)
+                if rows is None:
+                    return None
+                result[name] = rows
+            return [result]
+        if "$group" not in stages[0]:
+            return None
+        rows = await self._group(query, added, stages[0]["$group"])
+        if rows is None or len(stages) == 1:
+            return rows
+        scratch = MockCollection(self.name, None)
+        scratch.data = rows
+        return scratch.aggregate(stages[1:]).data
+
+    async def _aggregate(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        grouped = await self._grouped(pipeline, {}, {})
+        if grouped is not None:
+            return grouped
+        # Otherwise leading $match stages select rows in SQL and the rest runs in Python on just those rows
+        query: Dict[str, Any] = {}
+        stages = list(pipeline)
+        while stages and "$match" in stages[0] and not set(stages[0]["$match"]) & set(query):
+            query.update(stages.pop(0)["$match"])
+        docs = await self._select(query)
+        if not stages:
+            return docs
+        scratch = MockCollection(self.name, None)
+        scratch.data = docs
+        return scratch.aggregate(stages).data
+
+    # --- Public interface ---
+
+    def find(self, query: Optional[Dict[str, Any]] = None,
+             projection: Optional[Dict[str, Any]] = None) -> SQLiteCursor:
+        return SQLiteCursor(self, query, projection)
+
+    async def find_one(self, query: Optional[Dict[str, Any]] = None, projection: Optional[Dict[str, Any]] = None,
+                       sort: Any = None) -> Optional[Dict[str, Any]]:
+        cursor = self.find(query, projection).limit(1)
+        if sort:
+            cursor.sort(sort)
+        docs = await cursor.to_list()
+        return docs[0] if docs else None
+
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> SQLiteCursor:
+        return SQLiteCursor(self, pipeline=pipeline)
+
+    async def insert_one(self, document: Dict[str, Any]) -> InsertOneResult:
+        if "_id" not in document:
+            document["_id"] = ObjectId()
+        await asyncio.to_thread(self._insert, [document])
+        return InsertOneResult(document["_id"], True)
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True) -> InsertManyResult:
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+        await asyncio.to_thread(self._insert, documents)
+        return InsertManyResult([document["_id"] for document in documents], True)
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any]) -> UpdateResult:
+        check_update(update)
+        return await asyncio.to_thread(self._update, query, update, 1)
+
+    async def update_many(self, query: Dict[str, Any], update: Dict[str, Any]) -> UpdateResult:
+        check_update(update)
+        return await asyncio.to_thread(self._update, query, update, 0)
+
+    async def delete_one(self, query: Dict[str, Any]) -> DeleteResult:
+        return await asyncio.to_thread(self._delete, query, 1)
+
+    async def delete_many(self, query: Dict[str, Any]) -> DeleteResult:
+        return await asyncio.to_thread(self._delete, query, 0)
+
+    # --- Writes (worker threads, serialized on the writer connection) ---
+
+    def _insert(self, documents: List[Dict[str, Any]]) -> None:
+        rows = [encode(document) for document in documents]
+        try:
+            with self.db._transaction() as conn:
+                conn.executemany(f"INSERT INTO {self.table} (id, doc) VALUES (?, ?)", rows)
+        except sqlite3.IntegrityError:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name}")
+
+    def _matching(self, conn: sqlite3.Connection, query: Dict[str, Any], limit: int) -> List[Tuple[str, str]]:
+        params: List[Any] = []
+        where, residual = _split(query, params)
+        sql = f"SELECT id, doc FROM {self.table} WHERE {where}"
+        if limit and not residual:
+            sql += f" LIMIT {int(limit)}"
+        rows = conn.execute(sql, params).fetchall()
+        if residual:
+            rows = [row for row in rows if _matcher._match_document(decode(*row), residual)]
+        return rows[:limit] if limit else rows
+
+    def _update(self, query: Dict[str, Any], update: Dict[str, Any], limit: int) -> UpdateResult:
+        with self.db._transaction() as conn:
+            rows = self._matching(conn, query, limit)
+            changes = []
+            for row_id, text in rows:
+                updated = encode(apply_update(decode(row_id, text), update))[1]
+                if updated != text:
+                    changes.append((updated, row_id))
+            conn.executemany(f"UPDATE {self.table} SET doc = ? WHERE id = ?", changes)
+        return UpdateResult({"n": len(rows), "nModified": len(changes)}, True)
+
+    def _delete(self, query: Dict[str, Any], limit: int) -> DeleteResult:
+        with self.db._transaction() as conn:
+            rows = self._matching(conn, query, limit)
+            conn.executemany(f"DELETE FROM {self.table} WHERE id = ?", [(row[0],) for row in rows])
+        return DeleteResult({"n": len(rows)}, True)
+
+
+class _Transaction:
+    def __init__(self, db: "SQLiteDatabase") -> None:
+        self.db = db
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.db._write_lock.acquire()
+        try:
+            self.db._writer.execute("BEGIN IMMEDIATE")
+        except BaseException:
+            self.db._write_lock.release()
+            raise
+        return self.db._writer
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> None:
+        try:
+            self.db._writer.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.db._write_lock.release()
+
+
+class SQLiteDatabase:
+    """
+    One WAL-mode database file shared by every worker process: readers never block each other or
+    the writer, and writers from different processes queue on SQLite's lock for up to
+    SQLITE_BUSY_TIMEOUT_MS. Each thread gets its own read connection; writes share one connection.
+    """
+
+    def __init__(self, path: str = SQLITE_PATH) -> None:
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.collections: Dict[str, SQLiteCollection] = {}
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._write_lock = threading.Lock()
+        self._writer = self._connect()
+        self._tables: set = set()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path, timeout=SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.create_function("regexp", 3, _regexp, deterministic=True)
+        return conn
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            conn.execute("PRAGMA query_only=ON")
+            self._readers.append(conn)
+        return conn
+
+    def _transaction(self) -> _Transaction:
+        return _Transaction(self)
+
+    def _ensure_table(self, name: str, table: str) -> None:
+        if name in self._tables:
+            return
+        generated = ", ".join(
+            f'"{field}" GENERATED ALWAYS AS (json_extract(doc, \'$.{field}\')) VIRTUAL' for field in INDEXED_FIELDS
+        )
+        with self._transaction() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id TEXT PRIMARY KEY, doc TEXT NOT NULL, {generated})")
+            for columns in COLLECTION_INDEXES.get(name, []):
+                index = f'"ix_{name}_{"_".join(columns)}"'
+                indexed = ", ".join(f'"{column}"' for column in columns)
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({indexed})")
+        self._tables.add(name)
+
+    def __getattr__(self, name: str) -> SQLiteCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self.collections:
+            self.collections[name] = SQLiteCollection(name, self)
+        return self.collections[name]
+
+    def __getitem__(self, name: str) -> SQLiteCollection:
+        return self.__getattr__(name)
+
+    def close(self) -> None:
+        for conn in self._readers:
+            conn.close()
+        self._readers.clear()
+        self._writer.close()
+
+
+def import_mock_data(source: str, target: str = SQLITE_PATH) -> Dict[str, int]:
+    """Copy every collection of a mock_db_data.json file into a SQLite database; re-running replaces documents"""
+    with open(source, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    db = SQLiteDatabase(target)
+    counts = {}
+    try:
+        for name, documents in data.items():
+            collection = db[name]
+            rows = []
+            for document in documents:
+                if "_id" in document:
+                    # Restore ObjectIds the same way MockDatabase.load does
+                    try:
+                        document["_id"] = ObjectId(document["_id"])
+                    except Exception:
+                        pass
+                else:
+                    document["_id"] = ObjectId()
+                rows.append(encode(document))
+            with db._transaction() as conn:
+                conn.executemany(f"INSERT OR REPLACE INTO {collection.table} (id, doc) VALUES (?, ?)", rows)
+            counts[name] = len(rows)
+    finally:
+        db.close()
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="SQLite backend tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="import a mock_db_data.json file")
+    default_source = os.path.join(os.getenv("DATA_DIR", "/data"), "mock_db_data.json")
+    importer.add_argument("source", nargs="?", default=default_source)
+    importer.add_argument("--target", default=SQLITE_PATH)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = import_mock_data(args.source, args.target)
+    for name, count in counts.items():
+        print(f"{name:20s} {count}")
+    print(f"Imported {sum(counts.values())} documents into {args.target} in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import asyncio
+import bisect
+import heapq
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from purge import repo_purger
+
+SUGGEST_MAX_USERS = int(os.getenv("SUGGEST_MAX_USERS", "1000"))
+SUGGEST_MAX_ENTRIES = int(os.getenv("SUGGEST_MAX_ENTRIES", "200000"))
+
+
+def _normalize(title: Optional[str]) -> str:
+    return (title or "").strip()
+
+
+class _UserTitles:
+    """Frequency-weighted title index for one user, kept as a sorted key array for bisect lookups"""
+
+    def __init__(self) -> None:
+        self.keys: List[str] = []
+        self.titles: Dict[str, str] = {}
+        self.counts: Dict[str, int] = {}
+        self.repo_counts: Dict[str, Dict[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, repo_id: str, title: str, delta: int = 1) -> None:
+        title = _normalize(title)
+        if not title:
+            return
+        key = title.casefold()
+
+        repo_titles = self.repo_counts.setdefault(repo_id, {})
+        repo_count = repo_titles.get(key, 0) + delta
+        if repo_count > 0:
+            repo_titles[key] = repo_count
+        else:
+            repo_titles.pop(key, None)
+
+        count = self.counts.get(key, 0) + delta
+        if count > 0:
+            if key not in self.counts:
+                bisect.insort(self.keys, key)
+                self.titles[key] = title
+            self.counts[key] = count
+        elif key in self.counts:
+            del self.counts[key]
+            del self.titles[key]
+            idx = bisect.bisect_left(self.keys, key)
+            if idx < len(self.keys) and self.keys[idx] == key:
+                del self.keys[idx]
+
+    def drop_repo(self, repo_id: str) -> None:
+        for key, count in list(self.repo_counts.get(repo_id, {}).items()):
+            self.add(repo_id, self.titles.get(key, key), -count)
+        self.repo_counts.pop(repo_id, None)
+
+    def top(self, prefix: str, limit: int, repo_id: Optional[str] = None) -> List[Tuple[str, int]]:
+        prefix = _normalize(prefix).casefold()
+        counts = self.counts if repo_id is None else self.repo_counts.get(repo_id, {})
+        if not counts:
+            return []
+
+        start = bisect.bisect_left(self.keys, prefix)
+        end = bisect.bisect_left(self.keys, prefix + "\U0010ffff", lo=start)
+        candidates = ((counts[key], key) for key in self.keys[start:end] if key in counts)
+        best = heapq.nsmallest(limit, candidates, key=lambda item: (-item[0], item[1]))
+        return [(self.titles[key], count) for count, key in best]
+
+
+class TitleSuggester:
+    """
+    Per-user prefix index over commit titles.
+    Built lazily from the user's commits and updated on writes; cold users are evicted LRU-first
+    once the number of users or indexed titles exceeds its bounds.
+    """
+
+    def __init__(self, max_users: int = SUGGEST_MAX_USERS, max_entries: int = SUGGEST_MAX_ENTRIES) -> None:
+        self.max_users = max_users
+        self.max_entries = max_entries
+        self._users: "OrderedDict[str, _UserTitles]" = OrderedDict()
+        self._entries = 0
+        self._building: Dict[str, asyncio.Future] = {}
+        self._stale: Set[str] = set()
+
+    def clear(self) -> None:
+        self._users.clear()
+        self._building.clear()
+        self._stale.clear()
+        self._entries = 0
+
+    def invalidate(self, user_openid: str) -> None:
+        index = self._users.pop(user_openid, None)
+        if index is not None:
+            self._entries -= len(index)
+
+    async def _load(self, db: Any, user_openid: str) -> _UserTitles:
+        index = _UserTitles()
+        query = {"user_openid": user_openid, **await repo_purger.live_filter(db, user_openid)}
+        cursor = db.commits.find(query, {"title": 1, "repo_id": 1})
+        async for doc in cursor:
+            index.add(str(doc.get("repo_id")), doc.get("title"))
+        # Archived commits count through their segment's title summary
+        async for segment in db.commit_archive.find(query, {"titles": 1, "repo_id": 1}):
+            for title, count in segment.get("titles", []):
+                index.add(str(segment.get("repo_id")), title, count)
+        return index
+
+    async def get_index(self, db: Any, user_openid: str) -> _UserTitles:
+        index = self._users.get(user_openid)
+        if index is not None:
+            self._users.move_to_end(user_openid)
+            return index
+
+        # Concurrent first lookups for the same user share one build
+        pending = self._building.get(user_openid)
+        if pending is not None:
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only build again when the leading lookup was cancelled, not this one
+                if not pending.cancelled():
+                    raise
+            return await self.get_index(db, user_openid)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._building[user_openid] = future
+        try:
+            index = await self._load(db, user_openid)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._building.pop(user_openid, None)
+
+        # A write that raced the build may or may not be in the snapshot, so serve it once without caching
+        if user_openid in self._stale:
+            self._stale.discard(user_openid)
+        else:
+            self._users[user_openid] = index
+            self._entries += len(index)
+            self._evict()
+        future.set_result(index)
+        return index
+
+    def _evict(self) -> None:
+        while len(self._users) > 1 and (len(self._users) > self.max_users or self._entries > self.max_entries):
+            _, index = self._users.popitem(last=False)
+            self._entries -= len(index)
+
+    def _update(self, user_openid: str, repo_id: str, title: Optional[str], delta: int) -> None:
+        # Users that are not loaded pick the change up on their next build
+        index = self._users.get(user_openid)
+        if index is None:
+            if user_openid in self._building:
+                self._stale.add(user_openid)
+            return
+        before = len(index)
+        index.add(repo_id, title or "", delta)
+        self._entries += len(index) - before
+        self._evict()
+
+    def record(self, user_openid: str, repo_id: str, title: Optional[str]) -> None:
+        self._update(user_openid, repo_id, title, 1)
+
+    def forget(self, user_openid: str, repo_id: str, title: Optional[str]) -> None:
+        self._update(user_openid, repo_id, title, -1)
+
+    def forget_repo(self, user_openid: str, repo_id: str) -> None:
+        index = self._users.get(user_openid)
+        if index is None:
+            return
+        before = len(index)
+        index.drop_repo(repo_id)
+        self._entries += len(index) - before
+
+    async def suggest(
+        self, db: Any, user_openid: str, prefix: str, limit: int = 8, repo_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        index = await self.get_index(db, user_openid)
+        return [{"title": title, "count": count} for title, count in index.top(prefix, limit, repo_id)]
+
+
+title_suggester = TitleSuggester()
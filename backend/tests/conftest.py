@@ -10,24 +10,63 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from main import app
 from database import db_manager
+import mock_db as mock_db_module
 from mock_db import MockDatabase
 from auth import create_access_token
+from suggest import title_suggester
+from reminders import reminder_engine
+from purge import repo_purger
+from admission import admission_controller
+from coalesce import request_coalescer
+from idempotency import idempotency_store
+from archive import commit_archive
+
+
+# The mock's storage modes, pinned by data_dir so a test of one mode is unaffected by the MOCK_DB_* settings
+# the suite runs with
+MOCK_DB_MODES = {
+    "MOCK_DB_COHERENT": False,
+    "MOCK_DB_FORMAT": "json",
+    "MOCK_DB_FLUSH_WINDOW_MS": 0,
+    "MOCK_DB_FLUSH_WAIT": True,
+    "MOCK_DB_COMPACT": False,
+}
+
+
+@pytest.fixture(scope="function")
+def data_dir(request, tmp_path, monkeypatch):
+    """
+    An empty DATA_DIR for databases a test creates itself, with MOCK_DB_MODES in effect.
+    Override modes for a test or module with
+    pytest.mark.parametrize("data_dir", [{"MOCK_DB_COHERENT": True}], indirect=True)
+    """
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
+    for name, value in {**MOCK_DB_MODES, **getattr(request, "param", {})}.items():
+        monkeypatch.setattr(mock_db_module, name, value)
+    return tmp_path
 
 
 @pytest_asyncio.fixture(scope="function")
-async def mock_db():
+async def mock_db(tmp_path, monkeypatch):
+    # Storage files (snapshot, journal, locks) live in the test's own directory; the modes come from the
+    # environment, so the whole suite can be run with e.g. MOCK_DB_COHERENT=true
+    monkeypatch.setenv("DATA_DIR", str(tmp_path))
     db = MockDatabase()
-    db.file_path = "mock_db_test.json"
-    db.collections = {}
     yield db
-    if os.path.exists("mock_db_test.json"):
-        os.remove("mock_db_test.json")
+    db.close()
 
 
 @pytest_asyncio.fixture(scope="function")
 async def test_client(mock_db):
     original_db = db_manager.db
     db_manager.db = mock_db
+    title_suggester.clear()
+    reminder_engine.reset()
+    repo_purger.reset()
+    admission_controller.reset()
+    request_coalescer.reset()
+    idempotency_store.reset()
+    commit_archive.reset()
     
     client = TestClient(app)
     
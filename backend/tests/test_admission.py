@@ -0,0 +1,72 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from admission import AdmissionClass, AdmissionController
+
+
+@pytest.mark.asyncio
+async def test_queue_hands_slots_over_in_order():
+    cls = AdmissionClass("export", concurrency=1, max_queue=2, max_wait=5)
+    await cls.acquire()
+    order = []
+
+    async def waiter(tag):
+        await cls.acquire()
+        order.append(tag)
+
+    tasks = [asyncio.create_task(waiter(tag)) for tag in ("a", "b")]
+    await asyncio.sleep(0)
+    assert cls.stats()["queued"] == 2
+
+    with pytest.raises(HTTPException) as exc:
+        await cls.acquire()
+    assert exc.value.status_code == 503
+    assert "Retry-After" in exc.value.headers
+
+    cls.release()
+    cls.release()
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b"]
+    assert cls.active == 1
+    cls.release()
+    assert cls.active == 0
+
+
+@pytest.mark.asyncio
+async def test_wait_times_out_with_503():
+    cls = AdmissionClass("analytics", concurrency=1, max_queue=4, max_wait=0.01)
+    await cls.acquire()
+    with pytest.raises(HTTPException) as exc:
+        await cls.acquire()
+    assert exc.value.status_code == 503
+    assert cls.stats()["timed_out"] == 1
+    assert cls.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_per_user_in_flight_cap():
+    controller = AdmissionController({"writes": (10, 10)}, per_user=1)
+    async with controller.admit("writes", "alice"):
+        with pytest.raises(HTTPException) as exc:
+            async with controller.admit("writes", "alice"):
+                pass
+        assert exc.value.status_code == 429
+
+        async with controller.admit("writes", "bob"):
+            assert controller.stats()["users_in_flight"] == 2
+
+    assert controller.stats()["users_in_flight"] == 0
+    assert controller.classes["writes"].active == 0
+
+
+@pytest.mark.asyncio
+async def test_governed_routes_release_slots(test_client, test_repo_data, auth_headers):
+    from admission import admission_controller
+
+    response = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers)
+    assert response.status_code == 200
+    writes = admission_controller.stats()["classes"]["writes"]
+    assert writes["admitted"] == 1
+    assert writes["active"] == 0
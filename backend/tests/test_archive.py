@@ -0,0 +1,206 @@
+import time
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from archive import DAY_MS, build_segment, commit_archive
+from mock_db import ShardedMockDatabase
+
+
+def _sorted_composition(stats):
+    return {**stats, "composition": sorted(stats["composition"], key=lambda item: item["name"])}
+
+
+@pytest.mark.asyncio
+async def test_archived_history_reads_like_hot(
+    test_client, test_repo_data, test_commit_data, auth_headers, test_openid, mock_db, monkeypatch
+):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    now = datetime.now().timestamp() * 1000
+    for n in range(14):
+        payload = {
+            **test_commit_data,
+            "repo_id": repo_id,
+            "title": "加油" if n % 2 else "更换机油",
+            "type": "fuel" if n % 2 else "Maintenance",
+            "mileage": 1000 * (n + 1),
+            "timestamp": now - (14 - n) * 40 * DAY_MS,
+        }
+        test_client.post("/api/commits", json=payload, headers=auth_headers)
+
+    def snapshot():
+        return (
+            test_client.get(f"/api/commits?repo_id={repo_id}", headers=auth_headers).json(),
+            test_client.get(f"/api/commits?repo_id={repo_id}&type=fuel&mileage_max=6000", headers=auth_headers).json(),
+            _sorted_composition(test_client.get(f"/api/repos/{repo_id}/stats", headers=auth_headers).json()),
+            test_client.get(f"/api/repos/{repo_id}/trends", headers=auth_headers).json(),
+            test_client.get("/api/suggest?prefix=更", headers=auth_headers).json(),
+        )
+
+    before = snapshot()
+    monkeypatch.setattr(commit_archive, "min_commits", 1)
+    monkeypatch.setattr(commit_archive, "segment_commits", 4)
+    # Ten commits in three segments; the trends window starts inside the second one
+    assert await commit_archive.archive_repo(mock_db, repo_id, test_openid, now - 170 * DAY_MS) == 10
+    assert len(mock_db.commits.data) == 4
+    assert len(mock_db.commit_archive.data) == 3
+
+    commit_archive.reset()
+    assert snapshot() == before
+
+    oldest = before[0][-1]
+    assert test_client.get(f"/api/commits/{oldest['_id']}", headers=auth_headers).json() == oldest
+
+    # Editing an archived commit moves its segment back to the hot collection first
+    response = test_client.put(f"/api/commits/{oldest['_id']}", json={"title": "购车"}, headers=auth_headers)
+    assert response.json()["title"] == "购车"
+    assert len(mock_db.commits.data) == 8
+    assert len(mock_db.commit_archive.data) == 2
+    commits = test_client.get(f"/api/commits?repo_id={repo_id}", headers=auth_headers).json()
+    assert [commit["_id"] for commit in commits] == [commit["_id"] for commit in before[0]]
+    assert commits[-1]["title"] == "购车"
+
+
+@pytest.mark.asyncio
+async def test_summaries_skip_segments_that_cannot_match(
+    test_client, test_repo_data, test_commit_data, auth_headers, test_openid, mock_db, monkeypatch
+):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    for n in range(6):
+        payload = {**test_commit_data, "repo_id": repo_id, "mileage": 1000 * (n + 1), "timestamp": 1000.0 * (n + 1)}
+        test_client.post("/api/commits", json=payload, headers=auth_headers)
+    monkeypatch.setattr(commit_archive, "min_commits", 1)
+    monkeypatch.setattr(commit_archive, "segment_commits", 2)
+    await commit_archive.archive_repo(mock_db, repo_id, test_openid, 10000.0)
+
+    decoded = []
+    original = commit_archive._commits
+
+    async def record(db, summary):
+        decoded.append(summary["mileage_min"])
+        return await original(db, summary)
+
+    monkeypatch.setattr(commit_archive, "_commits", record)
+    commits = test_client.get(f"/api/commits?repo_id={repo_id}&mileage_min=3500", headers=auth_headers).json()
+    assert [commit["mileage"] for commit in commits] == [6000, 5000, 4000]
+    assert decoded == [3000, 5000]
+    stats = test_client.get(f"/api/repos/{repo_id}/stats", headers=auth_headers).json()
+    assert stats["total_cost"] == 900
+    assert decoded == [3000, 5000]
+
+
+@pytest.mark.asyncio
+async def test_interrupted_archive_is_settled_by_the_next_sweep(
+    test_client, test_repo_data, test_commit_data, auth_headers, test_openid, mock_db, monkeypatch
+):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    for n in range(4):
+        payload = {**test_commit_data, "repo_id": repo_id, "mileage": 1000 * (n + 1), "timestamp": 1000.0 * (n + 1)}
+        test_client.post("/api/commits", json=payload, headers=auth_headers)
+    monkeypatch.setattr(commit_archive, "min_commits", 1)
+    monkeypatch.setattr(commit_archive, "segment_commits", 2)
+
+    # The worker dies after writing the first segment, before removing its hot copies
+    original_delete = mock_db.commits.delete_many
+
+    async def crash(query):
+        raise RuntimeError("worker stopped")
+
+    monkeypatch.setattr(mock_db.commits, "delete_many", crash)
+    with pytest.raises(RuntimeError):
+        await commit_archive.archive_repo(mock_db, repo_id, test_openid, 10000.0)
+    monkeypatch.setattr(mock_db.commits, "delete_many", original_delete)
+    assert len(mock_db.commits.data) == 4 and len(mock_db.commit_archive.data) == 1
+
+    assert await commit_archive.archive_repo(mock_db, repo_id, test_openid, 10000.0) == 2
+    assert await commit_archive.archive_repo(mock_db, repo_id, test_openid, 10000.0) == 2
+    assert mock_db.commits.data == [] and len(mock_db.commit_archive.data) == 2
+    stats = test_client.get(f"/api/repos/{repo_id}/stats", headers=auth_headers).json()
+    assert stats["total_cost"] == 600
+
+
+@pytest.mark.asyncio
+async def test_interrupted_archive_keeps_later_edits(
+    test_client, test_repo_data, test_commit_data, auth_headers, test_openid, mock_db, monkeypatch
+):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    ids = []
+    for n in range(2):
+        payload = {**test_commit_data, "repo_id": repo_id, "mileage": 1000 * (n + 1), "timestamp": 1000.0 * (n + 1)}
+        ids.append(test_client.post("/api/commits", json=payload, headers=auth_headers).json()["_id"])
+    monkeypatch.setattr(commit_archive, "min_commits", 1)
+    await mock_db.commit_archive.insert_one(
+        build_segment(repo_id, test_openid, await mock_db.commits.find({}).sort("timestamp", 1).to_list())
+    )
+    test_client.put(f"/api/commits/{ids[0]}", json={"title": "改过"}, headers=auth_headers)
+
+    assert await commit_archive.archive_repo(mock_db, repo_id, test_openid, 10000.0) == 0
+    assert mock_db.commit_archive.data == []
+    commits = test_client.get(f"/api/commits?repo_id={repo_id}", headers=auth_headers).json()
+    assert [commit["title"] for commit in commits] == [test_commit_data["title"], "改过"]
+
+
+@pytest.mark.asyncio
+async def test_archive_keeps_commits_edited_while_it_runs(
+    test_client, test_repo_data, test_commit_data, auth_headers, test_openid, mock_db, monkeypatch
+):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    ids = []
+    for n in range(2):
+        payload = {**test_commit_data, "repo_id": repo_id, "mileage": 1000 * (n + 1), "timestamp": 1000.0 * (n + 1)}
+        ids.append(test_client.post("/api/commits", json=payload, headers=auth_headers).json()["_id"])
+    monkeypatch.setattr(commit_archive, "min_commits", 1)
+    original_insert = mock_db.commit_archive.insert_one
+
+    async def edit_then_insert(segment):
+        # An edit lands after the commits were read, before their hot copies are removed
+        await mock_db.commits.update_one({"_id": ObjectId(ids[0])}, {"$set": {"title": "改过"}})
+        return await original_insert(segment)
+
+    monkeypatch.setattr(mock_db.commit_archive, "insert_one", edit_then_insert)
+    assert await commit_archive.archive_repo(mock_db, repo_id, test_openid, 10000.0) == 0
+    assert mock_db.commit_archive.data == []
+    commits = test_client.get(f"/api/commits?repo_id={repo_id}", headers=auth_headers).json()
+    assert [commit["title"] for commit in commits] == [test_commit_data["title"], "改过"]
+
+
+@pytest.mark.asyncio
+async def test_archive_and_thaw_touch_only_the_owners_shard(data_dir, monkeypatch):
+    db = ShardedMockDatabase(max_tenants=4)
+    for user in ("u1", "u2", "u3", "u4"):
+        await db.commits.insert_one({"user_openid": user, "title": "加油费用"})
+    repo_id = str((await db.repos.insert_one({"user_openid": "u1", "name": "卡罗拉"})).inserted_id)
+    await db.commits.insert_many([
+        {"repo_id": repo_id, "user_openid": "u1", "title": "加油", "type": "fuel", "timestamp": float(n)}
+        for n in range(3)
+    ])
+    reopened = ShardedMockDatabase(max_tenants=4)
+    monkeypatch.setattr(commit_archive, "min_commits", 1)
+
+    assert await commit_archive.archive_repo(reopened, repo_id, "u1", 10.0) == 3
+    archived = (await reopened.commit_archive.find_one({"user_openid": "u1"}))["id_min"]
+    assert await commit_archive.thaw(reopened, archived, "u1")
+    assert reopened.stats()["loads"] == 1
+
+
+@pytest.fixture
+def shanghai_time(monkeypatch):
+    monkeypatch.setenv("TZ", "Asia/Shanghai")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.mark.asyncio
+async def test_archived_months_match_hot_months_outside_utc(shanghai_time, mock_db):
+    # 2024-05-31 16:00 UTC is already June in Shanghai
+    commit = {"_id": ObjectId(), "repo_id": "r", "user_openid": "u", "timestamp": 1717171200000, "mileage": 1}
+    await mock_db.commits.insert_one(dict(commit))
+    hot = await mock_db.commits.aggregate([
+        {"$addFields": {"month": {"$dateToString": {"format": "%Y-%m", "date": {"$toDate": "$timestamp"}}}}}
+    ]).to_list(length=None)
+
+    assert hot[0]["month"] == "2024-06"
+    assert list(build_segment("r", "u", [commit])["months"]) == ["2024-06"]
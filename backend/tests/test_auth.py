@@ -0,0 +1,119 @@
+import ast
+import os
+import time
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import auth
+from auth import TokenCache, create_access_token, get_current_user, token_cache
+
+
+@pytest.mark.asyncio
+async def test_verified_token_is_cached(test_openid):
+    token_cache.clear()
+    header = f"Bearer {create_access_token(test_openid)}"
+    hits = token_cache.hits
+
+    assert await get_current_user(header) == test_openid
+    assert await get_current_user(header) == test_openid
+    assert token_cache.hits == hits + 1
+
+
+def test_token_cache_honors_expiry():
+    cache = TokenCache(max_size=2)
+    cache.put("fresh", "a", time.time() + 60)
+    cache.put("stale", "b", time.time() - 1)
+
+    assert cache.get("fresh") == "a"
+    assert cache.get("stale") is None
+
+    cache.put("x", "c", time.time() + 60)
+    cache.put("y", "d", time.time() + 60)
+    assert cache.get("fresh") is None
+
+
+@pytest.mark.asyncio
+async def test_secret_rotation_invalidates_cached_tokens(test_openid, monkeypatch):
+    monkeypatch.setattr(auth, "JWT_SECRET", auth.JWT_SECRET)
+    header = f"Bearer {create_access_token(test_openid)}"
+    await get_current_user(header)
+
+    auth.rotate_jwt_secret("a-rotated-secret-that-is-at-least-32-chars")
+
+    with pytest.raises(HTTPException) as exc:
+        await get_current_user(header)
+    assert exc.value.status_code == 401
+
+
+def login(test_client):
+    response = test_client.post("/api/auth/login", json={"code": "dev-code"})
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotates_tokens(test_client):
+    session = login(test_client)
+
+    response = test_client.post("/api/auth/refresh", json={"refresh_token": session["refresh_token"]})
+    assert response.status_code == 200
+    refreshed = response.json()
+    assert refreshed["openid"] == session["openid"]
+    assert refreshed["refresh_token"] != session["refresh_token"]
+
+    headers = {"Authorization": f"Bearer {refreshed['token']}"}
+    assert test_client.get("/api/repos", headers=headers).status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_reused_refresh_token_revokes_family(test_client, monkeypatch):
+    session = login(test_client)
+    rotated = test_client.post("/api/auth/refresh", json={"refresh_token": session["refresh_token"]}).json()
+
+    # Within the grace window a replay is rejected but the rotated token stays valid
+    assert test_client.post("/api/auth/refresh", json={"refresh_token": session["refresh_token"]}).status_code == 401
+    monkeypatch.setattr(auth, "REFRESH_REUSE_GRACE_SECONDS", 0)
+    assert test_client.post("/api/auth/refresh", json={"refresh_token": session["refresh_token"]}).status_code == 401
+
+    response = test_client.post("/api/auth/refresh", json={"refresh_token": rotated["refresh_token"]})
+    assert response.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_refresh_drops_expired_tokens(test_client, mock_db):
+    session = login(test_client)
+    for _ in range(3):
+        session = test_client.post("/api/auth/refresh", json={"refresh_token": session["refresh_token"]}).json()
+    # Rotated tokens stay (reuse detection) until they expire
+    assert len(await mock_db.refresh_tokens.find({"openid": session["openid"]}).to_list()) == 4
+
+    await mock_db.refresh_tokens.update_many({"revoked_at": {"$ne": None}}, {"$set": {"expires_at": 0}})
+    test_client.post("/api/auth/refresh", json={"refresh_token": session["refresh_token"]})
+    tokens = await mock_db.refresh_tokens.find({"openid": session["openid"]}).to_list()
+    assert len(tokens) == 2
+    assert all(token["expire_at"].utcoffset() == timedelta(0) for token in tokens)
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_refresh_token(test_client):
+    session = login(test_client)
+    test_client.post("/api/auth/logout", json={"refresh_token": session["refresh_token"]})
+
+    response = test_client.post("/api/auth/refresh", json={"refresh_token": session["refresh_token"]})
+    assert response.status_code == 401
+
+
+def test_dotenv_loaded_before_settings_are_read():
+    # auth, metrics, admission... read os.getenv when imported, so .env must be loaded first
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    local = {name[:-3] for name in os.listdir(backend) if name.endswith(".py")}
+    with open(os.path.join(backend, "main.py"), encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    loaded = None
+    for index, node in enumerate(tree.body):
+        if isinstance(node, ast.Expr) and ast.unparse(node) == "load_dotenv()":
+            loaded = index
+        if isinstance(node, ast.ImportFrom) and node.module in local:
+            assert loaded is not None, f"{node.module} is imported before load_dotenv()"
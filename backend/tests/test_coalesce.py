@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from coalesce import RequestCoalescer
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_computation():
+    coalescer = RequestCoalescer(linger_seconds=0)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"total": calls}
+
+    results = await asyncio.gather(*[coalescer.run("stats", "u", "r", {}, compute) for _ in range(5)])
+    assert calls == 1
+    assert all(result == {"total": 1} for result in results)
+    assert coalescer.stats()["saved"] == 4
+
+    # Different params are computed separately
+    await coalescer.run("trends", "u", "r", {"months": 6}, compute)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_linger_is_dropped_on_write():
+    coalescer = RequestCoalescer(linger_seconds=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await coalescer.run("stats", "u", "r", {}, compute) == 1
+    assert await coalescer.run("stats", "u", "r", {}, compute) == 1
+    assert coalescer.stats()["served_from_linger"] == 1
+
+    coalescer.bump("r")
+    assert await coalescer.run("stats", "u", "r", {}, compute) == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_but_not_kept():
+    coalescer = RequestCoalescer(linger_seconds=60)
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(*[coalescer.run("stats", "u", "r", {}, fail) for _ in range(3)],
+                                   return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert coalescer.stats()["computed"] == 1
+    assert coalescer.stats()["lingering"] == 0
+
+
+@pytest.mark.asyncio
+async def test_stats_reflect_writes_within_linger(test_client, test_repo_data, test_commit_data, auth_headers):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    before = test_client.get(f"/api/repos/{repo_id}/stats", headers=auth_headers).json()
+
+    payload = {**test_commit_data, "repo_id": repo_id, "cost": {"parts": 100, "labor": 50}}
+    test_client.post("/api/commits", json=payload, headers=auth_headers)
+
+    after = test_client.get(f"/api/repos/{repo_id}/stats", headers=auth_headers).json()
+    assert after["total_cost"] == before["total_cost"] + 150
@@ -0,0 +1,46 @@
+import pytest
+from bson import ObjectId
+
+import fast_json
+from fast_json import RowEncoder
+from models import Commit
+
+
+@pytest.mark.asyncio
+async def test_fast_lists_match_response_model(
+    test_client, test_repo_data, test_commit_data, auth_headers, test_openid, mock_db, monkeypatch
+):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    commit = {**test_commit_data, "repo_id": repo_id, "title": "更换机油"}
+    test_client.post("/api/commits", json=commit, headers=auth_headers)
+    test_client.post(f"/api/repos/{repo_id}/issues", json={"repo_id": repo_id, "title": "轮胎"}, headers=auth_headers)
+    # Documents written outside the models: ints where floats are declared, missing defaults, unknown
+    # fields, and values only validation can convert (float mileages)
+    await mock_db.commits.insert_many([
+        {"repo_id": repo_id, "user_openid": test_openid, "title": "加油", "type": "fuel",
+         "timestamp": 1700000000000, "cost": {"labor": 80}, "legacy": True},
+        {"repo_id": repo_id, "user_openid": test_openid, "title": "洗车", "type": "wash",
+         "timestamp": 1600000000000.5, "mileage": 5000.0},
+    ])
+    await mock_db.issues.insert_one({
+        "_id": ObjectId(), "repo_id": repo_id, "user_openid": test_openid, "title": "刹车片",
+        "created_at": 1, "status": "open", "due_mileage": 3000.0,
+    })
+
+    paths = ["/api/repos", f"/api/commits?repo_id={repo_id}", f"/api/repos/{repo_id}/issues"]
+    expected = [test_client.get(path, headers=auth_headers).content for path in paths]
+    monkeypatch.setattr(fast_json, "FAST_JSON_RESPONSES", True)
+    for path, content in zip(paths, expected):
+        response = test_client.get(path, headers=auth_headers)
+        assert response.headers["content-type"] == "application/json"
+        assert response.content == content
+
+
+def test_row_encoder_falls_back_for_unchecked_values():
+    encoder = RowEncoder(Commit)
+    row = encoder.row({"_id": "c1", "repo_id": "r1", "title": "加油", "type": "fuel", "timestamp": 1, "extra": 1})
+    assert row["timestamp"] == 1.0 and type(row["timestamp"]) is float
+    assert "extra" not in row
+    assert encoder.rows([{"repo_id": "r1", "title": "加油", "type": "fuel", "mileage": 5000.0}])[0]["mileage"] == 5000
+    with pytest.raises(Exception):
+        encoder.rows([{"repo_id": "r1", "type": "fuel"}])
@@ -0,0 +1,81 @@
+import asyncio
+from datetime import timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from idempotency import IdempotencyStore
+
+
+def test_replayed_commit_is_not_inserted_twice(test_client, test_repo_data, test_commit_data, auth_headers, mock_db):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    headers = {**auth_headers, "Idempotency-Key": "commit-1"}
+    payload = {**test_commit_data, "repo_id": repo_id}
+
+    first = test_client.post("/api/commits", json=payload, headers=headers)
+    second = test_client.post("/api/commits", json=payload, headers=headers)
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json()
+
+    commits = test_client.get(f"/api/commits?repo_id={repo_id}", headers=auth_headers).json()
+    assert len(commits) == 1
+
+    conflict = test_client.post("/api/commits", json={**payload, "title": "Other"}, headers=headers)
+    assert conflict.status_code == 422
+
+
+def test_client_errors_are_replayed(test_client, test_commit_data, auth_headers):
+    headers = {**auth_headers, "Idempotency-Key": "missing-repo"}
+    payload = {**test_commit_data, "repo_id": "0" * 24}
+    assert test_client.post("/api/commits", json=payload, headers=headers).status_code == 404
+    assert test_client.post("/api/commits", json=payload, headers=headers).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_concurrent_duplicates_wait_for_the_first(mock_db):
+    store = IdempotencyStore()
+    calls = 0
+
+    async def handler():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"_id": "abc"}
+
+    results = await asyncio.gather(
+        *[store.run(mock_db, "u", "create_commit", "k", {"a": 1}, handler) for _ in range(3)]
+    )
+    assert calls == 1
+    assert results == [{"_id": "abc"}] * 3
+    assert store.stats()["replayed"] == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_request_releases_key(mock_db):
+    store = IdempotencyStore()
+
+    async def failing():
+        raise HTTPException(status_code=500, detail="boom")
+
+    async def succeeding():
+        return {"ok": True}
+
+    with pytest.raises(HTTPException):
+        await store.run(mock_db, "u", "create_repo", "k", {}, failing)
+    assert await store.run(mock_db, "u", "create_repo", "k", {}, succeeding) == {"ok": True}
+
+
+@pytest.mark.asyncio
+async def test_expiry_is_stored_in_utc():
+    inserted = []
+
+    class Keys:
+        async def insert_one(self, doc):
+            inserted.append(doc)
+
+    class Db:
+        idempotency_keys = Keys()
+
+    await IdempotencyStore()._claim(Db(), "u:create_commit:k", "digest")
+    # Mongo's TTL monitor compares stored dates as UTC
+    assert inserted[0]["expire_at"].utcoffset() == timedelta(0)
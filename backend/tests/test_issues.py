@@ -0,0 +1,50 @@
+import pytest
+
+from migrations import backfill_priority_rank
+
+
+@pytest.fixture(scope="function")
+def repo_id(test_client, test_repo_data, auth_headers):
+    return test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+
+
+def create_issue(test_client, auth_headers, repo_id, title, **fields):
+    payload = {"repo_id": repo_id, "title": title, **fields}
+    return test_client.post(f"/api/repos/{repo_id}/issues", json=payload, headers=auth_headers).json()
+
+
+@pytest.mark.asyncio
+async def test_issues_ordered_by_priority_then_due_date(test_client, auth_headers, repo_id):
+    create_issue(test_client, auth_headers, repo_id, "Wipers", priority="low")
+    create_issue(test_client, auth_headers, repo_id, "Brakes later", priority="high", due_date=2000)
+    create_issue(test_client, auth_headers, repo_id, "Brakes soon", priority="high", due_date=1000)
+    create_issue(test_client, auth_headers, repo_id, "Tires", priority="medium")
+
+    response = test_client.get(f"/api/repos/{repo_id}/issues", headers=auth_headers)
+    assert response.status_code == 200
+    assert [i["title"] for i in response.json()] == ["Brakes soon", "Brakes later", "Tires", "Wipers"]
+
+    page = test_client.get(f"/api/repos/{repo_id}/issues?skip=1&limit=2", headers=auth_headers).json()
+    assert [i["title"] for i in page] == ["Brakes later", "Tires"]
+
+
+@pytest.mark.asyncio
+async def test_priority_change_reorders_issue(test_client, auth_headers, repo_id):
+    create_issue(test_client, auth_headers, repo_id, "Tires", priority="medium")
+    wipers = create_issue(test_client, auth_headers, repo_id, "Wipers", priority="low")
+
+    test_client.patch(f"/api/issues/{wipers['_id']}", json={"priority": "high"}, headers=auth_headers)
+
+    issues = test_client.get(f"/api/repos/{repo_id}/issues", headers=auth_headers).json()
+    assert [i["title"] for i in issues] == ["Wipers", "Tires"]
+
+
+@pytest.mark.asyncio
+async def test_backfill_priority_rank(mock_db):
+    await mock_db.issues.insert_one({"title": "legacy", "priority": "low", "status": "open"})
+    await mock_db.issues.insert_one({"title": "odd", "priority": "urgent", "status": "open"})
+
+    await backfill_priority_rank(mock_db)
+
+    ranks = {doc["title"]: doc["priority_rank"] for doc in mock_db.issues.data}
+    assert ranks == {"legacy": 2, "odd": 99}
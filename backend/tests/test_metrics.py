@@ -0,0 +1,35 @@
+import pytest
+
+from metrics import InstrumentedDatabase, MetricsRegistry, metrics
+
+
+@pytest.mark.asyncio
+async def test_instrumented_database_times_operations(mock_db):
+    registry = MetricsRegistry()
+    db = InstrumentedDatabase(mock_db, registry)
+
+    await db.repos.insert_one({"name": "car"})
+    assert await db.repos.find_one({"name": "car"})
+    assert len(await db.repos.find({}).sort("name", 1).limit(5).to_list(length=None)) == 1
+    async for _ in db.repos.find({}):
+        pass
+
+    find = registry.db_latency[(("collection", "repos"), ("operation", "find"))]
+    assert find.count == 2
+    assert registry.db_latency[(("collection", "repos"), ("operation", "insert_one"))].count == 1
+
+    # Non-collection attributes pass straight through
+    assert db.save == mock_db.save
+
+
+def test_metrics_endpoint_reports_route_templates(test_client, test_repo_data, auth_headers):
+    metrics.reset()
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    test_client.get(f"/api/repos/{repo_id}", headers=auth_headers)
+
+    response = test_client.get("/api/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'autorepo_http_request_duration_seconds_count{method="GET",route="/api/repos/{repo_id}"} 1' in body
+    assert 'autorepo_http_responses_total{method="POST",route="/api/repos",status="200"} 1' in body
+    assert "autorepo_admission_classes_writes_admitted" in body
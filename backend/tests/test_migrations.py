@@ -0,0 +1,66 @@
+import pytest
+
+import migrations
+from migrations import run_migrations
+
+
+@pytest.mark.asyncio
+async def test_legacy_repos_assigned_once(mock_db, monkeypatch, test_openid):
+    monkeypatch.setattr(migrations, "LEGACY_OWNER_OPENID", test_openid)
+    result = await mock_db.repos.insert_one({"name": "Old car", "user_openid": None})
+    repo_id = str(result.inserted_id)
+    await mock_db.commits.insert_one({"repo_id": repo_id, "title": "Oil", "user_openid": None})
+
+    await run_migrations(mock_db)
+
+    assert mock_db.repos.data[0]["user_openid"] == test_openid
+    assert mock_db.commits.data[0]["user_openid"] == test_openid
+    state = await mock_db.migrations.find_one({"_id": "0001_legacy_repo_owner"})
+    assert state["status"] == "done"
+
+    # A second run must not touch repos that became ownerless later
+    await mock_db.repos.insert_one({"name": "Another", "user_openid": None})
+    await run_migrations(mock_db)
+    assert mock_db.repos.data[1]["user_openid"] is None
+
+
+@pytest.mark.asyncio
+async def test_legacy_migration_pending_without_owner(mock_db, monkeypatch, capsys):
+    monkeypatch.setattr(migrations, "LEGACY_OWNER_OPENID", "")
+    await mock_db.repos.insert_one({"name": "Old car", "user_openid": None})
+    await mock_db.repos.insert_one({"name": "Old bike", "user_openid": None})
+
+    await run_migrations(mock_db)
+
+    assert "Warning: 2 repos have no owner" in capsys.readouterr().out
+
+    state = await mock_db.migrations.find_one({"_id": "0001_legacy_repo_owner"})
+    assert state["status"] == "pending"
+    assert mock_db.repos.data[0]["user_openid"] is None
+
+
+@pytest.mark.asyncio
+async def test_running_migration_is_not_run_twice(mock_db):
+    assert await migrations._acquire(mock_db, "0002_issue_priority_rank", "worker-1")
+    assert not await migrations._acquire(mock_db, "0002_issue_priority_rank", "worker-2")
+
+
+@pytest.mark.asyncio
+async def test_legacy_issue_statuses_are_listed(test_client, test_repo_data, auth_headers, test_openid, mock_db):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    for title, status in [("Done", "Done"), ("Todo", "todo"), ("Missing", None), ("Open", "open")]:
+        issue = {"repo_id": repo_id, "user_openid": test_openid, "title": title, "priority_rank": 1}
+        await mock_db.issues.insert_one(issue if status is None else {**issue, "status": status})
+
+    await run_migrations(mock_db)
+
+    issues = test_client.get(f"/api/repos/{repo_id}/issues", headers=auth_headers).json()
+    assert sorted((i["title"], i["status"]) for i in issues) == [
+        ("Done", "closed"), ("Missing", "open"), ("Open", "open"), ("Todo", "open")
+    ]
+    done = await mock_db.issues.find_one({"title": "Done"})
+    assert done["legacy_status"] == "Done"
+
+    new_issue = {"repo_id": repo_id, "title": "New", "status": "todo"}
+    response = test_client.post(f"/api/repos/{repo_id}/issues", json=new_issue, headers=auth_headers)
+    assert response.status_code == 400
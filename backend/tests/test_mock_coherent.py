@@ -0,0 +1,61 @@
+import asyncio
+import multiprocessing
+
+import pytest
+
+import mock_db
+from mock_db import MockDatabase
+
+
+pytestmark = pytest.mark.parametrize("data_dir", [{"MOCK_DB_COHERENT": True}], indirect=True, ids=["coherent"])
+
+
+@pytest.mark.asyncio
+async def test_writes_from_another_process_are_seen(data_dir):
+    first, second = MockDatabase(), MockDatabase()
+
+    result = await first.repos.insert_one({"name": "卡罗拉", "user_openid": "u1"})
+    await first.commits.insert_one({"repo_id": str(result.inserted_id), "mileage": 1000})
+    assert (await second.repos.find_one({"user_openid": "u1"}))["name"] == "卡罗拉"
+
+    await second.repos.update_one({"_id": result.inserted_id}, {"$set": {"current_mileage": 1000}})
+    await second.commits.delete_many({"repo_id": str(result.inserted_id)})
+    assert (await first.repos.find_one({"_id": result.inserted_id}))["current_mileage"] == 1000
+    assert await first.commits.find({}).to_list() == []
+    assert first.generation == second.generation == 4
+
+    # Explicit ids stay unique across processes (migration and login locks rely on it)
+    await first.migrations.insert_one({"_id": "backfill"})
+    with pytest.raises(mock_db.DuplicateKeyError):
+        await second.migrations.insert_one({"_id": "backfill"})
+
+
+@pytest.mark.asyncio
+async def test_compaction_folds_journal_into_snapshot(data_dir, monkeypatch):
+    monkeypatch.setattr(mock_db, "MOCK_DB_JOURNAL_MAX_BYTES", 2000)
+    first, second = MockDatabase(), MockDatabase()
+    for i in range(40):
+        await first.commits.insert_one({"title": f"加油 {i}", "mileage": i})
+    assert first.generation < 40
+
+    assert len(await second.commits.find({}).to_list()) == 40
+    assert len(MockDatabase().commits.data) == 40
+
+
+def _insert_many(worker):
+    async def run():
+        db = MockDatabase()
+        for i in range(25):
+            await db.commits.insert_one({"worker": worker, "mileage": i})
+    asyncio.run(run())
+
+
+def test_concurrent_workers_do_not_lose_writes(data_dir):
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=_insert_many, args=(worker,)) for worker in range(3)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert len(MockDatabase().commits.data) == 75
@@ -0,0 +1,53 @@
+import pytest
+from bson import ObjectId
+
+import mock_db
+from mock_db import MockDatabase
+from mock_records import Record
+
+
+pytestmark = pytest.mark.parametrize("data_dir", [{"MOCK_DB_COMPACT": True}], indirect=True, ids=["compact"])
+
+
+def _commit(title, parts):
+    return {
+        "repo_id": "r1",
+        "user_openid": "u1",
+        "images": [],
+        "title": title,
+        "mileage": 1000,
+        "type": "maintenance",
+        "cost": {"parts": parts, "labor": 50.0, "currency": "CNY"},
+        "closes_issues": [],
+        "timestamp": 1700000000000.0,
+        "legacy_field": "kept",
+    }
+
+
+@pytest.mark.asyncio
+async def test_records_behave_like_documents(data_dir):
+    db = MockDatabase()
+    await db.commits.insert_many([_commit("更换机油", 300.0), _commit("更换机油", 120.5)])
+    first, second = db.commits.data
+    assert isinstance(first, Record)
+    # Low-cardinality strings are shared between records
+    assert first.get("title") is second.get("title")
+
+    docs = await db.commits.find({"legacy_field": "kept"}).sort("_id", 1).to_list()
+    assert [type(doc) for doc in docs] == [dict, dict]
+    assert docs[0] == {**_commit("更换机油", 300.0), "_id": first["_id"]}
+    docs[0]["images"].append("x.jpg")
+    assert first["images"] == []
+
+    await db.commits.update_one({"_id": first["_id"]}, {"$set": {"title": "小保养"}})
+    totals = await db.commits.aggregate([
+        {"$match": {"user_openid": "u1"}},
+        {"$group": {"_id": None, "parts": {"$sum": "$cost.parts"}}},
+    ]).to_list()
+    assert totals == [{"_id": None, "parts": 420.5}]
+
+    reloaded = MockDatabase()
+    assert isinstance(reloaded.commits.data[0], Record)
+    assert [doc["title"] for doc in reloaded.commits.data] == ["小保养", "更换机油"]
+    assert reloaded.commits.data == db.commits.data
+    assert isinstance(reloaded.commits.data[0]["_id"], ObjectId)
@@ -0,0 +1,40 @@
+import asyncio
+import json
+
+import pytest
+
+import mock_db
+from mock_db import MockDatabase
+
+
+pytestmark = pytest.mark.parametrize("data_dir", [{"MOCK_DB_FLUSH_WINDOW_MS": 5}], indirect=True, ids=["windowed"])
+
+
+def _stored(data_dir):
+    with open(data_dir / "mock_db_data.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_flushes(data_dir):
+    db = MockDatabase()
+    await asyncio.gather(*[db.commits.insert_one({"n": i}) for i in range(50)])
+
+    # Every write returned after its batch was written, and the batches were few
+    assert sorted(doc["n"] for doc in _stored(data_dir)["commits"]) == list(range(50))
+    assert db.flushes <= 3
+
+
+@pytest.mark.asyncio
+async def test_unawaited_writes_are_flushed_later(data_dir, monkeypatch):
+    monkeypatch.setattr(mock_db, "MOCK_DB_FLUSH_WAIT", False)
+    db = MockDatabase()
+    await db.repos.insert_one({"name": "卡罗拉"})
+    assert not (data_dir / "mock_db_data.json").exists()
+
+    await db.durable()
+    assert _stored(data_dir)["repos"][0]["name"] == "卡罗拉"
+
+    await db.repos.update_one({"name": "卡罗拉"}, {"$set": {"mileage": 1000}})
+    db.close()
+    assert _stored(data_dir)["repos"][0]["mileage"] == 1000
@@ -0,0 +1,57 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+
+
+@pytest.mark.asyncio
+async def test_returned_documents_do_not_alias_stored_data(mock_db):
+    await mock_db.commits.insert_one({"title": "更换机油", "mileage": 1000})
+
+    doc = await mock_db.commits.find_one({})
+    doc["_id"] = str(doc["_id"])
+    doc["mileage"] = 0
+    async for listed in mock_db.commits.find({}):
+        listed["title"] = None
+    await mock_db.commits.aggregate([{"$addFields": {"total": {"$add": ["$mileage", 1]}}}]).to_list()
+
+    stored = mock_db.commits.data[0]
+    assert isinstance(stored["_id"], ObjectId)
+    assert stored == {"_id": stored["_id"], "title": "更换机油", "mileage": 1000}
+
+
+@pytest.mark.asyncio
+async def test_cursor_keeps_its_snapshot(mock_db):
+    await mock_db.commits.insert_many([{"n": i} for i in range(3)])
+    cursor = mock_db.commits.find({})
+    before = mock_db.commits.data
+
+    await mock_db.commits.update_one({"n": 0}, {"$set": {"n": -1}})
+    await mock_db.commits.delete_many({"n": {"$gte": 1}})
+    await mock_db.commits.insert_one({"n": 3})
+
+    assert [doc["n"] for doc in await cursor.to_list()] == [0, 1, 2]
+    assert [doc["n"] for doc in before] == [0, 1, 2]
+    assert [doc["n"] for doc in mock_db.commits.data] == [-1, 3]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_readers_and_writers(mock_db):
+    async def write(i):
+        result = await mock_db.commits.insert_one({"n": i, "status": "open"})
+        await asyncio.sleep(0)
+        await mock_db.commits.update_one({"_id": result.inserted_id}, {"$set": {"status": "closed"}})
+
+    async def read():
+        for _ in range(20):
+            docs = await mock_db.commits.find({}).to_list()
+            # Every snapshot is internally consistent: unique ids, each document fully written
+            assert len({str(doc["_id"]) for doc in docs}) == len(docs)
+            assert all(doc["status"] in ("open", "closed") for doc in docs)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*[write(i) for i in range(30)], *[read() for _ in range(5)])
+
+    docs = mock_db.commits.data
+    assert sorted(doc["n"] for doc in docs) == list(range(30))
+    assert {doc["status"] for doc in docs} == {"closed"}
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+
+from auth import create_access_token
+from database import db_manager
+from main import app
+from migrations import assign_legacy_repo_owner
+from mock_db import ShardedMockDatabase
+
+
+def _shard_file(data_dir, openid):
+    return data_dir / "tenants" / openid / "mock_db_data.json"
+
+
+@pytest.mark.asyncio
+async def test_writes_touch_only_the_callers_shard(data_dir, test_repo_data, test_commit_data):
+    db = ShardedMockDatabase()
+    original_db = db_manager.db
+    db_manager.db = db
+    try:
+        client = TestClient(app)
+        alice = {"Authorization": f"Bearer {create_access_token('alice')}"}
+        bob = {"Authorization": f"Bearer {create_access_token('bob')}"}
+        alice_repo = client.post("/api/repos", json=test_repo_data, headers=alice).json()["_id"]
+        client.post("/api/repos", json=test_repo_data, headers=bob)
+        bob_before = _shard_file(data_dir, "bob").read_text(encoding="utf-8")
+
+        response = client.post("/api/commits", json={**test_commit_data, "repo_id": alice_repo}, headers=alice)
+        assert response.status_code == 200
+        assert _shard_file(data_dir, "bob").read_text(encoding="utf-8") == bob_before
+        alice_data = json.loads(_shard_file(data_dir, "alice").read_text(encoding="utf-8"))
+        assert len(alice_data["commits"]) == 1
+        assert not (data_dir / "mock_db_data.json").exists()
+
+        assert len(client.get("/api/repos", headers=bob).json()) == 1
+        assert client.get(f"/api/commits?repo_id={alice_repo}", headers=bob).status_code == 404
+    finally:
+        db_manager.db = original_db
+
+
+@pytest.mark.asyncio
+async def test_tenants_load_lazily_and_are_evicted(data_dir):
+    db = ShardedMockDatabase(max_tenants=2)
+    for user in ("u1", "u2", "u3"):
+        await db.commits.insert_one({"user_openid": user, "title": "加油费用"})
+    assert db.stats() == {"loaded_tenants": 2, "loads": 3, "evictions": 1, "scatter_visits": 0}
+
+    reopened = ShardedMockDatabase(max_tenants=2)
+    assert reopened.stats()["loaded_tenants"] == 0
+    assert (await reopened.commits.find_one({"user_openid": "u1"}))["title"] == "加油费用"
+    assert reopened.stats()["loaded_tenants"] == 1
+    # Queries without an owner visit every shard, without keeping the others loaded or evicting u1
+    assert len(await reopened.commits.find({"title": "加油费用"}).to_list()) == 3
+    await reopened.commits.update_many({"title": "加油费用"}, {"$set": {"type": "fuel"}})
+    assert reopened.stats() == {"loaded_tenants": 1, "loads": 1, "evictions": 0, "scatter_visits": 4}
+    assert len(await ShardedMockDatabase().commits.find({"type": "fuel"}).to_list()) == 3
+
+
+@pytest.mark.asyncio
+async def test_shards_with_queued_writes_are_not_evicted(data_dir):
+    db = ShardedMockDatabase(max_tenants=1)
+    await db.commits.insert_one({"user_openid": "u1", "title": "加油费用"})
+    busy = db.shard("u1")
+    lock = asyncio.Lock()
+    busy.commits._write_lock, busy.commits._write_lock_loop = lock, asyncio.get_running_loop()
+
+    async with lock:
+        queued = asyncio.create_task(db.commits.insert_one({"user_openid": "u1", "title": "洗车"}))
+        await asyncio.sleep(0)
+        await db.commits.insert_one({"user_openid": "u2", "title": "加油费用"})
+        assert db.shard("u1") is busy
+    await queued
+    await db.commits.insert_one({"user_openid": "u3", "title": "加油费用"})
+    assert db.stats()["evictions"] == 2
+
+    reopened = ShardedMockDatabase()
+    assert len(await reopened.commits.find({"user_openid": "u1"}).to_list()) == 2
+    # A write that reaches an evicted instance anyway is refused rather than overwriting the new owner's file
+    with pytest.raises(RuntimeError):
+        await busy.commits.insert_one({"user_openid": "u1", "title": "轮胎"})
+
+
+@pytest.mark.asyncio
+async def test_single_file_is_split_and_legacy_repos_move_to_owner(data_dir, monkeypatch):
+    legacy_id, owned_id = ObjectId(), ObjectId()
+    (data_dir / "mock_db_data.json").write_text(json.dumps({
+        "repos": [
+            {"_id": str(legacy_id), "name": "legacy", "user_openid": None},
+            {"_id": str(owned_id), "name": "owned", "user_openid": "u1"},
+        ],
+        "commits": [{"_id": str(ObjectId()), "repo_id": str(legacy_id), "user_openid": None}],
+        "refresh_tokens": [{"_id": str(ObjectId()), "openid": "u1"}],
+    }), encoding="utf-8")
+
+    db = ShardedMockDatabase()
+    assert os.path.exists(_shard_file(data_dir, "u1"))
+    assert [repo["name"] for repo in db.default.repos.data] == ["legacy"]
+    assert len(await db.refresh_tokens.find({"openid": "u1"}).to_list()) == 1
+
+    monkeypatch.setattr("migrations.LEGACY_OWNER_OPENID", "u1")
+    await assign_legacy_repo_owner(db)
+    assert db.default.repos.data == [] and db.default.commits.data == []
+    repos = await db.repos.find({"user_openid": "u1"}).sort("name", 1).to_list()
+    assert [(repo["_id"], repo["name"]) for repo in repos] == [(legacy_id, "legacy"), (owned_id, "owned")]
+    assert len(await db.commits.find({"user_openid": "u1"}).to_list()) == 1
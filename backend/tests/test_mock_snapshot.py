@@ -0,0 +1,74 @@
+import os
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+import mock_db
+import mock_snapshot
+from mock_db import MockDatabase
+
+
+pytestmark = pytest.mark.parametrize("data_dir", [{"MOCK_DB_FORMAT": "binary"}], indirect=True, ids=["binary"])
+
+
+def _commit(i):
+    return {
+        "_id": ObjectId(),
+        "repo_id": str(ObjectId()),
+        "user_openid": "u1",
+        "title": "更换机油",
+        "mileage": i * 1000,
+        "cost": {"parts": 300.5, "labor": 0.0, "currency": "CNY"},
+        "closes_issues": [],
+        "timestamp": 1700000000000.5 + i,
+        "deleted_at": None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_binary_snapshot_round_trip_decodes_lazily(data_dir):
+    db = MockDatabase()
+    commits = [_commit(i) for i in range(5)]
+    for commit in commits:
+        await db.commits.insert_one(dict(commit))
+    await db.idempotency_keys.insert_one({"_id": "u1:create_commit:k", "expire_at": datetime(2026, 1, 1, 8, 30)})
+    assert os.path.exists(data_dir / "mock_db_data.bin") and not os.path.exists(data_dir / "mock_db_data.json")
+
+    reopened = MockDatabase()
+    assert reopened.commits._pending.count == 5 and reopened.commits._pending.encoding == mock_snapshot.JSON_ROWS
+    assert await reopened.idempotency_keys.find_one({}) == {
+        "_id": "u1:create_commit:k", "expire_at": datetime(2026, 1, 1, 8, 30)
+    }
+    # Untouched collections are carried over without being decoded
+    reopened.save()
+    assert reopened.commits._pending is not None
+    assert MockDatabase().commits.data == commits
+
+
+@pytest.mark.asyncio
+async def test_json_snapshot_is_converted(data_dir, monkeypatch):
+    monkeypatch.setattr(mock_db, "MOCK_DB_FORMAT", "json")
+    legacy = MockDatabase()
+    await legacy.repos.insert_one({"name": "卡罗拉", "user_openid": "u1"})
+
+    monkeypatch.setattr(mock_db, "MOCK_DB_FORMAT", "binary")
+    db = MockDatabase()
+    assert os.path.exists(data_dir / "mock_db_data.json.bak")
+    assert db.repos.data == legacy.repos.data
+    assert MockDatabase().repos.data == legacy.repos.data
+
+
+@pytest.mark.asyncio
+async def test_binary_snapshot_is_converted_back_to_json(data_dir, monkeypatch):
+    db = MockDatabase()
+    commits = [_commit(i) for i in range(3)]
+    await db.commits.insert_many([dict(commit) for commit in commits])
+    await db.repos.insert_one({"name": "卡罗拉", "user_openid": "u1"})
+
+    monkeypatch.setattr(mock_db, "MOCK_DB_FORMAT", "json")
+    converted = MockDatabase()
+    assert os.path.exists(data_dir / "mock_db_data.bin.bak") and os.path.exists(data_dir / "mock_db_data.json")
+    assert converted.commits.data == commits
+    assert converted.repos.data == db.repos.data
+    assert MockDatabase().commits.data == commits
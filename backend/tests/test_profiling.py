@@ -0,0 +1,42 @@
+import os
+import pstats
+
+from fastapi.testclient import TestClient
+
+import auth
+from main import app
+from profiling import Profiler, ProfilingMiddleware, StackSampler
+
+
+def test_profile_header_requires_admin_token(test_client, auth_headers, tmp_path, monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "admin-secret")
+    client = TestClient(ProfilingMiddleware(app, Profiler(str(tmp_path))))
+
+    response = client.get("/api/repos", headers={**auth_headers, "X-Profile": "cprofile"})
+    assert "x-profile-file" not in response.headers
+
+    headers = {**auth_headers, "X-Profile": "cprofile", "X-Admin-Token": "admin-secret"}
+    response = client.get("/api/repos", headers=headers)
+    assert response.status_code == 200
+    path = os.path.join(tmp_path, response.headers["x-profile-file"])
+    assert pstats.Stats(path).total_calls > 0
+
+
+def test_sampled_requests_aggregate_per_route(test_client, auth_headers, tmp_path):
+    profiler = Profiler(str(tmp_path), sample_rate=1.0)
+    client = TestClient(ProfilingMiddleware(app, profiler))
+
+    client.get("/api/repos", headers=auth_headers)
+    assert profiler.stats()["sampled_requests"] == 1
+    assert os.path.exists(os.path.join(tmp_path, "routes", "GET_api_repos.collapsed"))
+
+
+def test_stack_sampler_collects_collapsed_stacks():
+    import time
+
+    sampler = StackSampler(interval_ms=1)
+    sampler.start()
+    time.sleep(0.02)
+    stacks = sampler.stop()
+    assert stacks
+    assert all(";" in stack for stack in stacks)
@@ -0,0 +1,91 @@
+import pytest
+
+from mock_db import ShardedMockDatabase
+from purge import RepoPurger
+
+
+@pytest.mark.asyncio
+async def test_deleted_repo_hidden_before_purge(test_client, test_repo_data, test_commit_data, auth_headers):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    commit = test_client.post("/api/commits", json={**test_commit_data, "repo_id": repo_id}, headers=auth_headers)
+    commit_id = commit.json()["_id"]
+
+    response = test_client.delete(f"/api/repos/{repo_id}", headers=auth_headers)
+    assert response.status_code == 200
+
+    assert test_client.get("/api/repos", headers=auth_headers).json() == []
+    assert test_client.get(f"/api/repos/{repo_id}", headers=auth_headers).status_code == 404
+    assert test_client.get(f"/api/commits/{commit_id}", headers=auth_headers).status_code == 404
+    assert test_client.get(f"/api/commits?repo_id={repo_id}", headers=auth_headers).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_purge_removes_history_in_batches(
+    test_client, test_repo_data, test_commit_data, auth_headers, test_openid, mock_db
+):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    for mileage in range(1000, 6000, 1000):
+        payload = {**test_commit_data, "repo_id": repo_id, "mileage": mileage}
+        test_client.post("/api/commits", json=payload, headers=auth_headers)
+    test_client.post(f"/api/repos/{repo_id}/issues", json={"repo_id": repo_id, "title": "Tires"}, headers=auth_headers)
+    test_client.delete(f"/api/repos/{repo_id}", headers=auth_headers)
+
+    progress = []
+    purger = RepoPurger(batch_size=2)
+    original_update = mock_db.repos.update_one
+
+    async def record_progress(query, update):
+        if "purge_progress" in update.get("$set", {}):
+            progress.append(update["$set"]["purge_progress"]["commits"])
+        return await original_update(query, update)
+
+    mock_db.repos.update_one = record_progress
+    await purger.purge(mock_db, repo_id, test_openid)
+
+    assert progress[:3] == [2, 4, 5]
+    assert mock_db.commits.data == []
+    assert mock_db.issues.data == []
+    assert mock_db.repos.data == []
+
+
+@pytest.mark.asyncio
+async def test_repo_deleted_by_another_worker_is_hidden(
+    test_client, test_repo_data, test_commit_data, auth_headers, test_openid, mock_db
+):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    commit_id = test_client.post(
+        "/api/commits", json={**test_commit_data, "repo_id": repo_id}, headers=auth_headers
+    ).json()["_id"]
+    issue_id = test_client.post(
+        f"/api/repos/{repo_id}/issues", json={"repo_id": repo_id, "title": "Tires"}, headers=auth_headers
+    ).json()["_id"]
+
+    # Tombstoned through another worker: only the database knows about it
+    await mock_db.repos.update_one({"user_openid": test_openid}, {"$set": {"deleted_at": 1}})
+
+    assert test_client.get(f"/api/commits/{commit_id}", headers=auth_headers).status_code == 404
+    assert test_client.put(f"/api/commits/{commit_id}", json={"title": "x"}, headers=auth_headers).status_code == 404
+    assert test_client.patch(f"/api/issues/{issue_id}", json={"title": "x"}, headers=auth_headers).status_code == 404
+    assert test_client.delete(f"/api/issues/{issue_id}", headers=auth_headers).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_purge_stays_on_the_owners_shard(data_dir):
+    db = ShardedMockDatabase()
+    repo = await db.repos.insert_one({"user_openid": "alice", "name": "Car"})
+    repo_id = str(repo.inserted_id)
+    for user in ("alice", "bob", "carol"):
+        for mileage in range(3):
+            await db.commits.insert_one({"repo_id": repo_id, "user_openid": user, "mileage": mileage})
+    await db.issues.insert_one({"repo_id": repo_id, "user_openid": "alice", "title": "Tires"})
+    db.close()
+
+    # The other tenants are only on disk; a query without an owner would have to load them
+    db = ShardedMockDatabase()
+    purger = RepoPurger(batch_size=2)
+    await purger.tombstone(db, repo_id, "alice")
+    await purger.purge(db, repo_id, "alice")
+
+    assert db.stats()["scatter_visits"] == 0
+    assert await db.commits.find({"user_openid": "alice"}).to_list() == []
+    assert len(await db.commits.find({"user_openid": "bob"}).to_list()) == 3
@@ -0,0 +1,52 @@
+from limits import RateLimitItemPerMinute
+from limits.storage import storage_from_string
+from limits.strategies import FixedWindowRateLimiter
+from starlette.requests import Request
+
+from auth import create_access_token
+from ratelimit import SQLiteStorage, rate_limit_key
+
+
+def make_request(headers=None):
+    return Request({
+        "type": "http",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+        "client": ("10.0.0.7", 1234),
+    })
+
+
+def test_sqlite_storage_is_shared_between_instances(tmp_path):
+    uri = f"sqlite:///{tmp_path}/ratelimit.db"
+    first = storage_from_string(uri)
+    second = storage_from_string(uri)
+    assert isinstance(first, SQLiteStorage)
+
+    limit = RateLimitItemPerMinute(3)
+    a = FixedWindowRateLimiter(first)
+    b = FixedWindowRateLimiter(second)
+    assert a.hit(limit, "user:x")
+    assert b.hit(limit, "user:x")
+    assert a.hit(limit, "user:x")
+    assert not b.hit(limit, "user:x")
+    assert b.hit(limit, "user:y")
+
+
+def test_sqlite_storage_window_expiry(tmp_path):
+    storage = SQLiteStorage(f"sqlite:///{tmp_path}/ratelimit.db")
+    assert storage.incr("k", 60) == 1
+    assert storage.incr("k", 60, amount=2) == 3
+    assert storage.get("k") == 3
+
+    # An expired window restarts from the increment
+    assert storage.incr("stale", -1) == 1
+    assert storage.incr("stale", 60) == 1
+
+    storage.clear("k")
+    assert storage.get("k") == 0
+
+
+def test_key_uses_openid_for_authenticated_requests(test_openid):
+    token = create_access_token(test_openid)
+    assert rate_limit_key(make_request({"Authorization": f"Bearer {token}"})) == f"user:{test_openid}"
+    assert rate_limit_key(make_request({"Authorization": "Bearer not-a-token"})) == "10.0.0.7"
+    assert rate_limit_key(make_request()) == "10.0.0.7"
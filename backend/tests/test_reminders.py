@@ -0,0 +1,155 @@
+import asyncio
+
+import pytest
+from bson import ObjectId
+from datetime import datetime
+
+from mock_db import ShardedMockDatabase
+from reminders import ReminderEngine, reminder_engine, DAY_MS
+
+
+def now_ms():
+    return datetime.now().timestamp() * 1000
+
+
+@pytest.mark.asyncio
+async def test_reminders_across_vehicles(test_client, test_repo_data, auth_headers):
+    soon = now_ms() + 10 * DAY_MS
+    car = test_client.post("/api/repos", json={**test_repo_data, "inspection_expiry": soon}, headers=auth_headers)
+    bike = test_client.post("/api/repos", json={**test_repo_data, "name": "Bike"}, headers=auth_headers)
+    bike_id = bike.json()["_id"]
+    test_client.post(
+        f"/api/repos/{bike_id}/issues",
+        json={"repo_id": bike_id, "title": "Chain service", "due_mileage": 800},
+        headers=auth_headers
+    )
+    test_client.post(
+        f"/api/repos/{bike_id}/issues",
+        json={"repo_id": bike_id, "title": "Far away", "due_mileage": 50000},
+        headers=auth_headers
+    )
+
+    response = test_client.get("/api/reminders", headers=auth_headers)
+    assert response.status_code == 200
+    reminders = response.json()
+    assert [r["title"] for r in reminders] == ["年检到期", "Chain service"]
+    assert reminders[0]["repo_id"] == car.json()["_id"]
+    assert reminders[1]["remaining_mileage"] == 800
+    assert not any(r["overdue"] for r in reminders)
+
+
+@pytest.mark.asyncio
+async def test_commit_escalates_issues_reaching_due_mileage(
+    test_client, test_repo_data, test_commit_data, auth_headers
+):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    for title, due_mileage in [("Due", 4000), ("Not yet", 9000)]:
+        test_client.post(
+            f"/api/repos/{repo_id}/issues",
+            json={"repo_id": repo_id, "title": title, "priority": "low", "due_mileage": due_mileage},
+            headers=auth_headers
+        )
+
+    test_client.post("/api/commits", json={**test_commit_data, "repo_id": repo_id}, headers=auth_headers)
+
+    issues = test_client.get(f"/api/repos/{repo_id}/issues", headers=auth_headers).json()
+    assert [(i["title"], i["priority"]) for i in issues] == [("Due", "high"), ("Not yet", "low")]
+    overdue = [r for r in test_client.get("/api/reminders", headers=auth_headers).json() if r["overdue"]]
+    assert [r["title"] for r in overdue] == ["Due"]
+
+
+@pytest.mark.asyncio
+async def test_sweep_escalates_overdue_issues(test_client, test_repo_data, auth_headers, mock_db):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    test_client.post(
+        f"/api/repos/{repo_id}/issues",
+        json={"repo_id": repo_id, "title": "Overdue", "priority": "medium", "due_date": now_ms() - DAY_MS},
+        headers=auth_headers
+    )
+
+    assert await reminder_engine.sweep(mock_db) == 1
+    assert await reminder_engine.sweep(mock_db) == 0
+
+    issue = test_client.get(f"/api/repos/{repo_id}/issues", headers=auth_headers).json()[0]
+    assert issue["priority"] == "high"
+
+
+@pytest.mark.asyncio
+async def test_rebuild_keeps_serving_and_runs_once(test_client, test_repo_data, auth_headers, test_openid, mock_db):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    test_client.post(
+        f"/api/repos/{repo_id}/issues",
+        json={"repo_id": repo_id, "title": "Chain service", "due_mileage": 800},
+        headers=auth_headers
+    )
+    await reminder_engine.ensure_ready(mock_db)
+
+    scans = []
+    original_find = mock_db.issues.find
+    late_issue = {"_id": ObjectId(), "repo_id": repo_id, "user_openid": test_openid, "status": "open",
+                  "title": "Late", "priority": "medium", "due_mileage": 900}
+
+    def slow_find(*args, **kwargs):
+        scans.append(args)
+        # The old index is still served mid-rebuild, and a write made now survives the swap
+        assert reminder_engine.ready
+        assert len(reminder_engine.for_user(test_openid, now_ms(), 30, 1000)) >= 1
+        reminder_engine.track_issue(late_issue)
+        return original_find(*args, **kwargs)
+
+    mock_db.issues.find = slow_find
+    await asyncio.gather(reminder_engine.rebuild(mock_db), *[reminder_engine.ensure_ready(mock_db) for _ in range(5)])
+    assert len(scans) == 2
+    titles = [r["title"] for r in reminder_engine.for_user(test_openid, now_ms(), 30, 1000)]
+    assert sorted(titles) == ["Chain service", "Late"]
+
+    # Callers queued behind a cold rebuild share it instead of each running their own
+    mock_db.issues.find = lambda *args, **kwargs: scans.append(args) or original_find(*args, **kwargs)
+    reminder_engine.ready = False
+    await asyncio.gather(*[reminder_engine.ensure_ready(mock_db) for _ in range(5)])
+    mock_db.issues.find = original_find
+    assert len(scans) == 4
+
+
+@pytest.mark.asyncio
+async def test_rebuild_escalates_issues_missing_from_index(
+    test_client, test_repo_data, test_commit_data, auth_headers, test_openid, mock_db
+):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    test_client.get("/api/reminders", headers=auth_headers)
+    # Created by another worker: in the database but not in this process's index
+    await mock_db.issues.insert_one({
+        "repo_id": repo_id, "user_openid": test_openid, "title": "Elsewhere", "status": "open",
+        "priority": "low", "priority_rank": 2, "due_mileage": 4000,
+    })
+
+    # A commit only checks the index, it does not scan the repo's open issues
+    test_client.post("/api/commits", json={**test_commit_data, "repo_id": repo_id}, headers=auth_headers)
+    issues = test_client.get(f"/api/repos/{repo_id}/issues", headers=auth_headers).json()
+    assert [(i["title"], i["priority"]) for i in issues] == [("Elsewhere", "low")]
+
+    await reminder_engine.rebuild(mock_db)
+    assert await reminder_engine.sweep(mock_db) == 1
+    issues = test_client.get(f"/api/repos/{repo_id}/issues", headers=auth_headers).json()
+    assert [(i["title"], i["priority"]) for i in issues] == [("Elsewhere", "high")]
+
+
+@pytest.mark.asyncio
+async def test_sweep_stays_on_the_owners_shard(data_dir):
+    db = ShardedMockDatabase()
+    for user in ("alice", "bob", "carol"):
+        repo = await db.repos.insert_one({"user_openid": user, "name": "Car", "current_mileage": 0})
+        await db.issues.insert_one({
+            "repo_id": str(repo.inserted_id), "user_openid": user, "title": "Oil", "status": "open",
+            "priority": "low", "due_date": now_ms() - DAY_MS if user == "alice" else None,
+        })
+    db.close()
+
+    db = ShardedMockDatabase()
+    engine = ReminderEngine()
+    await engine.rebuild(db)
+    visits = db.stats()["scatter_visits"]
+
+    assert await engine.sweep(db) == 1
+    assert db.stats()["scatter_visits"] == visits
+    assert (await db.issues.find_one({"user_openid": "alice"}))["priority"] == "high"
@@ -0,0 +1,55 @@
+import auth
+from database import db_manager
+from metrics import InstrumentedDatabase, MetricsRegistry
+from slowlog import SlowQueryLog, pipeline_summary, query_shape, slow_query_log
+
+
+def test_query_shape_strips_values():
+    query = {"user_openid": "u1", "status": {"$in": ["open", "closed"]}, "$or": [{"a": 1}, {"b": {"$gt": 2}}]}
+    assert query_shape(query) == {
+        "$or": [{"a": "?"}, {"b": {"$gt": "?"}}],
+        "status": {"$in": "?"},
+        "user_openid": "?",
+    }
+
+
+def test_pipeline_summary_expands_facets():
+    pipeline = [
+        {"$match": {"repo_id": "r", "user_openid": "u"}},
+        {"$facet": {"totals": [{"$group": {"_id": None, "n": {"$sum": 1}}}], "fuel": [{"$match": {"type": "fuel"}}]}},
+        {"$limit": 5},
+    ]
+    assert pipeline_summary(pipeline) == [
+        {"$match": {"repo_id": "?", "user_openid": "?"}},
+        {"$facet": {"fuel": [{"$match": {"type": "?"}}], "totals": [{"$group": ["_id", "n"]}]}},
+        "$limit",
+    ]
+
+
+def test_same_shape_is_grouped():
+    log = SlowQueryLog(threshold_ms=1)
+    for user in ("a", "b"):
+        log.record(None, "commits", "find_one", 0.005, ({"user_openid": user},), {}, docs=1)
+    log.record(None, "commits", "find_one", 0.0001, ({"user_openid": "c"},), {})
+
+    top = log.top()
+    assert len(top) == 1
+    assert top[0]["count"] == 2
+    assert top[0]["shape"]["filter"] == {"user_openid": "?"}
+
+
+def test_slow_queries_endpoint(test_client, test_repo_data, auth_headers, mock_db, monkeypatch):
+    monkeypatch.setattr(auth, "ADMIN_TOKEN", "admin-secret")
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 1e-9)
+    slow_query_log.reset()
+    db_manager.db = InstrumentedDatabase(mock_db, MetricsRegistry())
+
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    test_client.get(f"/api/repos/{repo_id}/stats", headers=auth_headers)
+
+    assert test_client.get("/api/debug/slow-queries").status_code == 403
+    body = test_client.get("/api/debug/slow-queries", headers={"X-Admin-Token": "admin-secret"}).json()
+    aggregate = next(e for e in body["top"] if e["shape"]["operation"] == "aggregate")
+    assert aggregate["shape"]["collection"] == "commits"
+    assert aggregate["worst"]["route"] == "GET /api/repos/{repo_id}/stats"
+    assert "user_openid" in aggregate["shape"]["pipeline"][0]["$match"]
@@ -0,0 +1,176 @@
+import json
+
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from pymongo.errors import DuplicateKeyError, OperationFailure
+
+from database import db_manager
+from main import app
+from mock_db import MockCollection
+from sqlite_db import SQLiteDatabase, import_mock_data
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "test.sqlite3"))
+    yield db
+    db.close()
+
+
+def _docs():
+    docs = []
+    for i in range(30):
+        docs.append({
+            "_id": ObjectId(f"{i:024x}"),
+            "user_openid": "u1" if i % 3 else "u2",
+            "repo_id": f"r{i % 4}",
+            "title": ["更换机油", "加油费用", "Brake pads"][i % 3],
+            "type": ["maintenance", "fuel", "repair"][i % 3],
+            "mileage": None if i % 7 == 0 else i * 1000,
+            "timestamp": 1700000000000 + i * 3600000,
+            "cost": {"parts": i * 10.0, "labor": 5.0},
+            "status": ["open", "closed"][i % 2],
+        })
+        if i % 5 == 0:
+            del docs[-1]["status"]
+    return docs
+
+
+QUERIES = [
+    {},
+    {"user_openid": "u1", "repo_id": "r1"},
+    {"mileage": {"$gte": 5000, "$lte": 20000}},
+    {"mileage": None},
+    {"mileage": {"$ne": None}, "status": {"$in": ["open", None]}},
+    {"status": {"$nin": ["open"]}},
+    {"status": {"$exists": False}},
+    {"_id": {"$in": [ObjectId(f"{3:024x}"), ObjectId(f"{4:024x}")]}},
+    {"$or": [{"title": {"$regex": "brake", "$options": "i"}}, {"mileage": {"$gt": 25000}}]},
+    {"type": "fuel", "$nor": [{"repo_id": "r1"}]},
+    {"timestamp": {"$lt": 1700036000000}, "user_openid": "u1"},
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("query", QUERIES)
+async def test_queries_match_mock_semantics(sqlite_db, query):
+    mock = MockCollection("commits", None)
+    mock.data = _docs()
+    await sqlite_db.commits.insert_many(_docs())
+
+    expected = await mock.find(query).sort([("timestamp", -1)]).to_list()
+    actual = await sqlite_db.commits.find(query).sort([("timestamp", -1)]).to_list()
+    assert actual == expected
+
+    page = await sqlite_db.commits.find(query).sort("mileage", 1).skip(2).limit(3).to_list()
+    assert page == (await mock.find(query).sort("mileage", 1).to_list())[2:5]
+
+
+COST = {"$add": [{"$ifNull": ["$cost.parts", 0]}, {"$ifNull": ["$cost.labor", 0]}]}
+PIPELINES = [
+    [
+        {"$match": {"user_openid": "u1"}},
+        {"$facet": {
+            "totals": [{"$group": {
+                "_id": None, "parts": {"$sum": {"$ifNull": ["$cost.parts", 0]}}, "count": {"$sum": 1}
+            }}],
+            "composition": [{"$group": {"_id": "$type", "value": {"$sum": COST}}}],
+            "fuel": [{"$match": {"type": "fuel"}}, {"$group": {"_id": None, "fuel": {"$sum": "$cost.labor"}}}],
+            "none": [{"$match": {"type": "wash"}}, {"$group": {"_id": None, "total": {"$sum": COST}}}],
+        }},
+    ],
+    [
+        {"$match": {"repo_id": {"$in": ["r1", "r2"]}, "timestamp": {"$gte": 1700010000000}}},
+        {"$addFields": {"month": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$toDate": "$timestamp"}}}}},
+        {"$group": {
+            "_id": "$month", "total": {"$sum": COST}, "max_mileage": {"$max": "$mileage"}, "count": {"$sum": 1}
+        }},
+        {"$sort": {"_id": -1}},
+    ],
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("pipeline", PIPELINES)
+async def test_aggregations_are_grouped_in_sql(sqlite_db, pipeline, monkeypatch):
+    mock = MockCollection("commits", None)
+    mock.data = _docs()
+    mock.data[1]["cost"] = {"parts": "n/a"}
+    del mock.data[2]["cost"]
+    await sqlite_db.commits.insert_many([dict(doc) for doc in mock.data])
+
+    async def no_rows(*args, **kwargs):
+        raise AssertionError("documents were loaded instead of grouped in SQL")
+
+    monkeypatch.setattr(sqlite_db.commits, "_select", no_rows)
+    assert await sqlite_db.commits.aggregate(pipeline).to_list() == mock.aggregate(pipeline).data
+
+
+@pytest.mark.asyncio
+async def test_unsupported_update_is_rejected(sqlite_db):
+    with pytest.raises(OperationFailure, match=r"\$inc"):
+        await sqlite_db.issues.update_many({"repo_id": "missing"}, {"$inc": {"count": 1}})
+
+
+@pytest.mark.asyncio
+async def test_writes(sqlite_db):
+    result = await sqlite_db.issues.insert_one({"repo_id": "r1", "status": "open", "due_mileage": 5000})
+    with pytest.raises(DuplicateKeyError):
+        await sqlite_db.issues.insert_one({"_id": result.inserted_id, "repo_id": "r1"})
+    await sqlite_db.migrations.insert_one({"_id": "backfill", "status": "running"})
+
+    update = {"$set": {"status": "closed", "cost.parts": 1}}
+    updated = await sqlite_db.issues.update_one({"_id": result.inserted_id}, update)
+    assert (updated.matched_count, updated.modified_count) == (1, 1)
+    issue = await sqlite_db.issues.find_one({"status": "closed"})
+    assert issue["_id"] == result.inserted_id and issue["cost"] == {"parts": 1}
+
+    unchanged = await sqlite_db.issues.update_many({"repo_id": "r1"}, {"$set": {"status": "closed"}})
+    assert (unchanged.matched_count, unchanged.modified_count) == (1, 0)
+
+    migration = await sqlite_db.migrations.find_one({"_id": "backfill", "status": {"$in": ["running"]}})
+    assert migration["status"] == "running"
+    assert (await sqlite_db.issues.delete_many({"repo_id": "r1"})).deleted_count == 1
+    assert await sqlite_db.issues.find_one({}) is None
+
+
+@pytest.mark.asyncio
+async def test_routes_on_sqlite(sqlite_db, auth_headers, test_repo_data, test_commit_data):
+    original_db = db_manager.db
+    db_manager.db = sqlite_db
+    try:
+        client = TestClient(app)
+        repo_id = client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+        for mileage in (1000, 2000, 3000):
+            payload = {**test_commit_data, "repo_id": repo_id, "mileage": mileage}
+            assert client.post("/api/commits", json=payload, headers=auth_headers).status_code == 200
+
+        url = f"/api/commits?repo_id={repo_id}&mileage_min=1500&search=OIL"
+        commits = client.get(url, headers=auth_headers).json()
+        assert [c["mileage"] for c in commits] == [3000, 2000]
+        stats = client.get(f"/api/repos/{repo_id}/stats", headers=auth_headers).json()
+        assert stats["total_cost"] == 450
+        assert client.get(f"/api/repos/{repo_id}", headers=auth_headers).json()["current_mileage"] == 3000
+    finally:
+        db_manager.db = original_db
+
+
+def test_import_mock_data(tmp_path):
+    source = tmp_path / "mock_db_data.json"
+    repo_id = str(ObjectId())
+    source.write_text(json.dumps({
+        "repos": [{"_id": repo_id, "name": "卡罗拉", "user_openid": "u1"}],
+        "migrations": [{"_id": "backfill", "status": "done"}],
+    }, ensure_ascii=False), encoding="utf-8")
+
+    target = str(tmp_path / "imported.sqlite3")
+    assert import_mock_data(str(source), target) == {"repos": 1, "migrations": 1}
+    assert import_mock_data(str(source), target) == {"repos": 1, "migrations": 1}
+
+    db = SQLiteDatabase(target)
+    try:
+        rows = db._reader().execute('SELECT id, user_openid FROM "repos"').fetchall()
+        assert rows == [(repo_id, "u1")]
+    finally:
+        db.close()
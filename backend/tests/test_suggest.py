@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from suggest import TitleSuggester, _UserTitles
+
+
+@pytest.mark.asyncio
+async def test_suggest_ranks_by_frequency(test_client, test_repo_data, test_commit_data, auth_headers):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    for title in ["机油更换", "机油更换", "机滤更换", "加油"]:
+        payload = {**test_commit_data, "repo_id": repo_id, "title": title}
+        test_client.post("/api/commits", json=payload, headers=auth_headers)
+
+    response = test_client.get(f"/api/suggest?repo_id={repo_id}&prefix=机", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.json() == [
+        {"title": "机油更换", "count": 2},
+        {"title": "机滤更换", "count": 1},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_suggest_tracks_commit_edits(test_client, test_repo_data, test_commit_data, auth_headers):
+    repo_id = test_client.post("/api/repos", json=test_repo_data, headers=auth_headers).json()["_id"]
+    payload = {**test_commit_data, "repo_id": repo_id, "title": "Oil change"}
+    commit_id = test_client.post("/api/commits", json=payload, headers=auth_headers).json()["_id"]
+
+    assert test_client.get("/api/suggest?prefix=oil", headers=auth_headers).json() == [
+        {"title": "Oil change", "count": 1}
+    ]
+
+    test_client.put(f"/api/commits/{commit_id}", json={"title": "Tire rotation"}, headers=auth_headers)
+    assert test_client.get("/api/suggest?prefix=oil", headers=auth_headers).json() == []
+    assert test_client.get("/api/suggest?prefix=tire", headers=auth_headers).json() == [
+        {"title": "Tire rotation", "count": 1}
+    ]
+
+
+def test_suggester_evicts_least_recently_used_user():
+    suggester = TitleSuggester(max_users=2)
+    for user_openid in ["a", "b", "c"]:
+        suggester._users[user_openid] = _UserTitles()
+        suggester._evict()
+
+    assert list(suggester._users) == ["b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_lookups_waiting_on_a_cancelled_build_build_again():
+    suggester = TitleSuggester()
+    builds = []
+
+    async def slow_load(db, user_openid):
+        builds.append(user_openid)
+        await asyncio.sleep(0.05)
+        return _UserTitles()
+
+    suggester._load = slow_load
+    leader = asyncio.create_task(suggester.get_index(None, "u1"))
+    await asyncio.sleep(0.01)
+    waiters = [asyncio.create_task(suggester.get_index(None, "u1")) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    indexes = await asyncio.wait_for(asyncio.gather(*waiters), timeout=1)
+    assert len({id(index) for index in indexes}) == 1
+    assert builds == ["u1", "u1"]
@@ -0,0 +1,65 @@
+import asyncio
+
+import httpx
+import pytest
+
+from wechat import WeChatSessionClient
+
+
+def stand_in_transport(calls, delay=0.05):
+    async def handler(request):
+        calls.append(request.url.params["js_code"])
+        await asyncio.sleep(delay)
+        return httpx.Response(200, json={"openid": f"openid-{request.url.params['js_code']}", "session_key": "k"})
+    return httpx.MockTransport(handler)
+
+
+def params(code):
+    return {"appid": "app", "secret": "secret", "js_code": code, "grant_type": "authorization_code"}
+
+
+@pytest.mark.asyncio
+async def test_concurrent_logins_with_same_code_share_one_call():
+    calls = []
+    client = WeChatSessionClient(base_url="http://wechat.local", transport=stand_in_transport(calls))
+
+    results = await asyncio.gather(*[client.code_to_session(params("abc")) for _ in range(5)])
+    await client.code_to_session(params("def"))
+    await client.close()
+
+    assert calls == ["abc", "def"]
+    assert {r["openid"] for r in results} == {"openid-abc"}
+    stats = client.stats()
+    assert stats["calls"] == 2
+    assert stats["deduplicated"] == 4
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_upstream_errors_are_counted():
+    async def handler(request):
+        return httpx.Response(200, json={"errcode": 40029, "errmsg": "invalid code"})
+
+    client = WeChatSessionClient(base_url="http://wechat.local", transport=httpx.MockTransport(handler))
+    data = await client.code_to_session(params("bad"))
+    await client.close()
+
+    assert data["errcode"] == 40029
+    assert client.stats()["errors"] == 1
+
+
+@pytest.mark.asyncio
+async def test_duplicates_of_a_cancelled_login_call_again():
+    calls = []
+    client = WeChatSessionClient(base_url="http://wechat.local", transport=stand_in_transport(calls))
+
+    leader = asyncio.create_task(client.code_to_session(params("abc")))
+    await asyncio.sleep(0.01)
+    duplicates = [asyncio.create_task(client.code_to_session(params("abc"))) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    leader.cancel()
+
+    results = await asyncio.wait_for(asyncio.gather(*duplicates), timeout=1)
+    await client.close()
+    assert {r["openid"] for r in results} == {"openid-abc"}
+    assert calls == ["abc", "abc"]
@@ -0,0 +1,139 @@
+import asyncio
+import importlib.util
+import os
+import time
+from typing import Any, Dict, Optional
+
+import certifi
+import httpx
+
+WECHAT_API_BASE = os.getenv("WECHAT_API_BASE", "https://api.weixin.qq.com")
+WECHAT_TIMEOUT_SECONDS = float(os.getenv("WECHAT_TIMEOUT_SECONDS", "10"))
+
+# Upper bounds (ms) of the upstream latency histogram buckets
+LATENCY_BUCKETS_MS = (25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class WeChatSessionClient:
+    """
+    App-lifetime pooled client for jscode2session.
+    One keep-alive connection pool (HTTP/2 when the h2 package is installed) replaces a new client
+    per login, and concurrent logins with the same js_code share a single upstream call.
+    """
+
+    def __init__(self, base_url: str = WECHAT_API_BASE, transport: Optional[httpx.AsyncBaseTransport] = None) -> None:
+        self.base_url = base_url
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._insecure_client: Optional[httpx.AsyncClient] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.reset_metrics()
+
+    def reset_metrics(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.deduplicated = 0
+        self.latency_sum_ms = 0.0
+        self.latency_max_ms = 0.0
+        self.latency_buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def _make_client(self, verify: Any) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.base_url,
+            verify=verify,
+            http2=importlib.util.find_spec("h2") is not None,
+            timeout=WECHAT_TIMEOUT_SECONDS,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60),
+            transport=self.transport,
+        )
+
+    async def start(self) -> None:
+        if self._client is None:
+            self._client = self._make_client(certifi.where())
+
+    async def close(self) -> None:
+        for client in (self._client, self._insecure_client):
+            if client is not None:
+                await client.aclose()
+        self._client = None
+        self._insecure_client = None
+
+    def _observe(self, elapsed_ms: float, failed: bool) -> None:
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        self.latency_sum_ms += elapsed_ms
+        self.latency_max_ms = max(self.latency_max_ms, elapsed_ms)
+        for i, bound in enumerate(LATENCY_BUCKETS_MS):
+            if elapsed_ms <= bound:
+                self.latency_buckets[i] += 1
+                break
+        else:
+            self.latency_buckets[-1] += 1
+
+    async def _get(self, params: Dict[str, str]) -> Dict[str, Any]:
+        await self.start()
+        assert self._client is not None
+        started = time.perf_counter()
+        failed = True
+        try:
+            try:
+                response = await self._client.get("/sns/jscode2session", params=params)
+            except httpx.ConnectError as e:
+                if "CERTIFICATE_VERIFY_FAILED" not in str(e):
+                    raise
+                print(f"SSL verification failed, retrying without verification: {e}")
+                if self._insecure_client is None:
+                    self._insecure_client = self._make_client(False)
+                response = await self._insecure_client.get("/sns/jscode2session", params=params)
+            data = response.json()
+            failed = bool(data.get("errcode"))
+            return data
+        finally:
+            self._observe((time.perf_counter() - started) * 1000, failed)
+
+    async def code_to_session(self, params: Dict[str, str]) -> Dict[str, Any]:
+        # A js_code is single-use upstream, so duplicate concurrent logins must share one call
+        code = params["js_code"]
+        pending = self._inflight.get(code)
+        if pending is not None:
+            self.deduplicated += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # Only call again when the leading login was cancelled, not this one
+                if not pending.cancelled():
+                    raise
+                self.deduplicated -= 1
+            return await self.code_to_session(params)
+
+        future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._inflight[code] = future
+        try:
+            data = await self._get(params)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()
+            raise
+        else:
+            future.set_result(data)
+            return data
+        finally:
+            self._inflight.pop(code, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "deduplicated": self.deduplicated,
+            "in_flight": len(self._inflight),
+            "latency_avg_ms": round(self.latency_sum_ms / self.calls, 2) if self.calls else 0,
+            "latency_max_ms": round(self.latency_max_ms, 2),
+            "latency_buckets_ms": dict(zip([*map(str, LATENCY_BUCKETS_MS), "+Inf"], self.latency_buckets)),
+        }
+
+
+wechat_client = WeChatSessionClient()
@@ -1,4 +1,4 @@
-import { wxLogin, clearAuth } from './auth'
+import { wxLogin, clearAuth, refreshSession } from './auth'
 import { config as envConfig, CLOUD_ENV_ID } from '../config'
 
 interface ApiConfig {
@@ -21,8 +21,6 @@ const requestConfig: ApiConfig = {
   retryCount: 1
 }
 
-let isReloginInProgress = false
-
 export function setBaseURL(url: string) {
   requestConfig.baseURL = url
 }
@@ -47,16 +45,27 @@ type ResponseHandler = {
   url: string
   method: 'GET' | 'POST' | 'PUT' | 'DELETE' | 'PATCH'
   data?: any
+  idempotencyKey?: string
+  sentToken?: string
+  authRetried?: boolean
+}
+
+// 创建类请求携带幂等键，超时或续期后的重发不会重复写入
+function newIdempotencyKey(): string {
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`
 }
 
 async function handleResponse(res: any, handler: ResponseHandler): Promise<void> {
-  const { resolve, reject, url, method, data } = handler
+  const { resolve, reject, url, method, data, idempotencyKey, sentToken, authRetried } = handler
   
   if (res.statusCode >= 200 && res.statusCode < 300) {
     resolve(res.data)
+  } else if (res.statusCode === 401 && authRetried) {
+    // 续期后重发仍未通过认证，不再循环续期
+    reject(new RequestError('UNAUTHORIZED', '登录已过期', res.statusCode))
   } else if (res.statusCode === 401) {
     try {
-      const result = await handleUnauthorized(url, method, data)
+      const result = await handleUnauthorized(url, method, data, idempotencyKey, sentToken)
       resolve(result)
     } catch (err) {
       reject(err)
@@ -86,19 +95,32 @@ function handleNetworkError(err: any, reject: (reason?: any) => void): void {
   reject(new RequestError('NETWORK_ERROR', `网络连接失败: ${err.errMsg || JSON.stringify(err)}`, undefined, err))
 }
 
-async function handleUnauthorized(
-  url: string,
-  method: 'GET' | 'POST' | 'PUT' | 'DELETE' | 'PATCH',
-  data?: any
-): Promise<any> {
-  if (isReloginInProgress) {
-    return Promise.reject(new RequestError('UNAUTHORIZED', '正在重新登录...', 401))
+// 同一时间只进行一次续期或重新登录，期间所有收到 401 的请求都等待它完成后重发
+let sessionRenewal: Promise<void> | null = null
+
+function renewSession(): Promise<void> {
+  if (!sessionRenewal) {
+    sessionRenewal = (async () => {
+      try {
+        await refreshOrRelogin()
+      } finally {
+        sessionRenewal = null
+      }
+    })()
   }
+  return sessionRenewal
+}
 
-  isReloginInProgress = true
-  clearAuth()
+async function refreshOrRelogin(): Promise<void> {
+  // 优先使用刷新令牌静默续期，失败后再提示重新登录
+  try {
+    await refreshSession()
+    return
+  } catch (err) {
+    clearAuth()
+  }
 
-  return new Promise((resolve, reject) => {
+  await new Promise<void>((resolve, reject) => {
     wx.showModal({
       title: '登录已过期',
       content: '是否重新登录？',
@@ -111,31 +133,39 @@ async function handleUnauthorized(
             await wxLogin()
             wx.hideLoading()
             wx.showToast({ title: '登录成功', icon: 'success' })
-            isReloginInProgress = false
-            
-            const result = await request(url, method, data)
-            resolve(result)
+            resolve()
           } catch (err) {
             wx.hideLoading()
-            isReloginInProgress = false
             wx.showToast({ title: '登录失败', icon: 'none' })
             reject(new RequestError('UNAUTHORIZED', '重新登录失败', 401))
           }
         } else {
-          isReloginInProgress = false
           wx.reLaunch({ url: '/pages/repo-list/index' })
           reject(new RequestError('UNAUTHORIZED', '用户取消登录', 401))
         }
       },
       fail: () => {
-        isReloginInProgress = false
         reject(new RequestError('UNAUTHORIZED', '登录已过期', 401))
       }
     })
   })
 }
 
-const request = (url: string, method: 'GET' | 'POST' | 'PUT' | 'DELETE' | 'PATCH', data?: any, retries = requestConfig.retryCount): Promise<any> => {
+async function handleUnauthorized(
+  url: string,
+  method: 'GET' | 'POST' | 'PUT' | 'DELETE' | 'PATCH',
+  data?: any,
+  idempotencyKey?: string,
+  sentToken?: string
+): Promise<any> {
+  // 令牌在请求发出后已被其他请求续期时直接重发，否则等待（或发起）这一轮续期
+  if ((wx.getStorageSync('autorepo_token') || '') === (sentToken || '')) {
+    await renewSession()
+  }
+  return request(url, method, data, requestConfig.retryCount, idempotencyKey, true)
+}
+
+const request = (url: string, method: 'GET' | 'POST' | 'PUT' | 'DELETE' | 'PATCH', data?: any, retries = requestConfig.retryCount, idempotencyKey?: string, authRetried = false): Promise<any> => {
   return new Promise((resolve, reject) => {
     const headers: Record<string, string> = {
       'content-type': 'application/json',
@@ -146,6 +176,9 @@ const request = (url: string, method: 'GET' | 'POST' | 'PUT' | 'DELETE' | 'PATCH
     if (token) {
       headers['Authorization'] = `Bearer ${token}`
     }
+    if (idempotencyKey) {
+      headers['Idempotency-Key'] = idempotencyKey
+    }
 
     if (envConfig.useCloudRun || envConfig.environment === 'prod') {
       if (!wx.cloud) {
@@ -162,7 +195,7 @@ const request = (url: string, method: 'GET' | 'POST' | 'PUT' | 'DELETE' | 'PATCH
         header: headers,
         data,
         success: (res: any) => {
-          handleResponse(res, { resolve, reject, url, method, data })
+          handleResponse(res, { resolve, reject, url, method, data, idempotencyKey, sentToken: token, authRetried })
         },
         fail: (err: any) => {
           handleNetworkError(err, reject)
@@ -185,7 +218,7 @@ const request = (url: string, method: 'GET' | 'POST' | 'PUT' | 'DELETE' | 'PATCH
       timeout: requestConfig.timeout,
       header: headers,
       success: (res: any) => {
-        handleResponse(res, { resolve, reject, url, method, data })
+        handleResponse(res, { resolve, reject, url, method, data, idempotencyKey, sentToken: token, authRetried })
       },
       fail: (err: any) => {
         handleNetworkError(err, reject)
@@ -199,7 +232,7 @@ export const getRepos = () => {
 };
 
 export const createRepo = (repo: any) => {
-    return request('/repos', 'POST', repo);
+    return request('/repos', 'POST', repo, requestConfig.retryCount, newIdempotencyKey());
 };
 
 export const updateRepo = (id: string, data: any) => {
@@ -237,8 +270,14 @@ export const getCommits = (repoId: string, filters?: {
   return request(url, 'GET');
 };
 
+export const suggestTitles = (prefix: string, repoId?: string, limit: number = 8) => {
+  let url = `/suggest?prefix=${encodeURIComponent(prefix)}&limit=${limit}`;
+  if (repoId) url += `&repo_id=${repoId}`;
+  return request(url, 'GET');
+};
+
 export const createCommit = (commit: any) => {
-    return request('/commits', 'POST', commit);
+    return request('/commits', 'POST', commit, requestConfig.retryCount, newIdempotencyKey());
 };
 
 export const getCommitDetail = (id: string) => {
@@ -266,7 +305,7 @@ export const getIssues = (repoId: string, status?: string) => {
 };
 
 export const createIssue = (repoId: string, issue: any) => {
-    return request(`/repos/${repoId}/issues`, 'POST', issue);
+    return request(`/repos/${repoId}/issues`, 'POST', issue, requestConfig.retryCount, newIdempotencyKey());
 };
 
 export const deleteIssue = (issueId: string) => {
@@ -280,3 +319,7 @@ export const updateIssue = (issueId: string, data: any) => {
 export const getRepoTrends = (repoId: string, months: number = 12) => {
     return request(`/repos/${repoId}/trends?months=${months}`, 'GET');
 };
+
+export const getReminders = (days: number = 30, mileageWindow: number = 1000) => {
+    return request(`/reminders?days=${days}&mileage_window=${mileageWindow}`, 'GET');
+};
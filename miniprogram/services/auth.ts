@@ -3,10 +3,64 @@ import { config as envConfig, CLOUD_ENV_ID } from '../config'
 interface LoginResponse {
   token: string
   openid: string
+  refresh_token?: string
 }
 
 const TOKEN_KEY = 'autorepo_token'
 const OPENID_KEY = 'autorepo_openid'
+const REFRESH_TOKEN_KEY = 'autorepo_refresh_token'
+
+function saveSession(response: LoginResponse): void {
+  wx.setStorageSync(TOKEN_KEY, response.token)
+  wx.setStorageSync(OPENID_KEY, response.openid)
+  if (response.refresh_token) {
+    wx.setStorageSync(REFRESH_TOKEN_KEY, response.refresh_token)
+  }
+}
+
+// 调用后端认证接口（支持云托管模式）
+function callAuthEndpoint(url: string, data: any): Promise<any> {
+  return new Promise((resolve, reject) => {
+    if (envConfig.useCloudRun || envConfig.environment === 'prod') {
+      wx.cloud.callContainer({
+        config: { env: CLOUD_ENV_ID },
+        path: `${envConfig.baseURL}${url}`,
+        method: 'POST',
+        header: {
+          'content-type': 'application/json',
+          'X-WX-SERVICE': 'autorepo-backend'
+        },
+        data,
+        success: (res) => {
+          if (res.statusCode >= 200 && res.statusCode < 300) {
+            resolve(res.data)
+          } else {
+            reject(new Error(`Auth request failed: ${res.statusCode} - ${JSON.stringify(res.data)}`))
+          }
+        },
+        fail: (err) => {
+          console.error('[Auth] Cloud Auth Request Failed:', err)
+          reject(new Error(`Cloud auth request failed: ${JSON.stringify(err)}`))
+        }
+      })
+    } else {
+      // 本地开发模式
+      wx.request({
+        url: `${envConfig.baseURL}${url}`,
+        method: 'POST',
+        data,
+        success: (res) => {
+          if (res.statusCode === 200) {
+            resolve(res.data)
+          } else {
+            reject(new Error(`Auth request failed: ${res.statusCode}`))
+          }
+        },
+        fail: reject
+      })
+    }
+  })
+}
 
 export async function wxLogin(): Promise<LoginResponse> {
   return new Promise((resolve, reject) => {
@@ -14,55 +68,9 @@ export async function wxLogin(): Promise<LoginResponse> {
       success: async (res) => {
         if (res.code) {
           try {
-            // 支持云托管模式
-            const response: any = await new Promise((resolve, reject) => {
-              const url = '/auth/login';
-              const method = 'POST';
-              const data = { code: res.code };
-              
-              if (envConfig.useCloudRun || envConfig.environment === 'prod') {
-                wx.cloud.callContainer({
-                  config: { env: CLOUD_ENV_ID },
-                  path: `${envConfig.baseURL}${url}`,
-                  method,
-                  header: {
-                    'content-type': 'application/json',
-                    'X-WX-SERVICE': 'autorepo-backend'
-                  },
-                  data,
-                  success: (res) => {
-                    if (res.statusCode >= 200 && res.statusCode < 300) {
-                      resolve(res.data)
-                    } else {
-                      reject(new Error(`Login failed: ${res.statusCode} - ${JSON.stringify(res.data)}`))
-                    }
-                  },
-                  fail: (err) => {
-                    console.error('[Auth] Cloud Login Failed:', err)
-                    reject(new Error(`Cloud Login failed: ${JSON.stringify(err)}`))
-                  }
-                })
-              } else {
-                // 本地开发模式
-                wx.request({
-                  url: `${envConfig.baseURL}${url}`,
-                  method,
-                  data,
-                  success: (res) => {
-                    if (res.statusCode === 200) {
-                      resolve(res.data)
-                    } else {
-                      reject(new Error(`Login failed: ${res.statusCode}`))
-                    }
-                  },
-                  fail: reject
-                })
-              }
-            })
-
+            const response: LoginResponse = await callAuthEndpoint('/auth/login', { code: res.code })
+            saveSession(response)
             const { token, openid } = response
-            wx.setStorageSync(TOKEN_KEY, token)
-            wx.setStorageSync(OPENID_KEY, openid)
 
             resolve({ token, openid })
           } catch (err) {
@@ -78,6 +86,17 @@ export async function wxLogin(): Promise<LoginResponse> {
 }
 
 
+// 使用刷新令牌续期会话，无需重新调用 wx.login
+export async function refreshSession(): Promise<LoginResponse> {
+  const refreshToken = wx.getStorageSync(REFRESH_TOKEN_KEY)
+  if (!refreshToken) {
+    throw new Error('No refresh token')
+  }
+  const response: LoginResponse = await callAuthEndpoint('/auth/refresh', { refresh_token: refreshToken })
+  saveSession(response)
+  return response
+}
+
 export function getToken(): string | null {
   try {
     return wx.getStorageSync(TOKEN_KEY)
@@ -97,6 +116,7 @@ export function getOpenId(): string | null {
 export function clearAuth(): void {
   wx.removeStorageSync(TOKEN_KEY)
   wx.removeStorageSync(OPENID_KEY)
+  wx.removeStorageSync(REFRESH_TOKEN_KEY)
 }
 
 export function isAuthenticated(): boolean {